@@ -14,15 +14,61 @@ src_dir = os.path.join(here, 'src')
 if os.path.isdir(src_dir) and src_dir not in sys.path:
     sys.path.insert(0, src_dir)
 
-from bs4 import BeautifulSoup
+import collections
 import constants
-import csv
+import cache as response_cache
+import functools
+import journal
+import metrics
+import parsers
+import parsestage
+import retry
+import ratelimit
 import requests
-import sys
+import threading
 import time
+import sys
+import urllib.parse
 import urllib.robotparser
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import writers
+
+
+class IdFeed:
+    """
+    Fuente perezosa de IDs para el despachador. Envuelve cualquier iterable
+    (también un generador que lee el catálogo en streaming) y sólo extrae los
+    IDs que se van despachando: la memoria no crece con el tamaño del catálogo.
+    """
+
+    _END = object()
+
+    def __init__(self, food_ids):
+        self._iterator = iter(food_ids)
+        self._next = self._END
+        self.consumed = 0  # IDs entregados hasta ahora
+        self._advance()
+
+    def _advance(self):
+        self._next = next(self._iterator, self._END)
+
+    def __bool__(self):
+        return self._next is not self._END
+
+    @property
+    def total(self):
+        """Tamaño de la fuente, conocido sólo cuando se ha agotado (None hasta entonces)."""
+        return None if self else self.consumed
+
+    def take(self, count):
+        """Extrae hasta 'count' IDs."""
+        taken = []
+        while self and len(taken) < count:
+            taken.append(self._next)
+            self._advance()
+        self.consumed += len(taken)
+        return taken
+
 
 class GastroMiner:
     """
@@ -31,38 +77,126 @@ class GastroMiner:
     escritura segura de resultados a disco.
     """
 
-    def __init__(self):
+    def __init__(self, parser_engine=constants.PARSER_ENGINE, url=constants.URL,
+                 output_file=constants.CSV_OUTPUT_FILE, sink=None, resume=False,
+                 cache=None, cache_mode='normal', rate_limiter=None, batch_size=constants.BATCH_SIZE,
+                 parse_processes=constants.PARSE_PROCESSES, archive=None, shard=None, ordered=False):
         """
         Inicializa el motor minero.
-        Configura la sesión HTTP persistente y los mecanismos de sincronización.
+        Configura la sesión HTTP persistente y la etapa de escritura.
+        'parser_engine' selecciona el parser de Nivel 2 ('stream' o 'soup'),
+        'url' permite apuntar a un endpoint alternativo (p. ej. bedca_stub.py)
+        y 'output_file' fija el CSV de salida. 'sink' sustituye el destino CSV
+        por cualquier otro sink compatible (ver writers.py). Con 'resume' se
+        continúa la ejecución anterior a partir de su diario de IDs completados.
+        'cache' (cache.ResponseCache) activa la caché de respuestas en disco y
+        'cache_mode' elige entre 'normal', 'refresh' y 'only' (sin red).
+        'rate_limiter' sustituye al limitador adaptativo global por defecto.
+        Con 'batch_size' > 1 se piden varios IDs por consulta de Nivel 2.
+        'parse_processes' > 0 traslada el parsing a un pool de procesos
+        (parsestage.ParseStage) y deja a los workers sólo la red.
+        'archive' (archive.PackWriter ya abierto) guarda cada respuesta cruda de
+        Nivel 1 y 2 para regenerar el dataset sin red (ver replay.py).
+        'shard' (shard.Shard) limita el rastreo a un fragmento del catálogo.
+        Con 'ordered' las filas se escriben en orden de catálogo y no de llegada.
         """
+        self.output_file = output_file
+        self.resume = resume
+        if sink is None:
+            # Diario append-only de IDs persistidos (ver journal.py)
+            sink = writers.CsvSink(output_file, resume=resume,
+                                   journal=journal.CompletionJournal(output_file + constants.JOURNAL_SUFFIX))
+        self.sink = sink
+        self.url = url
+        self.robots_url = urllib.parse.urljoin(url, '/robots.txt')
+        if parser_engine not in parsers.PARSERS:
+            raise ValueError(f"Motor de parsing desconocido: {parser_engine}")
+        self.parser_engine = parser_engine
+        # Función de parsing de Nivel 2 (ver parsers.py), cronometrada sólo si
+        # las métricas están activas (ver metrics.py). Un sink con
+        # 'wants_components' (p. ej. database.SqliteSink) recibe además el
+        # detalle de cada componente (parsers.FoodRow).
+        self.components = getattr(self.sink, 'wants_components', False)
+        parse_one, parse_many = parsers.PARSERS[parser_engine], parsers.BATCH_PARSERS[parser_engine]
+        if self.components:
+            parse_one = functools.partial(parse_one, components=True)
+            parse_many = functools.partial(parse_many, components=True)
+        self._parse_food_detail = metrics.timed('parse_seconds', parse_one)
+        self._parse_food_details = metrics.timed('parse_seconds', parse_many)
+
+        # Consultas por lotes: IDs por petición y contador de retornos a modo individual
+        self.batch_size = max(1, batch_size)
+        self.batch_fallbacks = 0
+        self._empty_batches = 0
+
+        # Etapa de parsing en procesos (se crea al ejecutar, ver execute)
+        self.parse_processes = parse_processes
+        self.parse_stage = None
+
         # Sesión HTTP: Estrategia Keep-Alive
         # Usar requests.Session permite reutilizar la conexión TCP subyacente
         # para múltiples peticiones (método Keep-Alive), lo que reduce la latencia
         # de establecimiento de conexión en cada una de las peticiones concurrentes.
         self.session = requests.Session()
         self.session.headers.update(constants.HEADERS)
-        
-        # Sincronización: Mutex (Lock) para la Sección Crítica
-        # Este candado evita 'race conditions' (condiciones de carrera) al escribir
-        # en el fichero CSV, asegurando que solo un hilo acceda a la operación I/O
-        # a la vez.
-        self.csv_lock = threading.Lock()
-
-        # Inicialización del fichero de persistencia con las cabeceras
+
+        # Throttling: un cubo de tokens global y adaptativo (ver ratelimit.py)
+        # compartido por todos los workers, aplicado en el adaptador de transporte.
+        self.rate_limiter = rate_limiter if rate_limiter is not None else ratelimit.AdaptiveRateLimiter()
+
+        # Caché de respuestas bajo la sesión: session.post() la consulta de forma
+        # transparente; sólo las peticiones que salen a la red consumen tokens.
+        self.cache = cache
+        self.cache_mode = cache_mode
+        self.archive = archive
+        self.shard = shard
+        # Pool dimensionado a la concurrencia: con el tamaño por defecto (10) los
+        # workers por encima de ese número cerrarían su conexión al terminar cada
+        # petición y la siguiente tendría que volver a abrirla.
+        transport = {'limiter': self.rate_limiter, 'pool_maxsize': max(1, constants.MAX_WORKERS)}
+        if cache is not None:
+            adapter = response_cache.CachingAdapter(cache, mode=cache_mode, **transport)
+        else:
+            adapter = ratelimit.RateLimitedAdapter(**transport)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Inicialización del destino de persistencia y de la etapa de escritura
         self._initialize_storage()
 
+        # Modo ordenado: búfer de reordenación delante del escritor y posición
+        # en el catálogo de cada ID en curso (lista: un ID puede repetirse).
+        self.reorder = writers.ReorderBuffer(self.writer) if ordered else None
+        self._positions = {}
+        self._positions_lock = threading.Lock()
+
     def _initialize_storage(self):
-        """Crea y prepara el fichero CSV de salida escribiendo la línea de cabecera."""
+        """
+        Abre el sink (el CSV escribe su cabecera) y arranca el hilo escritor.
+        Un único escritor con cola acotada sustituye al lock + open/append por fila.
+        """
         try:
-            # Uso de encoding='utf-8' para manejar correctamente caracteres especiales.
-            with open(constants.CSV_OUTPUT_FILE, 'w', newline='', encoding='utf-8') as csvFile:
-                writer = csv.writer(csvFile)
-                writer.writerow(constants.CSV_HEADER)
-            print(f"[*] Fichero CSV '{constants.CSV_OUTPUT_FILE}' inicializado con éxito.")
+            self.sink.open()
+            # IDs ya persistidos por una ejecución anterior (sólo con resume)
+            self.completed_ids = getattr(self.sink, 'completed_ids', set())
+            if self.completed_ids:
+                print(f"[*] Reanudando '{self.output_file}': {len(self.completed_ids)} alimentos ya persistidos.")
+            else:
+                print(f"[*] Fichero de salida '{self.output_file}' inicializado con éxito.")
         except IOError as e:
             print(f"[FATAL] Error crítico inicializando almacenamiento: {e}")
             sys.exit(1)
+        self.writer = writers.RowWriter(self.sink).start()
+
+    def close(self):
+        """Drena la etapa de escritura y sincroniza el sink (fin normal o SIGINT)."""
+        try:
+            if self.reorder is not None:
+                self.reorder.close()
+            self.writer.close()
+        except Exception as e:
+            print(f"[ERROR I/O] Fallo crítico cerrando el almacenamiento: {e}")
+            sys.exit(1)
 
     def execute(self):
         """
@@ -75,58 +209,237 @@ class GastroMiner:
             
         # Extracción del catálogo de IDs (etapa secuencial)
         print(">>> Iniciando secuencia de mapeo de IDs de alimentos...")
-        food_ids = self._get_catalog_ids()
-        total_foods = len(food_ids)
-        print(f">>> Catálogo indexado: {total_foods} referencias encontradas.")
+        # El catálogo se lee en streaming: los IDs llegan al despachador según se
+        # parsea la respuesta de Nivel 1.
+        food_ids = self._iter_catalog_ids()
+        if self.shard is not None:
+            food_ids = self.shard.select(food_ids)
+        food_ids = self._plan_fetch(food_ids)
+        # Reintentos diferidos y circuit breaker (ver retry.py). En modo sólo-caché
+        # un fallo no se arregla reintentando: un único intento por ID.
+        cache_only = self.cache is not None and self.cache_mode == 'only'
+        self.retry_scheduler = retry.RetryScheduler(max_attempts=1 if cache_only else constants.RETRY_MAX_ATTEMPTS)
+        self.breaker = retry.CircuitBreaker()
+        if self.parse_processes:
+            self.parse_stage = parsestage.ParseStage(self.parser_engine, processes=self.parse_processes,
+                                                     components=self.components)
+            print(f">>> Parsing en {self.parse_stage.processes} procesos "
+                  f"(trozos de {self.parse_stage.chunk_size} respuestas).")
+        completed = False
+        try:
+            self._mine_catalog(food_ids)
+            self._report_failures()
+            completed = True
+        finally:
+            if self.parse_stage is not None:
+                self.parse_stage.close()
+            # También ante Ctrl+C: las filas ya extraídas llegan a disco.
+            self.close()
+            if self.shard is not None:
+                self.shard.finish(self.writer.rows_written, self.retry_scheduler.failed_ids, completed)
+            if self.cache is not None:
+                print(f"\n[*] Caché de respuestas: {self.cache.hits} aciertos, {self.cache.misses} fallos.")
+                self.cache.close()
+            if self.archive is not None:
+                print(f"[*] Archivo de respuestas '{self.archive.path}': {self.archive.records} registros, "
+                      f"{self.archive.raw_bytes / 2**20:.1f} MiB -> {self.archive.stored_bytes / 2**20:.1f} MiB.")
+                self.archive.close()
+
+    def _plan_fetch(self, food_ids):
+        """
+        IDs del catálogo que hay que descargar, en orden. Un sink con plan()
+        (p. ej. delta.DeltaSink) decide por sí mismo; si no, se omiten los IDs
+        ya completados de una ejecución reanudada.
+        """
+        plan = getattr(self.sink, 'plan', None)
+        if plan is not None:
+            return plan(food_ids)
+        if self.completed_ids:
+            # Reanudación: sólo se piden los IDs que no figuran en el diario
+            print(f">>> Reanudación: se omiten {len(self.completed_ids)} IDs ya completados.")
+            completed = self.completed_ids
+            return (f_id for f_id in food_ids if f_id not in completed)
+        return food_ids
+
+    def _mine_catalog(self, food_ids):
+        """
+        Etapas de detalle y persistencia con el motor de hilos (ThreadPoolExecutor).
+        El hilo principal actúa de despachador: lanza unidades de trabajo (un ID
+        o un lote) mientras el circuit breaker lo permite, reinyecta los
+        reintentos cuando vence su plazo y consume resultados a medida que
+        terminan. Ningún worker espera un backoff. Los IDs se extraen de
+        'food_ids' (cualquier iterable) sólo a medida que hay hueco en la
+        ventana, y cada resultado se libera en cuanto pasa al escritor.
+        """
         print(f">>> Desplegando enjambre de {constants.MAX_WORKERS} workers para extracción paralela.")
 
+        pending = IdFeed(food_ids)
+        singles = collections.deque()  # IDs que deben pedirse de uno en uno
+        in_flight = {}  # Future -> tupla de f_id
+        completed_count = 0
+
+        # Con etapa de parsing, la ventana cubre también lo que espera en ella.
+        window = constants.MAX_WORKERS * 2
+        if self.parse_stage is not None:
+            window += self.parse_stage.capacity
+
         # Orquestación de Concurrencia (Thread Pool)
         # ThreadPoolExecutor maneja el pool de hilos y su ciclo de vida.
         with ThreadPoolExecutor(max_workers=constants.MAX_WORKERS) as executor:
-            # Mapeamos cada ID a una tarea asíncrona (_mine_food_data)
-            future_to_food = {executor.submit(self._mine_food_data, f_id): f_id for f_id in food_ids}
-            
-            completed_count = 0
-            # as_completed devuelve los resultados a medida que los hilos terminan.
-            for future in as_completed(future_to_food):
-                food_id = future_to_food[future]
-                try:
-                    data_row = future.result()
-                    if data_row:
-                        # Escritura atómica: uso del Lock para garantizar integridad del CSV
-                        with self.csv_lock:
-                            self._persist_data(data_row)
-                    
-                    completed_count += 1
-                    # Log de progreso
-                    if completed_count % 25 == 0 or completed_count == total_foods:
-                        self._print_progress(completed_count, total_foods)
-
-                except Exception as exc:
-                    print(f"\n[ERROR WORKER] Fallo en nodo {food_id}: {exc}")
+            while pending or singles or in_flight or len(self.retry_scheduler):
+                # Los reintentos se piden siempre de forma individual
+                singles.extend(self.retry_scheduler.pop_due())
+                # Se mantiene el pool ocupado sin encolar todo el catálogo de golpe.
+                while (pending or singles) and len(in_flight) < window and self.breaker.allow():
+                    unit = self._next_work_unit(pending, singles)
+                    in_flight[executor.submit(self._mine_work_unit, unit)] = unit
+
+                timeout = self._dispatch_timeout(pending or singles)
+                if not in_flight:
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit = in_flight.pop(future)
+                    try:
+                        rows = future.result()
+                    except Exception as exc:
+                        print(f"\n[ERROR WORKER] Fallo en nodo {', '.join(unit)}: {exc}")
+                        rows = {}
+                    if isinstance(rows, Future):
+                        # Descarga terminada; el parsing sigue en la etapa de procesos.
+                        in_flight[rows] = unit
+                        continue
+                    for _ in range(self._settle_work_unit(unit, rows, singles)):
+                        completed_count += 1
+                        # Log de progreso
+                        if completed_count % 25 == 0 or completed_count == pending.total:
+                            self._print_progress(completed_count, pending.total)
+
+    def _next_work_unit(self, pending, singles):
+        """Siguiente unidad de trabajo: primero los IDs individuales, después un lote."""
+        if singles:
+            return (singles.popleft(),)
+        start = pending.consumed
+        unit = tuple(pending.take(self.batch_size))
+        if self.reorder is not None:
+            with self._positions_lock:
+                for position, food_id in enumerate(unit, start):
+                    self._positions.setdefault(food_id, []).append(position)
+        return unit
+
+    def _mine_work_unit(self, unit):
+        """
+        [WORKER METHOD] Descarga una unidad de trabajo y devuelve {f_id: fila}.
+        Con etapa de parsing en procesos devuelve en su lugar el Future de esa
+        etapa: el worker queda libre para la siguiente descarga.
+        """
+        if self.parse_stage is not None:
+            content = self._fetch_unit(unit)
+            return self.parse_stage.submit(unit, content) if content is not None else {}
+        if len(unit) == 1:
+            data_row = self._mine_food_data(unit[0])
+            return {unit[0]: data_row} if data_row else {}
+        return self._mine_food_batch(unit)
+
+    def _settle_work_unit(self, unit, rows, singles):
+        """
+        Procesa el resultado de una unidad. Los IDs que faltan en la respuesta de
+        un lote vuelven a pedirse de forma individual (fallback) sin contar como
+        fallo; en peticiones individuales pasan al planificador de reintentos.
+        Devuelve cuántos IDs quedan cerrados.
+        """
+        if len(unit) > 1:
+            self._track_batch_support(rows)
+        closed = 0
+        for food_id in unit:
+            data_row = rows.get(food_id)
+            if data_row is None and len(unit) > 1:
+                self.batch_fallbacks += 1
+                singles.append(food_id)
+                continue
+            closed += self._handle_result(food_id, data_row)
+        return closed
+
+    def _handle_result(self, food_id, data_row):
+        """
+        Persiste una fila o programa el reintento del ID. Devuelve True si el ID
+        queda cerrado (persistido o con los intentos agotados).
+        """
+        self.breaker.record(bool(data_row))
+        if data_row:
+            self.retry_scheduler.record_success(food_id)
+            metrics.registry.inc('foods_total', result='ok')
+            # Encolado hacia el hilo escritor (sin lock ni I/O en este hilo)
+            self._persist_data(data_row, food_id)
+            return True
+        if self.retry_scheduler.record_failure(food_id):
+            return False
+        if self.reorder is not None:
+            # Intentos agotados: su posición deja de retener a las siguientes.
+            self._persist_data(None, food_id)
+        return True
+
+    def _dispatch_timeout(self, pending):
+        """Espera máxima del despachador antes de revisar reintentos o el breaker."""
+        waits = [constants.DISPATCH_POLL_INTERVAL]
+        next_retry = self.retry_scheduler.seconds_to_next()
+        if next_retry is not None:
+            waits.append(next_retry)
+        if pending and not self.breaker.allow():
+            waits.append(self.breaker.seconds_to_close())
+        return min(waits)
+
+    def _report_failures(self):
+        """Informe final de IDs que no se pudieron obtener tras todos los reintentos."""
+        failed = self.retry_scheduler.failed_ids
+        print(f"\n[*] Reintentos programados: {self.retry_scheduler.retries}; "
+              f"aperturas del circuit breaker: {self.breaker.trips}.")
+        if self.batch_size > 1 or self.batch_fallbacks:
+            print(f"[*] Consultas por lotes: {self.batch_fallbacks} IDs pedidos de forma "
+                  f"individual tras fallar su lote.")
+        if failed:
+            print(f"[!] {len(failed)} alimentos fallaron tras {self.retry_scheduler.max_attempts} intentos: "
+                  f"{', '.join(sorted(failed, key=lambda f_id: (len(f_id), f_id)))}")
+            print("[!] Relance con --resume para intentarlo sólo con ellos.")
 
     def _accessGranted(self):
         """Verifica la directiva de 'Allow' en el fichero robots.txt para el USER_AGENT definido."""
+        if self.cache is not None and self.cache_mode == 'only':
+            # Modo sin red: no se contacta con el servidor, tampoco para robots.txt.
+            return True
         rp = urllib.robotparser.RobotFileParser()
-        rp.set_url(constants.ROBOTS_URL)
+        rp.set_url(self.robots_url)
         try:
             rp.read()
-            return rp.can_fetch(constants.USER_AGENT, constants.URL)
+            return rp.can_fetch(constants.USER_AGENT, self.url)
         except Exception:
             # Si la lectura falla (ej. error de red), asumimos permiso por defecto.
             return True
 
-    def _get_catalog_ids(self):
-        """Realiza la petición inicial para obtener todos los identificadores de alimentos."""
+    def _iter_catalog_ids(self):
+        """
+        Realiza la petición inicial (catálogo de Nivel 1) y devuelve un iterador
+        de identificadores que parsea la respuesta en streaming.
+        """
         try:
-            r = self.session.post(constants.URL, data=constants.IDS_REQUEST)
+            r = self.session.post(self.url, data=constants.IDS_REQUEST, stream=True)
             r.raise_for_status() # Lanza una excepción para códigos de error HTTP
-            soup = BeautifulSoup(r.text, "lxml-xml")
-            # Uso de list comprehension para recolección eficiente
-            return [node.get_text() for node in soup.find_all('f_id')]
         except Exception as e:
             print(f"[ERROR RED] Fallo obteniendo catálogo maestro. Revise el endpoint: {e}")
             sys.exit(1)
+        return self._stream_catalog_ids(r)
+
+    def _stream_catalog_ids(self, response):
+        with response:
+            chunks = response.iter_content(constants.CATALOG_CHUNK_SIZE)
+            if self.archive is not None:
+                chunks = self.archive.record_catalog(chunks)
+            try:
+                yield from parsers.iter_catalog_ids(chunks)
+            except Exception as e:
+                print(f"\n[ERROR RED] Catálogo maestro interrumpido: {e}")
+                sys.exit(1)
 
     def _mine_food_data(self, food_id):
         """
@@ -134,80 +447,126 @@ class GastroMiner:
         Función ejecutada por cada hilo para extraer y estructurar los detalles
         nutricionales de un único alimento (ID).
         """
+        content = self._fetch_unit((food_id,))
+        if content is None:
+            return None
+        try:
+            return self._parse_food_detail(content)
+        except Exception as e:
+            print(f"\n[EXCEPCIÓN WORKER] ID {food_id}: {e}")
+            return None
+
+    def _fetch_unit(self, unit):
+        """
+        [WORKER METHOD]
+        Descarga la respuesta de Nivel 2 de una unidad (un ID o un lote) y
+        devuelve sus bytes crudos, o None ante un error HTTP o de red.
+        """
         try:
-            food_data_map = {}
             # Construcción del payload XML específico
-            payload = constants.DETAILS_REQUEST_INI + str(food_id) + constants.DETAILS_REQUEST_FIN
-            
-            # Aplicación del Throttling (latencia fija)
-            time.sleep(constants.FIXED_DELAY)
-            
-            # Petición a la API usando la sesión persistente
-            response = self.session.post(constants.URL, data=payload)
-            
+            if len(unit) == 1:
+                payload = self._build_detail_payload(unit[0])
+            else:
+                payload = self._build_batch_payload(unit)
+
+            # Petición a la API usando la sesión persistente (el adaptador aplica
+            # el limitador de ritmo global antes de salir a la red)
+            response = self.session.post(self.url, data=payload)
+
             if response.status_code != 200:
-                print(f"\n[WARN] Error HTTP {response.status_code} para ID {food_id}. Saltando registro.")
+                self._warn_http_error(unit, response.status_code)
                 return None
+            if self.archive is not None:
+                self.archive.append(unit, response.content)
+            return response.content
 
-            soup = BeautifulSoup(response.content, "lxml-xml")
-            
-            # 1. Extracción de Metadatos Básicos (Ej: f_id, f_ori_name, sci_name, eur_name)
-            # El bucle itera sobre la lista BASIC_LIST actualizada en constants.py.
-            for tag in constants.BASIC_LIST:
-                node = soup.find(tag)
-                # Uso de operador ternario para manejo conciso de nulos
-                food_data_map[tag] = node.getText() if node else constants.EMPTY
-            
-            # 2. Extracción de Componentes Nutricionales
-            components = soup.find_all('foodvalue')
-            for comp in components:
-                name_node = comp.find("c_ori_name")
-                key_name = name_node.getText() if name_node else "Unknown"
-                
-                val_node = comp.find("best_location")
-                value = val_node.getText() if val_node else ""
-                
-                # Lógica de fallback: si el valor numérico ('best_location') es nulo,
-                # se usa el tipo de valor ('value_type') como marcador.
-                if not value:
-                    type_node = comp.find("value_type")
-                    food_data_map[key_name] = type_node.getText() if type_node else constants.EMPTY
-                else:
-                    food_data_map[key_name] = value
-            
-            # Normalización del diccionario a formato de lista (fila CSV)
-            return self._normalize_for_csv(food_data_map)
-
-        except AttributeError as e:
-            # Captura específica para errores de parsing XML (ej. tag no encontrado)
-            print(f"\n[ERROR PARSING] ID {food_id}: Error de atributo. Datos incompletos.")
-            return None
         except Exception as e:
             # Captura para errores inesperados (ej. problemas de red temporales)
-            print(f"\n[EXCEPCIÓN WORKER] ID {food_id}: {e}")
+            print(f"\n[EXCEPCIÓN WORKER] {self._describe_unit(unit)}: {e}")
             return None
 
-    def _normalize_for_csv(self, data_map): 
-        """Convierte el diccionario de datos a una lista, asegurando el orden correcto (CSV_HEADER)."""
-        # Si una columna esperada no está en el mapa, se rellena con el marcador EMPTY.
-        return [data_map.get(col, constants.EMPTY) for col in constants.CSV_HEADER]
+    def _warn_http_error(self, unit, status):
+        if len(unit) == 1:
+            print(f"\n[WARN] Error HTTP {status} para ID {unit[0]}.")
+        else:
+            print(f"\n[WARN] Error HTTP {status} en lote de {len(unit)} IDs. Se piden de forma individual.")
+
+    @staticmethod
+    def _describe_unit(unit):
+        return f"ID {unit[0]}" if len(unit) == 1 else f"Lote de {len(unit)} IDs"
 
-    def _persist_data(self, row):
-        """Escribe una fila al disco. Debe ser invocado bajo el control de self.csv_lock."""
+    def _track_batch_support(self, rows):
+        """Vuelve a consultas individuales si varios lotes seguidos llegan vacíos."""
+        self._empty_batches = 0 if rows else self._empty_batches + 1
+        if self._empty_batches >= constants.BATCH_DISABLE_AFTER and self.batch_size > 1:
+            print(f"\n[WARN] {self._empty_batches} lotes seguidos sin resultados: "
+                  f"se desactivan las consultas por lotes.")
+            self.batch_size = 1
+
+    def _mine_food_batch(self, food_ids):
+        """
+        [WORKER METHOD]
+        Pide varios alimentos en una sola consulta de Nivel 2 y separa la
+        respuesta por f_id. Ante cualquier fallo devuelve {} y el despachador
+        reintenta los IDs de uno en uno.
+        """
+        content = self._fetch_unit(tuple(food_ids))
+        if content is None:
+            return {}
         try:
-            # Abrir en modo 'a' (append) para añadir la fila
-            with open(constants.CSV_OUTPUT_FILE, 'a', newline='', encoding='utf-8') as f:
-                csv.writer(f).writerow(row)
+            return self._parse_food_details(content)
+        except Exception as e:
+            print(f"\n[EXCEPCIÓN WORKER] Lote de {len(food_ids)} IDs: {e}")
+            return {}
+
+    @staticmethod
+    def _build_detail_payload(food_id):
+        """Payload XML de Nivel 2 para un único alimento."""
+        return constants.DETAILS_REQUEST_INI + str(food_id) + constants.DETAILS_REQUEST_FIN
+
+    @staticmethod
+    def _build_batch_payload(food_ids):
+        """Payload XML de Nivel 2 para varios alimentos (relación IN, IDs separados por comas)."""
+        return constants.DETAILS_BATCH_REQUEST_INI + ','.join(map(str, food_ids)) + constants.DETAILS_REQUEST_FIN
+
+    def _persist_data(self, row, food_id=None):
+        """
+        Entrega una fila a la etapa de escritura (ver writers.RowWriter). En modo
+        ordenado pasa antes por el búfer de reordenación con la posición de
+        'food_id'; row None cierra esa posición sin fila.
+        """
+        try:
+            with metrics.registry.timer('persist_wait_seconds'):
+                if self.reorder is None:
+                    self.writer.put(row)
+                else:
+                    with self._positions_lock:
+                        positions = self._positions[food_id]
+                        position = positions.pop(0)
+                        if not positions:
+                            del self._positions[food_id]
+                    if row is None:
+                        self.reorder.skip(position)
+                    else:
+                        self.reorder.put(position, row)
         except Exception as e:
             print(f"[ERROR I/O] Fallo crítico escribiendo disco: {e}. Abortando.")
             # Un error de escritura crítica debería detener la ejecución
             sys.exit(1)
 
     def _print_progress(self, current, total):
-        """Visualización de progreso en consola mediante una barra de carga."""
+        """
+        Visualización de progreso en consola mediante una barra de carga. Mientras
+        el catálogo se sigue leyendo ('total' None) sólo se muestra el recuento.
+        """
+        if total is None:
+            print(f"\rProgreso: {current} alimentos "
+                  f"[{self.rate_limiter.rate:.1f} req/s]", end='', flush=True)
+            return
         percent = (current / total) * 100
         # Barra ASCII simple para feedback visual
         bar_length = 50
         filled_length = int(bar_length * current // total)
         bar = '█' * filled_length + '-' * (bar_length - filled_length)
-        print(f"\rProgreso: |{bar}| {percent:.1f}% ({current}/{total})", end='', flush=True)
\ No newline at end of file
+        print(f"\rProgreso: |{bar}| {percent:.1f}% ({current}/{total}) "
+              f"[{self.rate_limiter.rate:.1f} req/s]", end='', flush=True)
\ No newline at end of file
@@ -0,0 +1,217 @@
+# -----------------------------------------------------------------------------
+# ARCHIVO DE RESPUESTAS CRUDAS (PACK + ÍNDICE)
+# -----------------------------------------------------------------------------
+# Guarda cada respuesta de Nivel 1 y Nivel 2 tal como llegó del servidor para
+# poder regenerar el dataset sin volver a descargar (ver replay.py), p. ej.
+# tras añadir una columna a DETAIL_LIST o corregir un parser.
+#
+# Pack (fichero append-only):
+#   MAGIC, y después registros consecutivos:
+#   [tipo:u8][long. clave:u16][long. payload:u32][crc32 del cuerpo:u32]
+#   [clave utf-8][cuerpo comprimido con zlib]
+#   La clave es la unidad pedida: "f_id" o "f_id,f_id,..." (lote); vacía en
+#   el catálogo.
+#
+# Índice (<pack>.idx, append-only): una línea "<offset>\t<tipo>\t<clave>" por
+# registro, escrita DESPUÉS del registro. Al abrir, los registros del pack que
+# no figuran en el índice (interrupción entre ambas escrituras) se recuperan
+# recorriendo el pack, y un registro a medias al final se descarta.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import constants
+import parsers
+import struct
+import threading
+import zlib
+
+MAGIC = b'GMPACK1\n'
+RECORD = struct.Struct('<BHII')
+
+KIND_CATALOG = 1  # Respuesta de Nivel 1
+KIND_DETAIL = 2   # Respuesta de Nivel 2 (un ID o un lote)
+
+
+def _scan(f, offset, end):
+    """
+    Recorre los registros del pack entre 'offset' y 'end' y devuelve
+    ([(offset, tipo, clave)], offset_fin_válido). Se detiene en el primer
+    registro incompleto.
+    """
+    entries = []
+    while offset + RECORD.size <= end:
+        f.seek(offset)
+        kind, key_length, payload_length, _ = RECORD.unpack(f.read(RECORD.size))
+        record_end = offset + RECORD.size + key_length + payload_length
+        if kind not in (KIND_CATALOG, KIND_DETAIL) or record_end > end:
+            break
+        entries.append((offset, kind, f.read(key_length).decode('utf-8')))
+        offset = record_end
+    return entries, offset
+
+
+def _load_index(path):
+    """Entradas completas del índice: [(offset, tipo, clave)]."""
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break  # Línea truncada por una interrupción: se ignora
+            offset, kind, key = line[:-1].split('\t')
+            entries.append((int(offset), int(kind), key))
+    return entries
+
+
+def _record_end(f, offset):
+    f.seek(offset)
+    _, key_length, payload_length, _ = RECORD.unpack(f.read(RECORD.size))
+    return offset + RECORD.size + key_length + payload_length
+
+
+def recover(pack_path):
+    """
+    Índice completo de un pack: el del fichero .idx más los registros que
+    falten en él. Devuelve ([(offset, tipo, clave)], tamaño_válido).
+    """
+    entries = _load_index(pack_path + constants.ARCHIVE_INDEX_SUFFIX)
+    size = os.path.getsize(pack_path)
+    with open(pack_path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{pack_path}' no es un archivo de respuestas de GastroMiner.")
+        # Se descartan entradas que apunten más allá de lo escrito (pack truncado).
+        entries = [entry for entry in entries if entry[0] + RECORD.size <= size]
+        start = _record_end(f, entries[-1][0]) if entries else len(MAGIC)
+        if start > size:
+            entries.pop()
+            start = _record_end(f, entries[-1][0]) if entries else len(MAGIC)
+        tail, valid_size = _scan(f, start, size)
+    return entries + tail, valid_size
+
+
+class PackWriter:
+    """
+    Escritura concurrente (varios workers) de respuestas en el pack. Si el
+    fichero existe se continúa: el pack es acumulativo entre ejecuciones y, al
+    leer, prevalece la respuesta más reciente de cada f_id.
+    """
+
+    def __init__(self, path, level=constants.ARCHIVE_COMPRESSION_LEVEL):
+        self.path = path
+        self.index_path = path + constants.ARCHIVE_INDEX_SUFFIX
+        self.level = level
+        self.records = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self._lock = threading.Lock()
+        self._pack = None
+        self._index = None
+
+    def open(self):
+        """Abre (o crea) el pack, recupera su índice y descarta un registro a medias."""
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            entries, valid_size = recover(self.path)
+            self._pack = open(self.path, 'r+b')
+            self._pack.truncate(valid_size)
+            self._pack.seek(valid_size)
+            # El índice se reescribe si le faltaban registros del pack.
+            with open(self.index_path, 'w', encoding='utf-8') as f:
+                f.writelines(f"{offset}\t{kind}\t{key}\n" for offset, kind, key in entries)
+        else:
+            self._pack = open(self.path, 'wb')
+            self._pack.write(MAGIC)
+            self._pack.flush()
+            open(self.index_path, 'w', encoding='utf-8').close()
+        self._index = open(self.index_path, 'a', encoding='utf-8')
+        return self
+
+    def append(self, unit, content):
+        """Archiva la respuesta de Nivel 2 de una unidad (tupla de f_id)."""
+        self._write(KIND_DETAIL, ','.join(unit), zlib.compress(content, self.level),
+                    zlib.crc32(content), len(content))
+
+    def record_catalog(self, chunks):
+        """
+        Envuelve los trozos de la respuesta de Nivel 1: los deja pasar y, si el
+        catálogo se lee completo, lo archiva (comprimido sobre la marcha).
+        """
+        compressor = zlib.compressobj(self.level)
+        compressed, crc, raw_length = [], 0, 0
+        for chunk in chunks:
+            compressed.append(compressor.compress(chunk))
+            crc = zlib.crc32(chunk, crc)
+            raw_length += len(chunk)
+            yield chunk
+        compressed.append(compressor.flush())
+        self._write(KIND_CATALOG, '', b''.join(compressed), crc, raw_length)
+
+    def _write(self, kind, key, payload, crc, raw_length):
+        key_bytes = key.encode('utf-8')
+        with self._lock:
+            offset = self._pack.tell()
+            self._pack.write(RECORD.pack(kind, len(key_bytes), len(payload), crc) + key_bytes + payload)
+            # Primero el registro, después el índice (ver cabecera del módulo).
+            self._pack.flush()
+            self._index.write(f"{offset}\t{kind}\t{key}\n")
+            self._index.flush()
+            self.records += 1
+            self.raw_bytes += raw_length
+            self.stored_bytes += len(payload)
+
+    def close(self):
+        with self._lock:
+            for f in (self._pack, self._index):
+                if f is not None:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+            self._pack = self._index = None
+
+
+class PackReader:
+    """Lectura aleatoria de un pack a partir de su índice."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries, _ = recover(path)
+        self._file = open(path, 'rb')
+
+    def catalog_ids(self):
+        """IDs del catálogo archivado más reciente, o None si no hay ninguno."""
+        for offset, kind, _ in reversed(self.entries):
+            if kind == KIND_CATALOG:
+                return list(parsers.iter_catalog_ids([self.read(offset)]))
+        return None
+
+    def details(self):
+        """{offset: tupla de f_id pedida} de los registros de Nivel 2."""
+        return {offset: tuple(key.split(',')) for offset, kind, key in self.entries if kind == KIND_DETAIL}
+
+    def latest_offsets(self):
+        """{f_id: offset del registro de Nivel 2 más reciente que lo contiene}."""
+        offsets = {}
+        for offset, unit in self.details().items():
+            for food_id in unit:
+                offsets[food_id] = offset
+        return offsets
+
+    def read(self, offset):
+        """Cuerpo descomprimido del registro en 'offset' (ValueError si está corrupto)."""
+        self._file.seek(offset)
+        _, key_length, payload_length, crc = RECORD.unpack(self._file.read(RECORD.size))
+        self._file.seek(key_length, os.SEEK_CUR)
+        content = zlib.decompress(self._file.read(payload_length))
+        if zlib.crc32(content) != crc:
+            raise ValueError(f"Registro corrupto en el offset {offset} de '{self.path}'.")
+        return content
+
+    def close(self):
+        self._file.close()
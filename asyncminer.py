@@ -0,0 +1,207 @@
+# -----------------------------------------------------------------------------
+# MOTOR DE EXTRACCIÓN ASÍNCRONO (ASYNCIO)
+# -----------------------------------------------------------------------------
+# Variante de GastroMiner que ejecuta las etapas de detalle y persistencia en
+# un bucle de eventos asyncio en lugar de un ThreadPoolExecutor. Un único
+# proceso mantiene cientos de peticiones en vuelo: la concurrencia la limita
+# un semáforo y un pool de conexiones acotado, no el número de hilos.
+# El ritmo global lo fija el mismo limitador adaptativo que el motor de hilos
+# (ratelimit.py), de modo que subir la concurrencia no multiplica la carga
+# sobre el servidor.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from GastroMiner import GastroMiner, IdFeed
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
+import asyncio
+import collections
+import cache as response_cache
+import constants
+import metrics
+import ratelimit
+import time
+
+
+class AsyncGastroMiner(GastroMiner):
+    """
+    Motor asíncrono. Reutiliza de GastroMiner la validación de robots.txt, el
+    catálogo (Nivel 1), el parser y la persistencia; sólo cambia la
+    orquestación de las peticiones de Nivel 2.
+    """
+
+    def __init__(self, max_in_flight=constants.ASYNC_MAX_IN_FLIGHT,
+                 max_connections=constants.ASYNC_MAX_CONNECTIONS, **kwargs):
+        """
+        'max_in_flight' limita las peticiones simultáneas y 'max_connections' el
+        pool de conexiones. El resto de argumentos se delegan en GastroMiner.
+        """
+        super().__init__(**kwargs)
+        self.max_in_flight = max_in_flight
+        self.max_connections = max_connections
+
+    def _mine_catalog(self, food_ids):
+        """Punto de entrada síncrono: ejecuta el pipeline en un bucle de eventos propio."""
+        asyncio.run(self._mine_catalog_async(food_ids))
+
+    async def _mine_catalog_async(self, food_ids):
+        """
+        Despachador asíncrono: mantiene hasta max_in_flight corrutinas activas,
+        reinyecta los reintentos vencidos (retry.RetryScheduler), respeta el
+        circuit breaker y persiste los resultados a medida que llegan.
+        """
+        print(f">>> Bucle asyncio: {self.max_in_flight} peticiones en vuelo, "
+              f"pool de {self.max_connections} conexiones, "
+              f"ritmo inicial {self.rate_limiter.rate:.0f} peticiones/s.")
+
+        loop = asyncio.get_running_loop()
+        # Pool de conexiones acotado (Keep-Alive) y semáforo de peticiones en vuelo.
+        # El ritmo lo marca self.rate_limiter, compartido por todas las corrutinas.
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        trace_configs = [self._connection_trace()] if metrics.registry.enabled else []
+        # Mismos timeouts de socket que el motor de hilos; sin límite total (las
+        # peticiones ya esperan al limitador y al semáforo antes de salir).
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=constants.HTTP_CONNECT_TIMEOUT,
+                                               sock_read=constants.HTTP_READ_TIMEOUT)
+
+        # El parsing (CPU) y el encolado hacia el escritor (que puede bloquear por
+        # contrapresión) salen del hilo del bucle para no congelar los sockets
+        # abiertos. El encolado usa un único hilo: se mantiene el orden de llegada.
+        with ThreadPoolExecutor(max_workers=constants.MAX_WORKERS) as parse_pool, \
+                ThreadPoolExecutor(max_workers=1) as io_pool:
+            async with aiohttp.ClientSession(connector=connector, headers=constants.HEADERS,
+                                             timeout=client_timeout, trace_configs=trace_configs) as session:
+                pending = IdFeed(food_ids)
+                singles = collections.deque()  # IDs que deben pedirse de uno en uno
+                in_flight = {}  # Task -> tupla de f_id
+                completed_count = 0
+
+                while pending or singles or in_flight or len(self.retry_scheduler):
+                    singles.extend(self.retry_scheduler.pop_due())
+                    while ((pending or singles) and len(in_flight) < self.max_in_flight
+                           and self.breaker.allow()):
+                        unit = self._next_work_unit(pending, singles)
+                        task = asyncio.create_task(
+                            self._mine_work_unit_async(session, semaphore, parse_pool, io_pool, unit))
+                        in_flight[task] = unit
+
+                    timeout = self._dispatch_timeout(pending or singles)
+                    if not in_flight:
+                        await asyncio.sleep(timeout)
+                        continue
+                    done, _ = await asyncio.wait(in_flight, timeout=timeout,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        unit = in_flight.pop(task)
+                        # Persistencia (encolado con contrapresión) fuera del bucle
+                        closed = await loop.run_in_executor(io_pool, self._settle_work_unit,
+                                                            unit, task.result(), singles)
+                        for _ in range(closed):
+                            completed_count += 1
+                            if completed_count % 25 == 0 or completed_count == pending.total:
+                                self._print_progress(completed_count, pending.total)
+
+    async def _mine_work_unit_async(self, session, semaphore, parse_pool, io_pool, unit):
+        """
+        [WORKER COROUTINE]
+        Equivalente asíncrono de _mine_work_unit: descarga un ID o un lote y
+        devuelve {f_id: fila}. El parsing nunca se ejecuta en el hilo del bucle.
+        """
+        try:
+            if len(unit) == 1:
+                payload = self._build_detail_payload(unit[0])
+            else:
+                payload = self._build_batch_payload(unit)
+            content, status = await self._fetch_payload(session, semaphore, io_pool, payload)
+            if status != 200:
+                self._warn_http_error(unit, status)
+                return {}
+            if self.archive is not None:
+                await asyncio.get_running_loop().run_in_executor(io_pool, self.archive.append, unit, content)
+            return await self._parse_unit_async(parse_pool, unit, content)
+        except Exception as e:
+            print(f"\n[EXCEPCIÓN WORKER] {self._describe_unit(unit)}: {e}")
+            return {}
+
+    async def _parse_unit_async(self, parse_pool, unit, content):
+        """Parsea en la etapa de procesos si existe; si no, en el pool de hilos."""
+        loop = asyncio.get_running_loop()
+        if self.parse_stage is not None:
+            # submit() puede bloquear por contrapresión: se llama fuera del bucle.
+            future = await loop.run_in_executor(parse_pool, self.parse_stage.submit, unit, content)
+            return await asyncio.wrap_future(future)
+        if len(unit) == 1:
+            row = await loop.run_in_executor(parse_pool, self._parse_food_detail, content)
+            return {unit[0]: row} if row else {}
+        return await loop.run_in_executor(parse_pool, self._parse_food_details, content)
+
+    async def _fetch_payload(self, session, semaphore, io_pool, payload):
+        """Cuerpo y estado de una consulta: caché primero, red limitada si hace falta."""
+        loop = asyncio.get_running_loop()
+        content, status = await self._fetch_cached(loop, io_pool, payload)
+        if content is None:
+            async with semaphore:
+                content, status = await self._post_limited(session, payload)
+            if status == 200 and self.cache is not None:
+                await loop.run_in_executor(io_pool, self.cache.put, self.url, payload, content)
+        return content, status
+
+    async def _post_limited(self, session, payload):
+        """POST tras adquirir un token (sin bloquear el bucle), informando al limitador."""
+        await self.rate_limiter.acquire_async()
+        body = payload.encode('utf-8')
+        start = time.monotonic()
+        try:
+            async with session.post(self.url, data=body) as response:
+                content = await response.read()
+        except Exception:
+            self.rate_limiter.feedback(None, time.monotonic() - start)
+            ratelimit.record_request(None, time.monotonic() - start, len(body), 0)
+            raise
+        latency = time.monotonic() - start
+        self.rate_limiter.feedback(response.status, latency,
+                                   ratelimit.parse_retry_after(response.headers.get('Retry-After')))
+        # aiohttp entrega el cuerpo descomprimido: el tamaño en la red sale de
+        # Content-Length (sin él, p. ej. con chunked, se asume sin comprimir).
+        encoding = response.headers.get('Content-Encoding')
+        wire = int(response.headers.get('Content-Length') or len(content)) if encoding else None
+        ratelimit.record_request(response.status, latency, len(body), len(content), wire, encoding)
+        return content, response.status
+
+    @staticmethod
+    def _connection_trace():
+        """TraceConfig de aiohttp que cuenta las conexiones nuevas y las reutilizadas."""
+        async def on_connection_created(session, context, params):
+            metrics.registry.inc('connections_opened_total')
+
+        async def on_connection_reused(session, context, params):
+            metrics.registry.inc('connections_reused_total')
+
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(on_connection_created)
+        trace.on_connection_reuseconn.append(on_connection_reused)
+        return trace
+
+    async def _fetch_cached(self, loop, io_pool, payload):
+        """
+        Consulta la caché (mismos modos que cache.CachingAdapter). Devuelve
+        (cuerpo, 200) si hay acierto, (b'', 504) si falla en modo 'only' y
+        (None, None) si hay que ir a la red.
+        """
+        if self.cache is None:
+            return None, None
+        if self.cache_mode != 'refresh':
+            body = await loop.run_in_executor(io_pool, self.cache.get, self.url, payload)
+            if body is not None:
+                return body, 200
+        if self.cache_mode == 'only':
+            return b'', response_cache.CACHE_MISS_STATUS
+        return None, None
@@ -0,0 +1,202 @@
+# -----------------------------------------------------------------------------
+# SERVIDOR LOCAL SUSTITUTO DE BEDCA (STAND-IN)
+# -----------------------------------------------------------------------------
+# Responde a las consultas de Nivel 1 y Nivel 2 de procquery.php con datos
+# sintéticos (fixtures.py) o con respuestas grabadas (--fixtures DIR, un
+# fichero <f_id>.xml por alimento), para poder ejecutar, comparar y medir los
+# motores de extracción sin tocar bedca.net. Puede simular un servidor real:
+#   --latency / --jitter   retardo por petición (segundos)
+#   --error-rate           fracción de respuestas de Nivel 2 con HTTP 500
+#   --rate-limit           peticiones/s por encima de las cuales responde 429
+#                          con cabecera Retry-After
+#   --gzip                 comprime las respuestas si el cliente envía
+#                          Accept-Encoding: gzip (como un servidor real)
+#
+# Uso: python bedca_stub.py [--port 8765] [--foods 1000] [--latency 0.05]
+#      python main.py --url http://127.0.0.1:8765/bdpub/procquery.php
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import argparse
+import collections
+import fixtures
+import glob
+import gzip
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUERY_PATH = '/bdpub/procquery.php'
+
+# Extrae la relación (EQUAL o IN) y el valor de la condición 'f_id' del payload
+# de Nivel 2. Con IN, cond3 lleva una lista de IDs separada por comas.
+F_ID_CONDITION = re.compile(
+    r'<atribute1 name="f_id"/>\s*</cond1>\s*<relation type="(EQUAL|IN)"/>\s*<cond3>([^<]*)</cond3>')
+
+# Nodos <food> de una respuesta grabada, para componer respuestas por lotes.
+FOOD_ELEMENT = re.compile(rb'<food>.*?</food>', re.DOTALL)
+
+
+class BedcaStubHandler(BaseHTTPRequestHandler):
+    """Manejador HTTP: robots.txt permisivo y procquery.php sintético."""
+
+    protocol_version = 'HTTP/1.1'  # Keep-Alive, igual que el servidor real
+
+    def do_GET(self):
+        if self.path == '/robots.txt':
+            self._reply(200, b"User-agent: *\nAllow: /\n", 'text/plain')
+        else:
+            self._reply(404, b'', 'text/plain')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8', errors='replace')
+        if self.path != QUERY_PATH:
+            self._reply(404, b'', 'text/plain')
+            return
+        status, retry_after = self.server.simulate(body)
+        if status != 200:
+            self._reply(status, b'', 'text/plain', retry_after)
+            return
+        self._reply(200, self.server.answer(body), 'text/xml')
+
+    def _reply(self, status, content, content_type, retry_after=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if self.server.compress and content and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            content = gzip.compress(content, compresslevel=6)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(content)))
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        # Silencioso: el log por petición distorsiona las mediciones.
+        pass
+
+
+class BedcaStubServer(ThreadingHTTPServer):
+    """
+    Servidor con un catálogo sintético de IDs 1..foods, o con las respuestas
+    grabadas de 'fixtures_dir'. Latencia, errores y límite de ritmo son
+    opcionales; 'seed' hace reproducible la inyección de errores. Con
+    'compress' responde con gzip a los clientes que lo aceptan.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, foods=1000, fixtures_dir=None, latency=0.0, jitter=0.0,
+                 error_rate=0.0, rate_limit=None, seed=None, compress=False):
+        super().__init__(address, BedcaStubHandler)
+        self.compress = compress
+        self.recorded = self._load_recorded(fixtures_dir) if fixtures_dir else None
+        if self.recorded is not None:
+            self.food_ids = sorted(self.recorded, key=lambda food_id: (len(food_id), food_id))
+        else:
+            self.food_ids = [str(food_id) for food_id in range(1, foods + 1)]
+        self._known = set(self.food_ids)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = collections.deque()  # Instantes de las peticiones del último segundo
+
+    @staticmethod
+    def _load_recorded(directory):
+        """Lee <f_id>.xml de un directorio y devuelve {f_id: bytes de sus nodos <food>}."""
+        recorded = {}
+        for path in glob.glob(os.path.join(directory, '*.xml')):
+            food_id = os.path.splitext(os.path.basename(path))[0]
+            with open(path, 'rb') as f:
+                recorded[food_id] = b'\n'.join(FOOD_ELEMENT.findall(f.read()))
+        return recorded
+
+    def simulate(self, body):
+        """
+        Aplica latencia, límite de ritmo y errores. Devuelve (estado, retry_after):
+        200 si la petición debe responderse con normalidad.
+        """
+        with self._lock:
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            fail = self._rng.random() < self.error_rate and '<type level="1"/>' not in body
+            throttled = False
+            if self.rate_limit:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 1.0:
+                    self._recent.popleft()
+                throttled = len(self._recent) >= self.rate_limit
+                if not throttled:
+                    self._recent.append(now)
+        if throttled:
+            return 429, 1
+        if delay:
+            time.sleep(delay)
+        return (500, None) if fail else (200, None)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{QUERY_PATH}"
+
+    def answer(self, body):
+        """Genera la respuesta XML correspondiente al payload recibido."""
+        if '<type level="1"/>' in body:
+            return fixtures.catalog_xml(self.food_ids)
+        match = F_ID_CONDITION.search(body)
+        if match is None:
+            return fixtures.detail_xml([])
+        relation, value = match.groups()
+        requested = value.split(',') if relation == 'IN' else [value]
+        food_ids = [food_id.strip() for food_id in requested if food_id.strip() in self._known]
+        if self.recorded is None:
+            return fixtures.detail_xml(food_ids)
+        parts = [b'<?xml version="1.0" encoding="utf-8"?>\n<foodresponse>']
+        parts.extend(self.recorded[food_id] for food_id in food_ids)
+        parts.append(b'</foodresponse>')
+        return b'\n'.join(parts)
+
+    def start_background(self):
+        """Arranca el servidor en un hilo daemon (uso desde benchmarks)."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Servidor local sustituto de BEDCA")
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8765)
+    arg_parser.add_argument('--foods', type=int, default=1000, help="Tamaño del catálogo sintético")
+    arg_parser.add_argument('--fixtures', help="Directorio con respuestas grabadas (<f_id>.xml)")
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="Retardo medio por petición (s)")
+    arg_parser.add_argument('--jitter', type=float, default=0.0, help="Variación uniforme del retardo (± s)")
+    arg_parser.add_argument('--error-rate', type=float, default=0.0,
+                            help="Fracción de respuestas de Nivel 2 con HTTP 500")
+    arg_parser.add_argument('--rate-limit', type=float,
+                            help="Peticiones/s máximas antes de responder 429 (sin límite por defecto)")
+    arg_parser.add_argument('--seed', type=int, help="Semilla de la inyección de errores y latencia")
+    arg_parser.add_argument('--gzip', action='store_true',
+                            help="Comprime las respuestas con gzip si el cliente lo acepta")
+    args = arg_parser.parse_args()
+
+    server = BedcaStubServer((args.host, args.port), foods=args.foods, fixtures_dir=args.fixtures,
+                             latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             rate_limit=args.rate_limit, seed=args.seed, compress=args.gzip)
+    print(f"[*] Stand-in BEDCA escuchando en {server.url} ({len(server.food_ids)} alimentos)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[*] Servidor detenido.")
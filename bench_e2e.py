@@ -0,0 +1,246 @@
+# -----------------------------------------------------------------------------
+# BENCHMARK DE EXTREMO A EXTREMO (STAND-IN + execute())
+# -----------------------------------------------------------------------------
+# Arranca bedca_stub.py en un subproceso (para que su CPU y su memoria no se
+# mezclen con las del motor), ejecuta GastroMiner.execute() completo contra él
+# y mide:
+#   - alimentos/s (filas escritas / tiempo de pared)
+#   - latencia por petición HTTP: p50 / p95 / p99
+#   - tiempo de CPU del proceso, separando parsing del resto (red, escritura,
+#     despacho); con --parse-processes, la CPU de los procesos de parsing
+#   - pico de memoria residente (RSS)
+# El resultado se guarda en JSON para comparar ejecuciones entre sí.
+#
+# Uso: python bench_e2e.py [--engine threads] [--foods 2000] [--latency 0.02]
+#                          [--error-rate 0.05] [--json resultado.json]
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from main import select_engine
+import argparse
+import collections
+import constants
+import datetime
+import json
+import parsers
+import ratelimit
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+try:
+    import resource  # Sólo Unix: pico de RSS y CPU del proceso
+except ImportError:
+    resource = None
+
+
+class RecordingRateLimiter(ratelimit.AdaptiveRateLimiter):
+    """Limitador que además registra la latencia y el estado de cada petición."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.latencies = []
+        self.statuses = collections.Counter()
+
+    def feedback(self, status, latency, retry_after=None):
+        self.latencies.append(latency)
+        self.statuses[status if status is not None else 'error'] += 1
+        super().feedback(status, latency, retry_after)
+
+
+class ParseTimer:
+    """Envuelve una función de parsing y acumula su tiempo de CPU (por hilo)."""
+
+    def __init__(self, parse):
+        self.parse = parse
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, content):
+        start = time.thread_time()
+        try:
+            return self.parse(content)
+        finally:
+            elapsed = time.thread_time() - start
+            with self._lock:
+                self.seconds += elapsed
+
+
+def percentile(values, fraction):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(args):
+    """Lanza el servidor sustituto en un subproceso y espera a que acepte conexiones."""
+    port = free_port(args.host)
+    command = [sys.executable, os.path.join(here, 'bedca_stub.py'), '--host', args.host,
+               '--port', str(port), '--foods', str(args.foods), '--latency', str(args.latency),
+               '--jitter', str(args.jitter), '--error-rate', str(args.error_rate),
+               '--seed', str(args.seed)]
+    if args.fixtures:
+        command += ['--fixtures', args.fixtures]
+    if args.server_rate_limit:
+        command += ['--rate-limit', str(args.server_rate_limit)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((args.host, port), timeout=0.2).close()
+            return process, f"http://{args.host}:{port}/bdpub/procquery.php"
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("El servidor sustituto no arrancó a tiempo.")
+
+
+def cpu_seconds(who=None):
+    """CPU de usuario + sistema consumida por este proceso (o por sus hijos ya terminados)."""
+    if resource is None:
+        return time.process_time() if who is None else 0.0
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss va en KiB en Linux y en bytes en macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+def run_benchmark(args, url, output_file):
+    """Ejecuta el motor completo y devuelve el diccionario de métricas."""
+    limiter = RecordingRateLimiter(rate=args.rate, burst=args.burst, max_rate=args.rate)
+    engine_options = {}
+    if args.engine == 'async':
+        engine_options = {'max_in_flight': args.max_in_flight, 'max_connections': args.max_connections}
+    miner = select_engine(args.engine)(parser_engine=args.parser, url=url, output_file=output_file,
+                                       rate_limiter=limiter, batch_size=args.batch_size,
+                                       parse_processes=args.parse_processes, ordered=args.ordered,
+                                       **engine_options)
+    miner._parse_food_detail = ParseTimer(miner._parse_food_detail)
+    miner._parse_food_details = ParseTimer(miner._parse_food_details)
+
+    children = resource.RUSAGE_CHILDREN if resource is not None else None
+    cpu_start, children_start, wall_start = cpu_seconds(), cpu_seconds(children), time.perf_counter()
+    miner.execute()
+    wall = time.perf_counter() - wall_start
+    cpu_total = cpu_seconds() - cpu_start
+    # El pool de procesos de parsing termina dentro de execute(): su CPU ya
+    # figura en la de los hijos (el servidor sustituto sigue vivo).
+    cpu_parse_processes = cpu_seconds(children) - children_start if children is not None else 0.0
+    print()
+
+    cpu_parse = miner._parse_food_detail.seconds + miner._parse_food_details.seconds
+    rows = miner.writer.rows_written
+    latencies = sorted(limiter.latencies)
+    return {
+        'foods': rows,
+        'wall_s': round(wall, 3),
+        'foods_per_s': round(rows / wall, 2) if wall else None,
+        'requests': len(latencies),
+        'status_counts': {str(status): count for status, count in sorted(limiter.statuses.items(), key=str)},
+        'latency_ms': {
+            'p50': _ms(percentile(latencies, 0.50)),
+            'p95': _ms(percentile(latencies, 0.95)),
+            'p99': _ms(percentile(latencies, 0.99)),
+            'mean': _ms(sum(latencies) / len(latencies) if latencies else None),
+        },
+        'cpu_s': {
+            'parse': round(cpu_parse, 3),
+            'io_and_other': round(max(0.0, cpu_total - cpu_parse), 3),
+            'total': round(cpu_total, 3),
+            'parse_processes': round(cpu_parse_processes, 3),
+        },
+        'peak_rss_mb': round(peak_rss_mb(), 1) if resource is not None else None,
+        'retries': miner.retry_scheduler.retries,
+        'failed_ids': len(miner.retry_scheduler.failed_ids),
+        'final_rate': round(limiter.rate, 1),
+    }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def parse_arguments():
+    arg_parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo contra el stand-in")
+    arg_parser.add_argument('--engine', choices=constants.ENGINES, default=constants.ENGINE)
+    arg_parser.add_argument('--parser', choices=sorted(parsers.PARSERS), default=constants.PARSER_ENGINE)
+    arg_parser.add_argument('--workers', type=int, default=constants.MAX_WORKERS,
+                            help="Motor threads: MAX_WORKERS (por defecto: %(default)s)")
+    arg_parser.add_argument('--max-in-flight', type=int, default=constants.ASYNC_MAX_IN_FLIGHT)
+    arg_parser.add_argument('--max-connections', type=int, default=constants.ASYNC_MAX_CONNECTIONS)
+    arg_parser.add_argument('--batch-size', type=int, default=constants.BATCH_SIZE)
+    arg_parser.add_argument('--parse-processes', type=int, default=constants.PARSE_PROCESSES,
+                            help="Procesos de parsing (0 = en los workers de red)")
+    arg_parser.add_argument('--ordered', action='store_true', help="Escritura en orden de catálogo")
+    arg_parser.add_argument('--rate', type=float, default=1000.0,
+                            help="Ritmo del limitador del cliente; alto por defecto porque el servidor "
+                                 "es local (por defecto: %(default)s)")
+    arg_parser.add_argument('--burst', type=float, default=100.0)
+    # Servidor sustituto
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--foods', type=int, default=2000, help="Tamaño del catálogo sintético")
+    arg_parser.add_argument('--fixtures', help="Directorio con respuestas grabadas (<f_id>.xml)")
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="Retardo del servidor (s)")
+    arg_parser.add_argument('--jitter', type=float, default=0.0, help="Variación del retardo (± s)")
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help="Fracción de HTTP 500")
+    arg_parser.add_argument('--server-rate-limit', type=float,
+                            help="Peticiones/s a partir de las cuales el servidor responde 429")
+    arg_parser.add_argument('--seed', type=int, default=1)
+    arg_parser.add_argument('--json', help="Fichero de resultados (por defecto: bench-<motor>-<fecha>.json)")
+    return arg_parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    constants.MAX_WORKERS = args.workers
+
+    stub, url = start_stub(args)
+    print(f"[*] Stand-in BEDCA en {url}")
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            metrics = run_benchmark(args, url, os.path.join(workdir, 'bench.csv'))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    finished = datetime.datetime.now()
+    report = {
+        'timestamp': finished.isoformat(timespec='seconds'),
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'results': metrics,
+    }
+    json_path = args.json or f"bench-{args.engine}-{finished.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    latency = metrics['latency_ms']
+    print(f"[*] {metrics['foods']} alimentos en {metrics['wall_s']} s -> {metrics['foods_per_s']} alimentos/s")
+    print(f"[*] Latencia por petición (ms): p50={latency['p50']} p95={latency['p95']} p99={latency['p99']}")
+    print(f"[*] CPU (s): parsing={metrics['cpu_s']['parse']} resto={metrics['cpu_s']['io_and_other']} "
+          f"total={metrics['cpu_s']['total']} procesos de parsing={metrics['cpu_s']['parse_processes']}")
+    print(f"[*] Pico RSS: {metrics['peak_rss_mb']} MiB | peticiones={metrics['requests']} "
+          f"reintentos={metrics['retries']} fallidos={metrics['failed_ids']}")
+    print(f"[*] Resultados guardados en {json_path}")
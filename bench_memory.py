@@ -0,0 +1,184 @@
+# -----------------------------------------------------------------------------
+# BENCHMARK DE MEMORIA FRENTE AL TAMAÑO DEL CATÁLOGO
+# -----------------------------------------------------------------------------
+# Comprueba que el pico de memoria residente (RSS) del motor no depende del
+# número de IDs del catálogo: el catálogo se lee en streaming, el despachador
+# mantiene una ventana acotada de unidades en vuelo y cada fila se libera al
+# pasar al escritor.
+#
+# Cada tamaño se mide en un proceso nuevo contra su propio bedca_stub.py (en
+# otro subproceso, para que su memoria no cuente). Para que un catálogo de
+# 1M IDs se recorra en minutos, la descarga y el parsing de Nivel 2 se
+# sustituyen por una fila fija: se mide el despacho, no el parser. Las filas
+# se descartan en lugar de escribirse a disco.
+#
+# El benchmark falla (código de salida 1) si el pico crece más de
+# --tolerance MiB entre el catálogo más pequeño y el más grande.
+# Con --materialize el catálogo se carga entero en una lista antes de
+# despachar (control: el crecimiento debe detectarse).
+#
+# Uso: python bench_memory.py [--sizes 1000,1000000] [--engine threads]
+#                             [--tolerance 10] [--json memoria.json]
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from bench_e2e import peak_rss_mb, start_stub
+from main import select_engine
+import argparse
+import constants
+import contextlib
+import datetime
+import fixtures
+import json
+import parsers
+import ratelimit
+import subprocess
+import time
+
+
+class DiscardSink:
+    """Sink que cuenta las filas y las descarta."""
+
+    completed_ids = set()
+
+    def __init__(self):
+        self.rows = 0
+
+    def open(self):
+        pass
+
+    def write_rows(self, rows):
+        self.rows += len(rows)
+
+    def flush(self):
+        pass
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CannedDetails:
+    """Mixin que responde cada unidad de Nivel 2 con una copia de una fila fija."""
+
+    template = parsers.parse_food_detail(fixtures.detail_xml(['1']))
+    id_column = list(constants.CSV_HEADER).index('f_id')
+
+    def _canned_rows(self, unit):
+        rows = {}
+        for food_id in unit:
+            row = list(self.template)
+            row[self.id_column] = food_id
+            rows[food_id] = row
+        return rows
+
+    def _mine_work_unit(self, unit):
+        return self._canned_rows(unit)
+
+    async def _mine_work_unit_async(self, session, semaphore, parse_pool, io_pool, unit):
+        return self._canned_rows(unit)
+
+
+class MaterializedCatalog:
+    """Mixin de control: carga el catálogo entero en memoria antes de despachar."""
+
+    def _iter_catalog_ids(self):
+        return list(super()._iter_catalog_ids())
+
+
+def run_child(args):
+    """[PROCESO HIJO] Recorre un catálogo completo y devuelve sus resultados."""
+    mixins = (CannedDetails,) + ((MaterializedCatalog,) if args.materialize else ())
+    engine = type('MemoryBenchMiner', mixins + (select_engine(args.engine),), {})
+    sink = DiscardSink()
+    limiter = ratelimit.AdaptiveRateLimiter(rate=1000.0, burst=100.0, max_rate=1000.0)
+    miner = engine(url=args.url, sink=sink, rate_limiter=limiter, batch_size=args.batch_size)
+    start = time.perf_counter()
+    miner.execute()
+    wall = time.perf_counter() - start
+    return {'foods': sink.rows, 'wall_s': round(wall, 3), 'peak_rss_mb': round(peak_rss_mb(), 1)}
+
+
+def run_point(args, size):
+    """Arranca un stand-in con 'size' IDs y mide un proceso hijo contra él."""
+    stub_args = argparse.Namespace(host=args.host, foods=size, latency=0.0, jitter=0.0, error_rate=0.0,
+                                   seed=1, fixtures=None, server_rate_limit=None)
+    stub, url = start_stub(stub_args)
+    try:
+        command = [sys.executable, os.path.abspath(__file__), '--child', '--url', url,
+                   '--engine', args.engine, '--batch-size', str(args.batch_size)]
+        if args.materialize:
+            command.append('--materialize')
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    finally:
+        stub.terminate()
+        stub.wait()
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def parse_arguments():
+    arg_parser = argparse.ArgumentParser(description="Pico de RSS frente al tamaño del catálogo")
+    arg_parser.add_argument('--sizes', default='1000,1000000',
+                            help="Tamaños de catálogo a medir (por defecto: %(default)s)")
+    arg_parser.add_argument('--engine', choices=constants.ENGINES, default=constants.ENGINE)
+    arg_parser.add_argument('--batch-size', type=int, default=constants.BATCH_SIZE)
+    arg_parser.add_argument('--tolerance', type=float, default=10.0,
+                            help="Crecimiento máximo admitido del pico de RSS en MiB (por defecto: %(default)s)")
+    arg_parser.add_argument('--materialize', action='store_true',
+                            help="Control: carga el catálogo entero en una lista antes de despachar")
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--json', help="Fichero de resultados (por defecto: bench-memory-<fecha>.json)")
+    # Uso interno: medición de un único tamaño en un proceso nuevo
+    arg_parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    arg_parser.add_argument('--url', help=argparse.SUPPRESS)
+    return arg_parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    if args.child:
+        # Los mensajes del motor no deben mezclarse con el JSON del resultado.
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = run_child(args)
+        print(json.dumps(result))
+        sys.exit(0)
+
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    print(f"[*] Motor {args.engine} | catálogos de {', '.join(map(str, sizes))} IDs"
+          + (" | catálogo materializado (control)" if args.materialize else ""))
+    points = []
+    for size in sizes:
+        result = run_point(args, size)
+        points.append({'catalog_size': size, **result})
+        print(f"    {size:>9} IDs: pico RSS {result['peak_rss_mb']:>7.1f} MiB  "
+              f"{result['foods']} filas en {result['wall_s']} s")
+
+    growth = round(points[-1]['peak_rss_mb'] - points[0]['peak_rss_mb'], 1)
+    passed = growth <= args.tolerance and all(p['foods'] == p['catalog_size'] for p in points)
+    finished = datetime.datetime.now()
+    report = {
+        'timestamp': finished.isoformat(timespec='seconds'),
+        'config': {key: value for key, value in vars(args).items() if key not in ('json', 'child', 'url')},
+        'points': points,
+        'rss_growth_mb': growth,
+        'passed': passed,
+    }
+    json_path = args.json or f"bench-memory-{finished.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[*] Resultados guardados en {json_path}")
+    if passed:
+        print(f"[OK] El pico de RSS crece {growth} MiB (tolerancia {args.tolerance} MiB).")
+    else:
+        print(f"[FAIL] El pico de RSS crece {growth} MiB (tolerancia {args.tolerance} MiB) "
+              f"o faltan filas.")
+        sys.exit(1)
@@ -0,0 +1,77 @@
+# -----------------------------------------------------------------------------
+# MICRO-BENCHMARK DE PARSERS DE NIVEL 2
+# -----------------------------------------------------------------------------
+# Compara el parser en streaming ('stream') con el original ('soup') sobre
+# respuestas grabadas (*.xml en un directorio) o, si no se indica ninguno,
+# sobre respuestas sintéticas generadas por fixtures.py. Antes de medir,
+# verifica que ambos motores producen exactamente las mismas filas.
+#
+# Uso: python bench_parser.py [--responses DIR] [--foods N] [--rounds R]
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import argparse
+import fixtures
+import glob
+import parsers
+import time
+
+
+def load_responses(directory, foods):
+    """Lee las respuestas grabadas o genera 'foods' respuestas sintéticas."""
+    if directory:
+        paths = sorted(glob.glob(os.path.join(directory, '*.xml')))
+        responses = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                responses.append(f.read())
+        return responses
+    return [fixtures.detail_xml([food_id]) for food_id in range(1, foods + 1)]
+
+
+def run(engine, responses, rounds):
+    """Devuelve el mejor tiempo (s) de 'rounds' pasadas completas del motor indicado."""
+    parse = parsers.PARSERS[engine]
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for content in responses:
+            parse(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Micro-benchmark de parsers de Nivel 2")
+    arg_parser.add_argument('--responses', help="Directorio con respuestas grabadas (*.xml)")
+    arg_parser.add_argument('--foods', type=int, default=500, help="Respuestas sintéticas a generar")
+    arg_parser.add_argument('--rounds', type=int, default=3, help="Repeticiones (se toma la mejor)")
+    args = arg_parser.parse_args()
+
+    responses = load_responses(args.responses, args.foods)
+    if not responses:
+        print("[FATAL] No hay respuestas que medir.")
+        sys.exit(1)
+    total_bytes = sum(len(r) for r in responses)
+    print(f"[*] {len(responses)} respuestas ({total_bytes / 1024:.0f} KiB)")
+
+    # Verificación de equivalencia antes de medir
+    mismatches = [i for i, content in enumerate(responses)
+                  if parsers.PARSERS['stream'](content) != parsers.PARSERS['soup'](content)]
+    if mismatches:
+        print(f"[ERROR] {len(mismatches)} respuestas difieren entre motores (primera: #{mismatches[0]}).")
+        sys.exit(1)
+    print("[*] Ambos motores producen filas idénticas.")
+
+    results = {engine: run(engine, responses, args.rounds) for engine in parsers.PARSERS}
+    for engine, seconds in results.items():
+        rate = len(responses) / seconds
+        print(f"    {engine:<7}: {seconds * 1000:8.1f} ms  ({rate:8.0f} respuestas/s)")
+    print(f"[*] Aceleración stream/soup: x{results['soup'] / results['stream']:.1f}")
@@ -0,0 +1,96 @@
+# -----------------------------------------------------------------------------
+# BENCHMARK DE ESCALADO DEL PARSING CON EL NÚMERO DE NÚCLEOS
+# -----------------------------------------------------------------------------
+# Ejecuta bench_e2e.py varias veces variando --parse-processes (0 = parsing en
+# los workers de red, bajo el GIL) y resume alimentos/s y CPU por ejecución.
+# Cada medición corre en un proceso nuevo, con su propio servidor sustituto,
+# para que ni la memoria ni la CPU de una ejecución contaminen la siguiente.
+# Para que el parsing domine, el servidor no añade latencia por defecto y el
+# parser 'soup' (más costoso) está disponible con --parser.
+#
+# Uso: python bench_scaling.py [--processes 0,1,2,4] [--foods 3000] [--json escalado.json]
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import argparse
+import constants
+import datetime
+import json
+import parsers
+import parsestage
+import subprocess
+import tempfile
+
+
+def default_process_counts():
+    """0 (sin pool) y potencias de dos hasta los núcleos disponibles."""
+    cores = parsestage.available_cores()
+    counts, n = [0], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    counts.append(cores)
+    return counts
+
+
+def run_point(args, processes, workdir):
+    """Lanza bench_e2e.py con 'processes' procesos de parsing y devuelve sus resultados."""
+    json_path = os.path.join(workdir, f"p{processes}.json")
+    command = [sys.executable, os.path.join(here, 'bench_e2e.py'), '--engine', args.engine,
+               '--parser', args.parser, '--foods', str(args.foods), '--workers', str(args.workers),
+               '--batch-size', str(args.batch_size), '--latency', str(args.latency),
+               '--parse-processes', str(processes), '--json', json_path]
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    with open(json_path, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Escalado del parsing con el número de procesos")
+    arg_parser.add_argument('--processes', help="Lista de procesos a medir, p. ej. 0,1,2,4 "
+                                                "(por defecto: 0 y potencias de dos hasta los núcleos)")
+    arg_parser.add_argument('--engine', choices=constants.ENGINES, default=constants.ENGINE)
+    arg_parser.add_argument('--parser', choices=sorted(parsers.PARSERS), default=constants.PARSER_ENGINE)
+    arg_parser.add_argument('--foods', type=int, default=3000)
+    arg_parser.add_argument('--workers', type=int, default=constants.MAX_WORKERS)
+    arg_parser.add_argument('--batch-size', type=int, default=constants.BATCH_SIZE)
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="Retardo del servidor (s)")
+    arg_parser.add_argument('--json', help="Fichero de resultados (por defecto: bench-scaling-<fecha>.json)")
+    args = arg_parser.parse_args()
+
+    counts = ([int(n) for n in args.processes.split(',')] if args.processes
+              else default_process_counts())
+    print(f"[*] Núcleos disponibles: {parsestage.available_cores()} | puntos: {counts}")
+
+    points = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for processes in counts:
+            results = run_point(args, processes, workdir)
+            points.append({'parse_processes': processes, **results})
+            print(f"    procesos={processes:<3} {results['foods_per_s']:>9.1f} alimentos/s  "
+                  f"CPU principal={results['cpu_s']['total']:.2f} s  "
+                  f"CPU parsing en hijos={results['cpu_s']['parse_processes']:.2f} s")
+
+    baseline = points[0]['foods_per_s']
+    for point in points:
+        point['speedup'] = round(point['foods_per_s'] / baseline, 2) if baseline else None
+    finished = datetime.datetime.now()
+    report = {
+        'timestamp': finished.isoformat(timespec='seconds'),
+        'cores': parsestage.available_cores(),
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'points': points,
+    }
+    json_path = args.json or f"bench-scaling-{finished.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[*] Aceleración frente a procesos={counts[0]}: "
+          + ", ".join(f"{p['parse_processes']}->x{p['speedup']}" for p in points))
+    print(f"[*] Resultados guardados en {json_path}")
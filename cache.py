@@ -0,0 +1,154 @@
+# -----------------------------------------------------------------------------
+# CACHÉ DE RESPUESTAS EN DISCO
+# -----------------------------------------------------------------------------
+# Guarda las respuestas 200 de procquery.php en un único fichero SQLite,
+# indexadas por un hash de (URL, payload) y comprimidas con zlib. Soporta
+# caducidad (TTL) y expulsión LRU contra un presupuesto de bytes.
+#
+# Se integra bajo la sesión de requests mediante CachingAdapter, de modo que
+# GastroMiner no cambia su lógica: session.post() devuelve la respuesta
+# cacheada cuando existe. Modos:
+#   'normal'  -> lee de caché y, si falla, va a la red y guarda.
+#   'refresh' -> ignora lo cacheado, va siempre a la red y reescribe.
+#   'only'    -> nunca toca la red; un fallo de caché devuelve un 504 sintético.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import constants
+import hashlib
+import metrics
+import requests
+import sqlite3
+import threading
+import time
+import zlib
+from ratelimit import RateLimitedAdapter
+
+CACHE_MODES = ('normal', 'refresh', 'only')
+
+# Código devuelto en modo 'only' cuando la petición no está en caché.
+CACHE_MISS_STATUS = 504
+
+
+def cache_key(url, payload):
+    """Clave estable de una petición: SHA-256 de URL y cuerpo."""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    return hashlib.sha256(url.encode('utf-8') + b'\n' + (payload or b'')).hexdigest()
+
+
+class ResponseCache:
+    """Almacén SQLite de cuerpos de respuesta comprimidos, seguro entre hilos."""
+
+    def __init__(self, path=constants.CACHE_FILE, ttl=constants.CACHE_TTL,
+                 max_bytes=constants.CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                                key TEXT PRIMARY KEY,
+                                created REAL NOT NULL,
+                                accessed REAL NOT NULL,
+                                size INTEGER NOT NULL,
+                                body BLOB NOT NULL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url, payload):
+        """Devuelve el cuerpo (bytes) cacheado y vigente, o None."""
+        key = cache_key(url, payload)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT created, body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl is not None and now - row[0] > self.ttl):
+                self.misses += 1
+                metrics.registry.inc('cache_requests_total', result='miss' if row is None else 'expired')
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            metrics.registry.inc('cache_requests_total', result='hit')
+        return zlib.decompress(row[1])
+
+    def put(self, url, payload, body):
+        """Guarda un cuerpo de respuesta y expulsa entradas LRU si se supera el presupuesto."""
+        key = cache_key(url, payload)
+        blob = zlib.compress(body, constants.CACHE_COMPRESSION_LEVEL)
+        now = time.time()
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO responses (key, created, accessed, size, body) "
+                             "VALUES (?, ?, ?, ?, ?)", (key, now, now, len(blob), blob))
+            self._total_bytes += len(blob) - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Borra las entradas menos usadas hasta quedar al 90 % del presupuesto."""
+        target = self.max_bytes * 0.9
+        victims = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed ASC"):
+            if self._total_bytes <= target:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CachingAdapter(RateLimitedAdapter):
+    """
+    Adaptador de transporte de requests que consulta ResponseCache antes de la
+    red. Sólo las peticiones que realmente salen a la red pasan por el
+    limitador de ritmo heredado: los aciertos no consumen tokens.
+    """
+
+    def __init__(self, cache, mode='normal', **kwargs):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Modo de caché desconocido: {mode}")
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.mode = mode
+
+    def send(self, request, **kwargs):
+        if request.method != 'POST':
+            return super().send(request, **kwargs)
+        if self.mode != 'refresh':
+            body = self.cache.get(request.url, request.body)
+            if body is not None:
+                return self._build_response(request, 200, body)
+        if self.mode == 'only':
+            return self._build_response(request, CACHE_MISS_STATUS, b'')
+        response = super().send(request, **kwargs)
+        if response.status_code == 200:
+            self.cache.put(request.url, request.body, response.content)
+        return response
+
+    @staticmethod
+    def _build_response(request, status, body):
+        """Respuesta de requests construida desde la caché (sin conexión)."""
+        response = requests.Response()
+        response.status_code = status
+        response._content = body
+        response._content_consumed = True  # iter_content() sirve el cuerpo ya en memoria
+        response.headers['Content-Type'] = 'text/xml'
+        response.headers['X-Cache'] = 'HIT' if status == 200 else 'MISS'
+        response.url = request.url
+        response.request = request
+        response.encoding = None
+        return response
@@ -0,0 +1,77 @@
+# -----------------------------------------------------------------------------
+# VERIFICACIÓN DE EQUIVALENCIA ENTRE MOTORES
+# -----------------------------------------------------------------------------
+# Arranca el servidor sustituto (bedca_stub.py) en segundo plano, ejecuta los
+# motores 'threads' y 'async' contra él y compara los CSV resultantes:
+# cabecera idéntica y mismas filas. Las filas se comparan ordenadas porque
+# ambos motores escriben en orden de finalización, no de catálogo; con
+# --ordered se comparan tal cual y deben seguir el orden del catálogo.
+#
+# Uso: python check_engines.py [--foods 300] [--batch-size 1] [--parse-processes 0] [--ordered]
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from GastroMiner import GastroMiner
+from asyncminer import AsyncGastroMiner
+from bedca_stub import BedcaStubServer
+import argparse
+import csv
+import tempfile
+
+ENGINE_CLASSES = {'threads': GastroMiner, 'async': AsyncGastroMiner}
+
+
+def run_engine(name, url, output_file, batch_size=1, parse_processes=0, ordered=False):
+    """
+    Ejecuta un motor completo contra 'url' y devuelve (cabecera, filas): en el
+    orden escrito con 'ordered', ordenadas en otro caso.
+    """
+    ENGINE_CLASSES[name](url=url, output_file=output_file, batch_size=batch_size,
+                         parse_processes=parse_processes, ordered=ordered).execute()
+    print()
+    with open(output_file, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    return rows[0], rows[1:] if ordered else sorted(rows[1:])
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compara los CSV de los motores threads y async")
+    arg_parser.add_argument('--foods', type=int, default=300, help="Tamaño del catálogo sintético")
+    arg_parser.add_argument('--batch-size', type=int, default=1, help="IDs por consulta de Nivel 2")
+    arg_parser.add_argument('--parse-processes', type=int, default=0, help="Procesos de parsing (0 = en los workers)")
+    arg_parser.add_argument('--ordered', action='store_true', help="Modo ordenado: filas en orden de catálogo")
+    args = arg_parser.parse_args()
+
+    server = BedcaStubServer(('127.0.0.1', 0), foods=args.foods)
+    server.start_background()
+    print(f"[*] Stand-in BEDCA en {server.url} ({args.foods} alimentos)")
+
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            results = {name: run_engine(name, server.url, os.path.join(workdir, f"{name}.csv"),
+                                         args.batch_size, args.parse_processes, args.ordered)
+                       for name in ENGINE_CLASSES}
+    finally:
+        server.shutdown()
+
+    (threads_header, threads_rows), (async_header, async_rows) = results['threads'], results['async']
+    if threads_header != async_header:
+        print("[ERROR] Las cabeceras difieren entre motores.")
+        sys.exit(1)
+    if len(threads_rows) != args.foods or threads_rows != async_rows:
+        print(f"[ERROR] Filas distintas: threads={len(threads_rows)} async={len(async_rows)} "
+              f"(esperadas {args.foods}).")
+        sys.exit(1)
+    id_column = threads_header.index('f_id')
+    if args.ordered and [row[id_column] for row in threads_rows] != server.food_ids:
+        print("[ERROR] El modo ordenado no respeta el orden del catálogo.")
+        sys.exit(1)
+    print(f"[OK] Ambos motores producen el mismo CSV ({len(threads_rows)} filas, "
+          f"{'en orden de catálogo' if args.ordered else 'ordenadas'}).")
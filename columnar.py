@@ -0,0 +1,236 @@
+# -----------------------------------------------------------------------------
+# SALIDA COLUMNAR TIPADA (PARQUET / ARROW IPC + MATRIZ NUMPY)
+# -----------------------------------------------------------------------------
+# Sink alternativo al CSV de cadenas. Escribe el esquema CSV_HEADER con tipos:
+#   - f_id como entero, metadatos como texto (sci_name como categoría) y
+#     edible_portion como float32.
+#   - Cada nutriente de DETAIL_LIST como float32 con nulos reales (en lugar
+#     del literal EMPTY) y una columna '<nutriente>__flag' con el marcador de
+#     'value_type' ('tr', 'ND', ...) cuando BEDCA no da valor numérico.
+# Junto al fichero Parquet/Arrow se genera una matriz NumPy memory-mappable:
+#   <base>.nutrients.npy  float32 (alimentos x nutrientes), NaN = sin valor
+#   <base>.ids.npy        int64, f_id de cada fila de la matriz (-1 si falta)
+#   <base>.nutrients.json nombres de columna de la matriz
+# La matriz se escribe en streaming (fichero .part) y sólo recibe su cabecera
+# .npy al cerrar, de modo que la memoria no crece con el catálogo.
+#
+# Uso: python columnar.py nutritional-info.csv [--output nutritional-info.parquet]
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import argparse
+import constants
+import csv
+import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shutil
+
+FLAG_SUFFIX = '__flag'
+MATRIX_SUFFIX = '.nutrients.npy'
+IDS_SUFFIX = '.ids.npy'
+COLUMNS_SUFFIX = '.nutrients.json'
+MISSING_ID = -1  # f_id en ids.npy de una fila sin identificador
+
+# Tipo de cada metadato de BASIC_LIST; los no listados se guardan como texto.
+BASIC_TYPES = {
+    'f_id': pa.int64(),
+    'sci_name': pa.dictionary(pa.int32(), pa.string()),
+    'edible_portion': pa.float32(),
+}
+
+
+def parse_value(text):
+    """
+    Separa una celda nutricional en (valor, marcador):
+    '12.5' -> (12.5, None), 'tr' -> (None, 'tr'), EMPTY o '' -> (None, None).
+    """
+    if not text or text == constants.EMPTY:
+        return None, None
+    try:
+        return float(text), None
+    except ValueError:
+        return None, text
+
+
+def arrow_schema(header=constants.CSV_HEADER, nutrients=constants.DETAIL_LIST):
+    """Esquema Arrow: metadatos, nutrientes float32 y sus columnas de marcador."""
+    fields = [pa.field(name, BASIC_TYPES.get(name, pa.string()))
+              for name in header if name not in nutrients]
+    fields += [pa.field(name, pa.float32()) for name in nutrients]
+    fields += [pa.field(name + FLAG_SUFFIX, pa.dictionary(pa.int8(), pa.string())) for name in nutrients]
+    return pa.schema(fields)
+
+
+def record_batch(rows, schema, header=constants.CSV_HEADER, nutrients=constants.DETAIL_LIST):
+    """Convierte filas de cadenas (orden 'header') en un RecordBatch tipado."""
+    columns = dict(zip(header, zip(*rows))) if rows else {name: () for name in header}
+    arrays = {}
+    for name in header:
+        values = columns[name]
+        if name in nutrients:
+            parsed = [parse_value(value) for value in values]
+            arrays[name] = pa.array([number for number, _ in parsed], pa.float32())
+            arrays[name + FLAG_SUFFIX] = pa.array([flag for _, flag in parsed],
+                                                  pa.string()).dictionary_encode()
+            continue
+        kind = BASIC_TYPES.get(name, pa.string())
+        if kind == pa.int64():
+            arrays[name] = pa.array([None if value == constants.EMPTY else int(value)
+                                     for value in values], kind)
+        elif kind == pa.float32():
+            arrays[name] = pa.array([parse_value(value)[0] for value in values], kind)
+        else:
+            texts = pa.array([None if value == constants.EMPTY else value for value in values], pa.string())
+            arrays[name] = texts.dictionary_encode() if pa.types.is_dictionary(kind) else texts
+    return pa.record_batch([arrays[field.name].cast(field.type) for field in schema], schema=schema)
+
+
+class ColumnarSink:
+    """
+    Sink de writers.RowWriter que escribe Parquet ('parquet') o Arrow IPC
+    ('arrow') más la matriz .npy de nutrientes. Acumula filas hasta
+    'row_group_size' para no generar grupos diminutos en cada lote del escritor.
+    """
+
+    def __init__(self, path, fmt=None, row_group_size=constants.COLUMNAR_ROW_GROUP_SIZE):
+        self.path = path
+        self.format = fmt or ('arrow' if path.endswith(('.arrow', '.feather')) else 'parquet')
+        if self.format not in ('parquet', 'arrow'):
+            raise ValueError(f"Formato columnar desconocido: {self.format}")
+        base = os.path.splitext(path)[0]
+        self.matrix_path = base + MATRIX_SUFFIX
+        self.ids_path = base + IDS_SUFFIX
+        self.columns_path = base + COLUMNS_SUFFIX
+        self.row_group_size = row_group_size
+        self.schema = arrow_schema()
+        self.completed_ids = set()  # Sin reanudación: siempre se reescribe
+        self.rows = 0
+        self._pending = []
+        self._writer = None
+        self._matrix = None
+        self._ids = None
+
+    def open(self):
+        if self.format == 'parquet':
+            self._writer = pq.ParquetWriter(self.path, self.schema, compression='zstd')
+        else:
+            self._writer = pa.ipc.new_file(self.path, self.schema)
+        self._matrix = open(self.matrix_path + '.part', 'wb')
+        self._ids = open(self.ids_path + '.part', 'wb')
+
+    def write_rows(self, rows):
+        self._pending.extend(rows)
+        if len(self._pending) >= self.row_group_size:
+            self._write_pending()
+
+    def _write_pending(self):
+        if not self._pending:
+            return
+        batch = record_batch(self._pending, self.schema)
+        self._writer.write_batch(batch)
+        matrix = np.column_stack([batch.column(name).to_numpy(zero_copy_only=False)
+                                  for name in constants.DETAIL_LIST])
+        self._matrix.write(np.ascontiguousarray(matrix, dtype='<f4').tobytes())
+        ids = batch.column('f_id').fill_null(MISSING_ID).to_numpy()
+        self._ids.write(np.asarray(ids, dtype='<i8').tobytes())
+        self.rows += len(self._pending)
+        self._pending = []
+
+    def flush(self):
+        # Las filas pendientes esperan a completar un grupo; sólo se vacían buffers.
+        self._matrix.flush()
+        self._ids.flush()
+
+    def sync(self):
+        self.flush()
+        os.fsync(self._matrix.fileno())
+        os.fsync(self._ids.fileno())
+
+    def close(self):
+        """Escribe el último grupo, cierra el fichero tabular y publica la matriz .npy."""
+        if self._writer is None:
+            return
+        try:
+            self._write_pending()
+        finally:
+            self._writer.close()
+            self._writer = None
+            self._matrix.close()
+            self._ids.close()
+        columns = len(constants.DETAIL_LIST)
+        _publish_npy(self.matrix_path, '<f4', (self.rows, columns))
+        _publish_npy(self.ids_path, '<i8', (self.rows,))
+        with open(self.columns_path, 'w', encoding='utf-8') as f:
+            json.dump({'columns': list(constants.DETAIL_LIST), 'rows': self.rows}, f, ensure_ascii=False)
+
+
+def _publish_npy(path, dtype, shape):
+    """Antepone la cabecera .npy al volcado crudo '<path>.part' y lo renombra a 'path'."""
+    part_path = path + '.part'
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as out, open(part_path, 'rb') as raw:
+        np.lib.format.write_array_header_1_0(out, {'descr': dtype, 'fortran_order': False, 'shape': shape})
+        shutil.copyfileobj(raw, out)
+    os.replace(tmp_path, path)
+    os.remove(part_path)
+
+
+def load_table(path):
+    """Carga la tabla tipada; Arrow IPC se lee sin copia sobre un memory map."""
+    if path.endswith(('.arrow', '.feather')):
+        return pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return pq.read_table(path, memory_map=True)
+
+
+def load_matrix(path):
+    """
+    Devuelve (ids, matriz, columnas) de un dataset columnar. 'path' es el
+    fichero Parquet/Arrow o su base; ids y matriz son memory maps de sólo lectura.
+    """
+    base = os.path.splitext(path)[0] if path.endswith(('.parquet', '.arrow', '.feather')) else path
+    ids = np.load(base + IDS_SUFFIX, mmap_mode='r')
+    matrix = np.load(base + MATRIX_SUFFIX, mmap_mode='r')
+    with open(base + COLUMNS_SUFFIX, encoding='utf-8') as f:
+        columns = json.load(f)['columns']
+    return ids, matrix, columns
+
+
+def convert_csv(csv_path, output_path, fmt=None):
+    """Convierte un CSV de GastroMiner al formato columnar en streaming. Devuelve las filas escritas."""
+    sink = ColumnarSink(output_path, fmt)
+    sink.open()
+    try:
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            if tuple(next(reader)) != tuple(constants.CSV_HEADER):
+                raise ValueError(f"La cabecera de '{csv_path}' no coincide con CSV_HEADER.")
+            batch = []
+            for row in reader:
+                batch.append(row)
+                if len(batch) >= constants.WRITER_BATCH_SIZE:
+                    sink.write_rows(batch)
+                    batch = []
+            sink.write_rows(batch)
+    finally:
+        sink.close()
+    return sink.rows
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Convierte un CSV de GastroMiner a Parquet/Arrow + .npy")
+    arg_parser.add_argument('csv', help="CSV de entrada (esquema CSV_HEADER)")
+    arg_parser.add_argument('--output', help="Fichero de salida .parquet o .arrow (por defecto: junto al CSV)")
+    args = arg_parser.parse_args()
+
+    output = args.output or os.path.splitext(args.csv)[0] + '.parquet'
+    rows = convert_csv(args.csv, output)
+    print(f"[*] {rows} alimentos escritos en '{output}' y '{os.path.splitext(output)[0] + MATRIX_SUFFIX}'.")
@@ -46,10 +46,79 @@ DETAIL_LIST = (
 
 # --- PERSISTENCIA (IO SETTINGS) ---
 CSV_OUTPUT_FILE = "nutritional-info.csv"
+# Diario de IDs completados (para --resume): se guarda junto al CSV de salida.
+JOURNAL_SUFFIX = ".journal"
 # El encabezado se actualiza automáticamente al modificar BASIC_LIST
 CSV_HEADER = BASIC_LIST + DETAIL_LIST 
 EMPTY = 'NA'  # Marcador para valores nulos o no disponibles
 
+# Etapa de escritura: capacidad de la cola, filas por lote y volcado máximo
+# (segundos) aunque el lote no esté completo.
+WRITER_QUEUE_SIZE = 1000
+WRITER_BATCH_SIZE = 100
+WRITER_FLUSH_INTERVAL = 1.0
+# Modo ordenado (--ordered): filas fuera de orden retenidas en memoria antes de
+# volcarlas a un fichero temporal (ver writers.ReorderBuffer).
+REORDER_BUFFER_SIZE = 1000
+
+# Sincronización incremental (ver delta.py): manifiesto de hashes e informe de
+# cambios junto al CSV, fracción de IDs conocidos revalidados al azar en cada
+# sincronización y antigüedad máxima (segundos) sin revalidar un ID.
+MANIFEST_SUFFIX = ".manifest.json"
+CHANGES_SUFFIX = ".changes.json"
+SYNC_SAMPLE_RATE = 0.05
+SYNC_MAX_AGE = 30 * 24 * 3600
+
+# Rastreo por fragmentos (ver shard.py): manifiesto y lista de IDs asignados
+# junto a la salida de cada fragmento, informe de la fusión y filas por
+# tramo ordenado en memoria durante la fusión (acota su consumo de memoria).
+SHARD_MANIFEST_SUFFIX = ".shard.json"
+SHARD_IDS_SUFFIX = ".shard-ids"
+MERGE_REPORT_SUFFIX = ".merge.json"
+MERGE_RUN_ROWS = 50000
+
+# Formatos de salida: CSV de cadenas, columnar tipado (ver columnar.py) o base
+# SQLite (ver database.py), y filas por grupo (row group / record batch) de la
+# salida columnar.
+OUTPUT_FORMATS = ('csv', 'parquet', 'arrow', 'sqlite')
+COLUMNAR_ROW_GROUP_SIZE = 10000
+# Salida SQLite: nutrientes con índice propio (creado tras la carga) y filas por
+# transacción al convertir un CSV (en el motor, cada lote del escritor).
+SQLITE_INDEXED_NUTRIENTS = ('energía, total', 'proteina, total', 'grasa, total (lipidos totales)',
+                            'carbohidratos', 'fibra, dietetica total', 'sodio')
+SQLITE_TRANSACTION_ROWS = 5000
+
+# --- CACHÉ DE RESPUESTAS (ver cache.py) ---
+CACHE_FILE = "bedca-cache.sqlite"
+CACHE_TTL = 7 * 24 * 3600               # Vigencia de una respuesta cacheada (segundos)
+CACHE_MAX_BYTES = 512 * 1024 * 1024     # Presupuesto en disco (bytes comprimidos)
+CACHE_COMPRESSION_LEVEL = 6             # Nivel zlib de los cuerpos almacenados
+
+# --- ARCHIVO DE RESPUESTAS CRUDAS (ver archive.py) ---
+ARCHIVE_INDEX_SUFFIX = ".idx"           # Índice registro -> f_id junto al pack
+ARCHIVE_COMPRESSION_LEVEL = 6           # Nivel zlib de cada respuesta archivada
+
+# --- SERVICIO DE CONSULTA (ver foodstore.py y foodserver.py) ---
+QUERY_HOST = "127.0.0.1"
+QUERY_PORT = 8780
+QUERY_RESULT_LIMIT = 50                 # Resultados por defecto de búsquedas y rangos
+FUZZY_MIN_SCORE = 0.3                   # Puntuación de Dice mínima de la búsqueda aproximada
+QUERY_RELOAD_INTERVAL = 2.0             # Segundos entre comprobaciones del fichero del dataset
+QUERY_RELOAD_SETTLE = 5.0               # Segundos sin cambios antes de recargar (escritura terminada)
+
+# --- SIMILITUD NUTRICIONAL (ver similarity.py) ---
+SIMILARITY_K = 10                       # Vecinos por consulta
+SIMILARITY_MIN_COVERAGE = 0.3           # Fracción mínima de alimentos con valor para usar un nutriente
+SIMILARITY_BLOCK_BYTES = 64 * 1024 * 1024  # Memoria del bloque de similitudes del modo por lotes
+
+# --- PERFILADO DE ESQUEMA (ver descubridosnombres.py) ---
+PROFILE_SAMPLE_RATE = 0.1               # Fracción del catálogo que se perfila
+
+# --- COMPARACIÓN DE DATASETS (ver datasetdiff.py) ---
+DIFF_RTOL = 1e-6                        # Tolerancia relativa entre valores numéricos
+DIFF_ATOL = 0.0                         # Tolerancia absoluta (se suma a la relativa)
+DIFF_REPORT_LIMIT = 20                  # Alimentos listados por categoría en el informe de consola
+
 # --- CONECTIVIDAD (NETWORK ENDPOINTS) ---
 HOME_URL = "http://www.bedca.net"
 URL = HOME_URL + "/bdpub/procquery.php"
@@ -57,16 +126,89 @@ ROBOTS_URL = HOME_URL + "/robots.txt"
 
 # Identidad del Agente: Es buena práctica identificarse claramente ante el servidor
 USER_AGENT = 'GastroMiner-Bot/2.2 (Educational Research)'
-HEADERS = {'Content-Type': 'text/xml', 'User-Agent': USER_AGENT}
+# Accept-Encoding explícito: las respuestas XML de Nivel 2 comprimen muy bien.
+HEADERS = {'Content-Type': 'text/xml', 'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip, deflate'}
+
+# Timeouts de red (segundos): establecimiento de la conexión y espera entre
+# lecturas del socket (no es el tiempo total de la descarga).
+HTTP_CONNECT_TIMEOUT = 10.0
+HTTP_READ_TIMEOUT = 60.0
 
 # --- TUNING DE RENDIMIENTO (CONCURRENCY & THROTTLING) ---
 
 # Número de hilos de ejecución paralela.
 MAX_WORKERS = 10 
 
-# Latencia inyectada entre peticiones (Throttling) en segundos.
+# Latencia entre peticiones de un worker (segundos) del antiguo throttling fijo.
+# Ya no se aplica como sleep: sólo define el techo RATE_MAX.
 FIXED_DELAY = 0.1 
 
+# Limitador de ritmo global adaptativo (ver ratelimit.py), compartido por todos
+# los workers. Sustituye al sleep fijo por worker: el ritmo parte de RATE_LIMIT
+# peticiones/s (con ráfagas de RATE_BURST) y se ajusta entre RATE_MIN y RATE_MAX.
+RATE_LIMIT = 20.0
+RATE_BURST = 10
+RATE_MIN = 1.0
+RATE_MAX = MAX_WORKERS / FIXED_DELAY     # Techo histórico del motor de hilos
+RATE_INCREASE = 2.0                      # Aumento aditivo (req/s) por segundo sano
+RATE_DECREASE_FACTOR = 0.5               # Reducción ante 429/5xx o error de red
+RATE_LATENCY_DECREASE_FACTOR = 0.8       # Reducción ante latencia creciente
+RATE_LATENCY_FACTOR = 2.0                # Latencia reciente / línea base que se considera degradada
+RATE_COOLDOWN = 1.0                      # Segundos mínimos entre dos reducciones
+
+# Reintentos de descargas fallidas (ver retry.py): intentos máximos por ID y
+# backoff exponencial con jitter entre RETRY_BASE_DELAY y RETRY_MAX_DELAY segundos.
+RETRY_MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+# Circuit breaker: si en las últimas BREAKER_WINDOW respuestas (mínimo
+# BREAKER_MIN_SAMPLES) fallan más de BREAKER_THRESHOLD, se pausa todo el
+# despacho BREAKER_COOLDOWN segundos.
+BREAKER_WINDOW = 50
+BREAKER_MIN_SAMPLES = 20
+BREAKER_THRESHOLD = 0.5
+BREAKER_COOLDOWN = 30.0
+
+# IDs por consulta de Nivel 2 (1 = una petición por alimento, comportamiento clásico).
+BATCH_SIZE = 1
+# Lotes consecutivos sin ninguna fila tras los que se desactiva el modo por lotes
+# (el servidor no parece admitir la relación IN).
+BATCH_DISABLE_AFTER = 3
+
+# Trozo de lectura (bytes) de la respuesta de Nivel 1, parseada en streaming.
+CATALOG_CHUNK_SIZE = 64 * 1024
+
+# Cadencia máxima (segundos) con la que el despachador revisa reintentos vencidos.
+DISPATCH_POLL_INTERVAL = 0.5
+
+# Etapa de parsing en procesos (ver parsestage.py): procesos del pool (0 = se
+# parsea en los propios workers de red), respuestas por trozo enviado al pool,
+# capacidad de la cola de entrada y espera máxima (s) para completar un trozo.
+PARSE_PROCESSES = 0
+PARSE_CHUNK_SIZE = 16
+PARSE_QUEUE_SIZE = 256
+PARSE_LINGER = 0.005
+
+# Métricas (ver metrics.py): límites (segundos) de los cubos de los histogramas
+# y cadencia de reescritura del fichero Prometheus durante la ejecución.
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_EXPORT_INTERVAL = 10.0
+
+# Motor de orquestación: 'threads' (ThreadPoolExecutor) o 'async' (asyncio + aiohttp).
+ENGINE = 'threads'
+ENGINES = ('threads', 'async')
+
+# Motor 'async': peticiones simultáneas en vuelo (semáforo) y tamaño del pool
+# de conexiones HTTP reutilizables.
+ASYNC_MAX_IN_FLIGHT = 200
+ASYNC_MAX_CONNECTIONS = 100
+
+# Motor de parsing de las respuestas de Nivel 2:
+# 'stream' (SAX de lxml, un solo recorrido) o 'soup' (BeautifulSoup, legado).
+PARSER_ENGINE = 'stream'
+
 # --- PAYLOADS XML (PROTOCOL BUFFERS) ---
 
 # Query Nivel 1: Descubrimiento de IDs
@@ -129,4 +271,9 @@ DETAILS_REQUEST_FIN = """</cond3>
 	<order ordtype="ASC">
 		<atribute3 name="componentgroup_id"/>
 	</order>
-</foodquery>"""
\ No newline at end of file
+</foodquery>"""
+
+# Query Nivel 2 por lotes: mismo payload, pero la condición sobre 'f_id' usa la
+# relación IN con una lista de IDs separada por comas (cond3). Si el servidor
+# no la admite, el motor vuelve a las consultas individuales automáticamente.
+DETAILS_BATCH_REQUEST_INI = DETAILS_REQUEST_INI.replace('<relation type="EQUAL"/>', '<relation type="IN"/>')
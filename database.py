@@ -0,0 +1,227 @@
+# -----------------------------------------------------------------------------
+# SALIDA SQLITE (TABLA ANCHA + TABLA LARGA DE COMPONENTES)
+# -----------------------------------------------------------------------------
+# Sink alternativo al CSV para herramientas internas que consultan con SQL:
+#   foods            una fila por alimento con las columnas de CSV_HEADER:
+#                    metadatos como texto (edible_portion REAL) y cada
+#                    nutriente de DETAIL_LIST como REAL (NULL sin valor
+#                    numérico; el marcador está en food_components).
+#   food_components  una fila por <foodvalue> devuelto por BEDCA, también los
+#                    que no están en DETAIL_LIST: c_ori_name, best_location
+#                    (REAL), v_unit, u_descripcion y value_type, campos que
+#                    la consulta de Nivel 2 ya pide y el CSV descarta.
+#
+# Carga masiva: cada lote del escritor (writers.RowWriter) es una transacción
+# en modo WAL (synchronous=NORMAL) con executemany. Los índices (f_id, nombres,
+# SQLITE_INDEXED_NUTRIENTS y f_id / c_ori_name de la tabla larga) se crean al
+# cerrar, una vez cargados los datos, en lugar de mantenerlos fila a fila.
+#
+# Reanudación y upsert por f_id: con resume=True se conservan las tablas y los
+# f_id ya presentes pasan a completed_ids; sin él se recrean (como el CSV, que
+# se trunca). Escribir un f_id que ya está en la base sustituye su fila y sus
+# componentes en la misma transacción.
+#
+# Uso: python main.py --format sqlite [--resume]
+#      python database.py nutritional-info.csv [--output nutritional-info.sqlite]
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import argparse
+import constants
+import csv
+import re
+import sqlite3
+import unicodedata
+
+FOODS_TABLE = 'foods'
+COMPONENTS_TABLE = 'food_components'
+
+# Metadatos de BASIC_LIST con tipo numérico; el resto se guarda como texto.
+BASIC_TYPES = {'edible_portion': 'REAL'}
+# Nombres comparados sin distinguir mayúsculas: '=' y LIKE 'pan%' usan su índice.
+NAME_COLUMNS = ('f_ori_name', 'f_eng_name')
+
+
+def quote(name):
+    """Identificador SQL entrecomillado (los nutrientes llevan espacios y comas)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def number(text):
+    """Valor numérico de una celda o None ('tr', EMPTY, '')."""
+    if not text or text == constants.EMPTY:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def index_name(*parts):
+    """Nombre de índice ASCII estable a partir de la tabla y la columna ('energía, total' -> energia_total)."""
+    text = unicodedata.normalize('NFKD', '_'.join(parts).lower())
+    return re.sub(r'\W+', '_', text.encode('ascii', 'ignore').decode(), flags=re.ASCII).strip('_')
+
+
+def index_statements(header=constants.CSV_HEADER, nutrients=constants.SQLITE_INDEXED_NUTRIENTS):
+    """Sentencias CREATE INDEX que se ejecutan tras la carga masiva."""
+    foods = [('f_id', 'UNIQUE ', 'f_id')]
+    foods += [(name, '', quote(name)) for name in NAME_COLUMNS if name in header]
+    foods += [(name, '', quote(name)) for name in nutrients if name in header]
+    statements = [f"CREATE {unique}INDEX IF NOT EXISTS {index_name(FOODS_TABLE, name)} "
+                  f"ON {FOODS_TABLE} ({columns})" for name, unique, columns in foods]
+    statements.append(f"CREATE INDEX IF NOT EXISTS {index_name(COMPONENTS_TABLE, 'f_id')} "
+                      f"ON {COMPONENTS_TABLE} (f_id)")
+    statements.append(f"CREATE INDEX IF NOT EXISTS {index_name(COMPONENTS_TABLE, 'c_ori_name')} "
+                      f"ON {COMPONENTS_TABLE} (c_ori_name, best_location)")
+    return statements
+
+
+class SqliteSink:
+    """
+    Sink de writers.RowWriter que escribe en una base SQLite. Pide al motor
+    filas con el detalle de componentes (wants_components); las filas sin él
+    (p. ej. convert_csv) sólo llenan la tabla ancha.
+    """
+
+    wants_components = True
+
+    def __init__(self, path, header=constants.CSV_HEADER, nutrients=constants.DETAIL_LIST, resume=False):
+        self.path = path
+        self.header = tuple(header)
+        self.resume = resume
+        self.completed_ids = set()  # IDs ya presentes al reanudar
+        self.rows = 0
+        self._numeric = [name in nutrients or name in BASIC_TYPES for name in self.header]
+        self._id_column = self.header.index('f_id')
+        self._stored = set()  # f_id presentes en la tabla: los repetidos se sustituyen
+        self._db = None
+
+    def open(self):
+        """Crea (o, al reanudar, conserva) las tablas y configura la carga masiva."""
+        try:
+            # Se abre en el hilo principal y se usa desde el hilo escritor, nunca a la vez.
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            with self._db:
+                self._db.execute("BEGIN")
+                if not self.resume:
+                    self._db.execute(f"DROP TABLE IF EXISTS {FOODS_TABLE}")
+                    self._db.execute(f"DROP TABLE IF EXISTS {COMPONENTS_TABLE}")
+                self._create_tables()
+            if self.resume:
+                self.completed_ids = {food_id for (food_id,) in self._db.execute(
+                    f"SELECT f_id FROM {FOODS_TABLE}")}
+                self._stored = set(self.completed_ids)
+        except sqlite3.Error as e:
+            # El motor trata los fallos de apertura como errores de E/S.
+            raise IOError(f"No se pudo preparar la base SQLite '{self.path}': {e}") from e
+
+    def _create_tables(self):
+        columns = ', '.join(f"{quote(name)} {_column_type(name, numeric)}"
+                            for name, numeric in zip(self.header, self._numeric))
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {FOODS_TABLE} ({columns})")
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {COMPONENTS_TABLE} ("
+                         "f_id TEXT NOT NULL, c_ori_name TEXT, best_location REAL, "
+                         "v_unit TEXT, u_descripcion TEXT, value_type TEXT)")
+
+    def write_rows(self, rows):
+        """Inserta un lote en una transacción; los f_id ya presentes se sustituyen."""
+        # Un f_id repetido dentro del lote cuenta una sola vez: se queda la última fila.
+        latest = {row[self._id_column]: row for row in rows}
+        replaced = [(food_id,) for food_id in latest if food_id in self._stored]
+        food_rows, component_rows = [], []
+        for food_id, row in latest.items():
+            food_rows.append([number(value) if numeric else _text(value)
+                              for value, numeric in zip(row, self._numeric)])
+            for name, value, unit, unit_name, value_type in getattr(row, 'components', ()):
+                component_rows.append((food_id, name or None, number(value),
+                                       unit or None, unit_name or None, value_type or None))
+        with self._db:
+            self._db.execute("BEGIN")
+            if replaced:
+                self._db.executemany(f"DELETE FROM {FOODS_TABLE} WHERE f_id = ?", replaced)
+                self._db.executemany(f"DELETE FROM {COMPONENTS_TABLE} WHERE f_id = ?", replaced)
+            self._db.executemany(f"INSERT INTO {FOODS_TABLE} VALUES ({', '.join('?' * len(self.header))})",
+                                 food_rows)
+            self._db.executemany(f"INSERT INTO {COMPONENTS_TABLE} VALUES (?, ?, ?, ?, ?, ?)", component_rows)
+        self._stored.update(latest)
+        self.rows += len(latest) - len(replaced)  # Alimentos nuevos en la tabla
+
+    def flush(self):
+        # Cada lote ya es una transacción confirmada en el WAL.
+        pass
+
+    def sync(self):
+        """Vuelca el WAL a la base principal (con fsync)."""
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def build_indexes(self):
+        """Crea los índices de consulta (tras la carga masiva) y actualiza las estadísticas."""
+        with self._db:
+            self._db.execute("BEGIN")
+            for statement in index_statements(self.header):
+                self._db.execute(statement)
+        self._db.execute("ANALYZE")
+
+    def close(self):
+        if self._db is None:
+            return
+        try:
+            self.build_indexes()
+            self.sync()
+        finally:
+            self._db.close()
+            self._db = None
+
+
+def _text(value):
+    return None if value == constants.EMPTY else value
+
+
+def _column_type(name, numeric):
+    if name == 'f_id':
+        return 'TEXT NOT NULL'
+    if numeric:
+        return 'REAL'
+    return 'TEXT COLLATE NOCASE' if name in NAME_COLUMNS else 'TEXT'
+
+
+def convert_csv(csv_path, output_path):
+    """Carga un CSV de GastroMiner en SQLite (sólo la tabla ancha). Devuelve las filas escritas."""
+    sink = SqliteSink(output_path)
+    sink.open()
+    try:
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            if tuple(next(reader)) != tuple(constants.CSV_HEADER):
+                raise ValueError(f"La cabecera de '{csv_path}' no coincide con CSV_HEADER.")
+            batch = []
+            for row in reader:
+                batch.append(row)
+                if len(batch) >= constants.SQLITE_TRANSACTION_ROWS:
+                    sink.write_rows(batch)
+                    batch = []
+            sink.write_rows(batch)
+    finally:
+        sink.close()
+    return sink.rows
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Carga un CSV de GastroMiner en una base SQLite")
+    arg_parser.add_argument('csv', help="CSV de entrada (esquema CSV_HEADER)")
+    arg_parser.add_argument('--output', help="Base SQLite de salida (por defecto: junto al CSV)")
+    args = arg_parser.parse_args()
+
+    output = args.output or os.path.splitext(args.csv)[0] + '.sqlite'
+    rows = convert_csv(args.csv, output)
+    print(f"[*] {rows} alimentos escritos en '{output}' (tabla '{FOODS_TABLE}').")
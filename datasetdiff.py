@@ -0,0 +1,360 @@
+# -----------------------------------------------------------------------------
+# DIFERENCIAS ENTRE DOS SALIDAS DE GASTROMINER (DATASET DIFF)
+# -----------------------------------------------------------------------------
+# Responde a "¿qué ha cambiado en BEDCA desde la última descarga?" comparando
+# dos salidas del motor (CSV, Parquet/Arrow o SQLite, en cualquier orden de
+# filas y también de formatos distintos entre sí):
+#   - Carga a columnas NumPy: f_id y metadatos como texto, los valores
+#     numéricos (edible_portion y DETAIL_LIST) en una matriz float64 (NaN = sin
+#     valor) y una matriz paralela de códigos enteros con el marcador de
+#     'value_type' ('tr', 'ND', ...). El CSV se lee con el lector de Arrow y
+#     cada columna se convierte con kernels de pyarrow.compute (expresión
+#     regular + cast), sin bucles por celda en Python.
+#   - Alineación por f_id con ordenación y fusión (np.intersect1d): sin
+#     diccionarios ni bucles por alimento.
+#   - Comparación vectorizada de la matriz completa: dos números son iguales si
+#     |a - b| <= atol + rtol * max(|a|, |b|) (criterio de math.isclose), con
+#     tolerancia absoluta propia por nutriente opcional. Pasar de número a
+#     marcador, o cambiar de marcador, también es un cambio.
+# Resultado: resumen en consola y, con --json, informe con los alimentos
+# añadidos, eliminados y modificados ({f_id: {columna: [antes, después]}}).
+# Código de salida como diff(1): 0 sin diferencias, 1 con diferencias, 2 error.
+#
+# Uso: python datasetdiff.py anterior.csv nutritional-info.csv [--json cambios.json]
+#      python datasetdiff.py marzo.parquet abril.sqlite --tolerance "sodio=1; energía=2"
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import argparse
+import collections
+import columnar
+import constants
+import csv
+import foodstore
+import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import sqlite3
+import time
+
+# Columnas comparadas como número (con tolerancia) y como texto (exactas).
+NUMERIC_COLUMNS = tuple(name for name in constants.CSV_HEADER
+                        if name == 'edible_portion' or name in constants.DETAIL_LIST)
+TEXT_COLUMNS = tuple(name for name in constants.BASIC_LIST
+                     if name != 'f_id' and name not in NUMERIC_COLUMNS)
+
+SQLITE_MAGIC = b'SQLite format 3\x00'
+
+
+# Número de una celda de texto (lo que acepta float() en la salida del motor).
+NUMBER_PATTERN = r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$'
+
+# Marcadores de 'value_type' como códigos enteros compartidos por todos los
+# Dataset del proceso: 0 = sin marcador. Comparar códigos equivale a comparar textos.
+MARKERS = ['']
+_MARKER_CODES = {'': 0}
+
+
+def marker_code(text):
+    """Código entero de un marcador ('tr', 'ND', ...); None o '' -> 0."""
+    if not text:
+        return 0
+    if text not in _MARKER_CODES:
+        _MARKER_CODES[text] = len(MARKERS)
+        MARKERS.append(text)
+    return _MARKER_CODES[text]
+
+
+def _marker_codes(column):
+    """Columna Arrow de marcadores (texto o diccionario, nulos = sin marcador) -> códigos int16."""
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    if not pa.types.is_dictionary(column.type):
+        column = pc.dictionary_encode(column)
+    # Los textos distintos de la columna son pocos: sólo ellos pasan por Python.
+    lookup = np.array([marker_code(text) for text in column.dictionary.to_pylist()] + [0], dtype=np.int16)
+    indices = pc.fill_null(column.indices.cast(pa.int32()), -1).to_numpy()
+    return lookup[indices]
+
+
+def _parse_column(column):
+    """Columna Arrow de textos de la salida CSV -> (valores float64, códigos de marcador), sin bucles por celda."""
+    numeric = pc.match_substring_regex(column, NUMBER_PATTERN)
+    text_null = pa.scalar(None, pa.string())
+    values = pc.cast(pc.if_else(numeric, column, text_null), pa.float64())
+    empty = pc.or_(pc.equal(column, constants.EMPTY), pc.equal(column, ''))
+    markers = pc.if_else(pc.or_(numeric, empty), text_null, column)
+    return values.to_numpy(zero_copy_only=False), _marker_codes(markers)
+
+
+def _strings(column):
+    """Columna Arrow -> array NumPy de textos (nulos y EMPTY -> '')."""
+    column = pc.cast(column, pa.string())
+    column = pc.if_else(pc.equal(column, constants.EMPTY), '', column)
+    return pc.fill_null(column, '').to_numpy(zero_copy_only=False).astype(str)
+
+
+def _load_csv(path):
+    """(ids, {columna: textos}, valores, marcadores, hay_marcadores) de un CSV de GastroMiner."""
+    with open(path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8')]), [])
+    if tuple(header) != tuple(constants.CSV_HEADER):
+        raise ValueError(f"La cabecera de '{path}' no coincide con CSV_HEADER.")
+    # Lector CSV de Arrow (multihilo, en C++): todo como texto, sin inferir tipos ni nulos.
+    table = pa_csv.read_csv(
+        path,
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in header},
+                                              strings_can_be_null=False, quoted_strings_can_be_null=False))
+    values = np.empty((table.num_rows, len(NUMERIC_COLUMNS)))
+    flags = np.zeros((table.num_rows, len(NUMERIC_COLUMNS)), dtype=np.int16)
+    for index, name in enumerate(NUMERIC_COLUMNS):
+        values[:, index], flags[:, index] = _parse_column(table.column(name).combine_chunks())
+    texts = {name: _strings(table.column(name)) for name in TEXT_COLUMNS}
+    return _strings(table.column('f_id')), texts, values, flags, True
+
+
+def _load_columnar(path):
+    """Igual que _load_csv para una salida Parquet/Arrow de columnar.py."""
+    table = columnar.load_table(path)
+    texts = {name: _strings(table.column(name)) for name in TEXT_COLUMNS}
+    values = np.empty((table.num_rows, len(NUMERIC_COLUMNS)))
+    flags = np.zeros((table.num_rows, len(NUMERIC_COLUMNS)), dtype=np.int16)
+    for index, name in enumerate(NUMERIC_COLUMNS):
+        # float32 -> float64 sin pasar por texto: la diferencia con el valor
+        # decimal original (~1e-8 relativo) queda muy por debajo de DIFF_RTOL.
+        values[:, index] = table.column(name).to_numpy(zero_copy_only=False)
+        if name + columnar.FLAG_SUFFIX in table.column_names:
+            flags[:, index] = _marker_codes(table.column(name + columnar.FLAG_SUFFIX))
+    return _strings(table.column('f_id')), texts, values, flags, True
+
+
+def _load_sqlite(path):
+    """
+    Igual que _load_csv para una base de database.py. Los marcadores salen de
+    food_components; si la tabla está vacía (base cargada desde un CSV) no
+    hay marcadores que comparar.
+    """
+    import database
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        names = ('f_id',) + TEXT_COLUMNS + NUMERIC_COLUMNS
+        rows = db.execute(f"SELECT {', '.join(map(database.quote, names))} FROM {database.FOODS_TABLE}").fetchall()
+        markers = db.execute(f"SELECT f_id, c_ori_name, value_type FROM {database.COMPONENTS_TABLE} "
+                             "WHERE best_location IS NULL AND value_type IS NOT NULL").fetchall()
+        has_flags = db.execute(f"SELECT 1 FROM {database.COMPONENTS_TABLE} LIMIT 1").fetchone() is not None
+    except sqlite3.Error as e:
+        raise ValueError(f"'{path}' no es una base de GastroMiner: {e}") from None
+    finally:
+        db.close()
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    ids = np.array(columns[0], dtype=str)
+    texts = {name: np.array(['' if value is None else value for value in columns[1 + index]], dtype=str)
+             for index, name in enumerate(TEXT_COLUMNS)}
+    values = np.array(columns[1 + len(TEXT_COLUMNS):], dtype=np.float64).T.reshape(len(rows), len(NUMERIC_COLUMNS))
+    flags = np.zeros(values.shape, dtype=np.int16)
+    row_of = {food_id: index for index, food_id in enumerate(columns[0])}
+    column_of = {name: index for index, name in enumerate(NUMERIC_COLUMNS)}
+    for food_id, name, value_type in markers:
+        if food_id in row_of and name in column_of:
+            flags[row_of[food_id], column_of[name]] = marker_code(value_type)
+    return ids, texts, values, flags, has_flags
+
+
+def _is_sqlite(path):
+    with open(path, 'rb') as f:
+        return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+
+
+class Dataset:
+    """Salida de GastroMiner cargada en columnas, con un f_id único por fila."""
+
+    def __init__(self, path):
+        self.path = path
+        start = time.perf_counter()
+        if path.endswith(('.parquet', '.arrow', '.feather')):
+            loader = _load_columnar
+        elif _is_sqlite(path):
+            loader = _load_sqlite
+        else:
+            loader = _load_csv
+        self.ids, self.texts, self.values, self.flags, self.has_flags = loader(path)
+        # Con f_id repetidos cuenta la última fila de cada uno (como FoodStore).
+        _, last = np.unique(self.ids[::-1], return_index=True)
+        if len(last) != len(self.ids):
+            print(f"[WARN] '{path}' contiene f_id repetidos: se compara la última fila de cada uno.")
+            keep = np.sort(len(self.ids) - 1 - last)
+            self.ids, self.values, self.flags = self.ids[keep], self.values[keep], self.flags[keep]
+            self.texts = {name: column[keep] for name, column in self.texts.items()}
+        self.size = len(self.ids)
+        self.load_seconds = time.perf_counter() - start
+
+    def name(self, row):
+        return self.texts['f_ori_name'][row] if 'f_ori_name' in self.texts else ''
+
+
+def parse_tolerances(text, columns=NUMERIC_COLUMNS):
+    """Convierte "sodio=1; energía=2" en {columna: tolerancia absoluta}. Se separa por ';'."""
+    tolerances = {}
+    for part in (text or '').split(';'):
+        if not part.strip():
+            continue
+        name, separator, value = part.rpartition('=')
+        if not separator:
+            raise ValueError(f"Tolerancia no válida: '{part.strip()}' (formato: <nutriente>=<tolerancia>).")
+        try:
+            tolerance = float(value)
+        except ValueError:
+            raise ValueError(f"Tolerancia no numérica para '{name.strip()}': {value.strip()}") from None
+        if tolerance < 0:
+            raise ValueError(f"La tolerancia de '{name.strip()}' no puede ser negativa.")
+        tolerances[foodstore.resolve_column(name.strip(), columns)] = tolerance
+    return tolerances
+
+
+def diff(old, new, rtol=constants.DIFF_RTOL, atol=constants.DIFF_ATOL, tolerances=None):
+    """
+    Compara dos Dataset y devuelve el informe serializable en JSON: alimentos
+    añadidos y eliminados ({f_id: nombre}), modificados ({f_id: {columna:
+    [antes, después]}}) y recuento de cambios por columna.
+    """
+    start = time.perf_counter()
+    tolerances = tolerances or {}
+    common, old_rows, new_rows = np.intersect1d(old.ids, new.ids, assume_unique=True, return_indices=True)
+    added = np.flatnonzero(~np.isin(new.ids, common, assume_unique=True))
+    removed = np.flatnonzero(~np.isin(old.ids, common, assume_unique=True))
+
+    # Valores numéricos: tolerancia, presencia y marcador, sobre la matriz completa.
+    before, after = old.values[old_rows], new.values[new_rows]
+    absolute = np.full(len(NUMERIC_COLUMNS), float(atol))
+    for name, tolerance in tolerances.items():
+        absolute[NUMERIC_COLUMNS.index(name)] = tolerance
+    missing_before, missing_after = np.isnan(before), np.isnan(after)
+    with np.errstate(invalid='ignore'):
+        numeric = np.abs(before - after) > absolute + rtol * np.maximum(np.abs(before), np.abs(after))
+    changed = (numeric & ~missing_before & ~missing_after) | (missing_before != missing_after)
+    if old.has_flags and new.has_flags:
+        changed |= missing_before & missing_after & (old.flags[old_rows] != new.flags[new_rows])
+
+    changes = collections.defaultdict(dict)
+    column_counts = collections.Counter()
+    for row, column in zip(*np.nonzero(changed)):
+        name = NUMERIC_COLUMNS[column]
+        changes[common[row]][name] = [_cell(before[row, column], old.flags[old_rows[row], column]),
+                                      _cell(after[row, column], new.flags[new_rows[row], column])]
+        column_counts[name] += 1
+    for name in TEXT_COLUMNS:
+        old_texts, new_texts = old.texts[name][old_rows], new.texts[name][new_rows]
+        for row in np.flatnonzero(old_texts != new_texts):
+            changes[common[row]][name] = [old_texts[row] or None, new_texts[row] or None]
+            column_counts[name] += 1
+
+    took = time.perf_counter() - start
+    return {
+        'old': {'path': old.path, 'foods': old.size},
+        'new': {'path': new.path, 'foods': new.size},
+        'tolerance': {'rtol': rtol, 'atol': atol, 'columns': tolerances},
+        'flags_compared': bool(old.has_flags and new.has_flags),
+        'added': {food_id: new.name(row) for food_id, row in _by_id(new.ids, added)},
+        'removed': {food_id: old.name(row) for food_id, row in _by_id(old.ids, removed)},
+        'changed': {food_id: changes[food_id] for food_id in sorted(changes, key=_id_key)},
+        'changed_columns': dict(column_counts.most_common()),
+        'changed_values': sum(column_counts.values()),
+        'unchanged': len(common) - len(changes),
+        'load_ms': round((old.load_seconds + new.load_seconds) * 1000, 3),
+        'diff_ms': round(took * 1000, 3),
+    }
+
+
+def _cell(value, flag):
+    """Valor de una celda para el informe: número (con su representación más corta), marcador o None."""
+    if not np.isnan(value):
+        # Los float32 de Parquet/Arrow salen como 0.58 y no como 0.5799999833.
+        shortest = float(np.float32(value))
+        return float(str(np.float32(value))) if shortest == value else float(value)
+    return MARKERS[flag] or None
+
+
+def _id_key(food_id):
+    return (len(food_id), food_id)
+
+
+def _by_id(ids, rows):
+    """(f_id, fila) ordenados como el catálogo (IDs numéricos en orden numérico)."""
+    return sorted(((str(ids[row]), row) for row in rows), key=lambda item: _id_key(item[0]))
+
+
+def display_report(report, new, limit=constants.DIFF_REPORT_LIMIT):
+    """Resumen legible del informe de diff()."""
+    print(f"[*] '{report['old']['path']}' ({report['old']['foods']} alimentos) -> "
+          f"'{report['new']['path']}' ({report['new']['foods']} alimentos): "
+          f"carga {report['load_ms']:.1f} ms, comparación {report['diff_ms']:.1f} ms.")
+    print(f"    Añadidos    : {len(report['added'])}")
+    print(f"    Eliminados  : {len(report['removed'])}")
+    print(f"    Modificados : {len(report['changed'])} alimentos, {report['changed_values']} valores "
+          f"({report['unchanged']} sin cambios)")
+    if not report['flags_compared']:
+        print("[WARN] Uno de los datasets no conserva los marcadores de 'value_type': no se comparan.")
+    if report['changed_columns']:
+        top = list(report['changed_columns'].items())[:5]
+        print("    Columnas más afectadas: " + '; '.join(f"{name} ({count})" for name, count in top))
+    for sign, foods in (('+', report['added']), ('-', report['removed'])):
+        for food_id, name in list(foods.items())[:limit]:
+            print(f"    {sign} {food_id:>6}  {name}")
+        if len(foods) > limit:
+            print(f"    {sign} ... y {len(foods) - limit} más")
+    rows = {food_id: row for row, food_id in enumerate(new.ids.tolist())}
+    for food_id, columns in list(report['changed'].items())[:limit]:
+        values = '; '.join(f"{name}: {_format(before)} -> {_format(after)}"
+                           for name, (before, after) in list(columns.items())[:3])
+        more = f" (+{len(columns) - 3})" if len(columns) > 3 else ''
+        print(f"    ~ {food_id:>6}  {new.name(rows[food_id])}: {values}{more}")
+    if len(report['changed']) > limit:
+        print(f"    ~ ... y {len(report['changed']) - limit} más")
+
+
+def _format(value):
+    if value is None:
+        return constants.EMPTY
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def parse_arguments():
+    arg_parser = argparse.ArgumentParser(description="Diferencias entre dos salidas de GastroMiner")
+    arg_parser.add_argument('old', help="Dataset anterior (CSV, .parquet/.arrow o SQLite)")
+    arg_parser.add_argument('new', help="Dataset nuevo (CSV, .parquet/.arrow o SQLite)")
+    arg_parser.add_argument('--json', metavar='FICHERO', help="Escribe el informe completo en JSON")
+    arg_parser.add_argument('--rtol', type=float, default=constants.DIFF_RTOL,
+                            help="Tolerancia relativa (por defecto: %(default)s)")
+    arg_parser.add_argument('--atol', type=float, default=constants.DIFF_ATOL,
+                            help="Tolerancia absoluta (por defecto: %(default)s)")
+    arg_parser.add_argument('--tolerance', default='',
+                            help="Tolerancias absolutas por nutriente: \"sodio=1; energía=2\"")
+    arg_parser.add_argument('--limit', type=int, default=constants.DIFF_REPORT_LIMIT,
+                            help="Alimentos listados por categoría en consola (por defecto: %(default)s)")
+    return arg_parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    try:
+        tolerances = parse_tolerances(args.tolerance)
+        old_dataset, new_dataset = Dataset(args.old), Dataset(args.new)
+    except (OSError, ValueError) as e:
+        print(f"[FATAL] {e}")
+        sys.exit(2)
+    result = diff(old_dataset, new_dataset, args.rtol, args.atol, tolerances)
+    display_report(result, new_dataset, args.limit)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"[*] Informe completo en '{args.json}'.")
+    sys.exit(1 if result['added'] or result['removed'] or result['changed'] else 0)
@@ -0,0 +1,186 @@
+# -----------------------------------------------------------------------------
+# SINCRONIZACIÓN INCREMENTAL (DELTA SYNC)
+# -----------------------------------------------------------------------------
+# Entre dos ejecuciones sólo cambian unos pocos alimentos, así que no hace
+# falta descargar el catálogo entero. DeltaSink envuelve al CsvSink y mantiene
+# un manifiesto junto al CSV (<csv>.manifest.json) con, por cada f_id, el
+# hash del contenido de su fila normalizada y la fecha de su última
+# verificación. En cada sincronización:
+#   1. Se piden primero los IDs nuevos del catálogo.
+#   2. Después se revalida una muestra de los ya conocidos: los que superan
+#      SYNC_MAX_AGE segundos sin verificar y una fracción SYNC_SAMPLE_RATE
+#      elegida al azar.
+#   3. Los IDs que ya no están en el catálogo se eliminan.
+#   4. El CSV se reescribe en un fichero temporal: filas descargadas más las
+#      filas previas conservadas (también las de revalidaciones fallidas) y
+#      se sustituye de forma atómica al cerrar, incluso tras Ctrl+C.
+# Al terminar se escribe un informe de cambios (<csv>.changes.json) con los
+# alimentos añadidos, eliminados y modificados y las columnas afectadas.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import collections
+import constants
+import csv
+import datetime
+import hashlib
+import json
+import random
+import time
+import writers
+
+
+def row_hash(row):
+    """Hash estable del contenido de una fila normalizada (orden CSV_HEADER)."""
+    return hashlib.sha256('\x1f'.join(row).encode('utf-8')).hexdigest()[:32]
+
+
+def read_rows(path, header=constants.CSV_HEADER):
+    """Lee un CSV de GastroMiner y devuelve {f_id: fila}. Un fichero ausente es un dataset vacío."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        if tuple(next(reader, ())) != tuple(header):
+            raise ValueError(f"La cabecera de '{path}' no coincide con CSV_HEADER: "
+                             f"sincronice con el mismo esquema o haga una descarga completa.")
+        id_column = list(header).index('f_id')
+        return {row[id_column]: row for row in reader}
+
+
+class DeltaSink:
+    """
+    Sink de sincronización incremental. Expone plan(catalog_ids), que
+    GastroMiner consulta para decidir qué IDs descargar y en qué orden.
+    """
+
+    def __init__(self, path, sample_rate=constants.SYNC_SAMPLE_RATE, max_age=constants.SYNC_MAX_AGE,
+                 header=constants.CSV_HEADER):
+        self.path = path
+        self.manifest_path = path + constants.MANIFEST_SUFFIX
+        self.report_path = path + constants.CHANGES_SUFFIX
+        self.sample_rate = sample_rate
+        self.max_age = max_age
+        self.header = header
+        self.completed_ids = set()
+        self._id_column = list(header).index('f_id')
+        self._tmp_path = path + '.sync.tmp'
+        self._inner = writers.CsvSink(self._tmp_path, header=header)
+        self._previous = {}
+        self._manifest = {}
+        self._catalog = None
+        self._written = set()
+        self._changes = {'added': [], 'modified': {}, 'unchanged': 0}
+        self._started = time.time()
+
+    def open(self):
+        """Carga el dataset y el manifiesto previos y abre el CSV temporal."""
+        self._previous = read_rows(self.path, self.header)
+        self._manifest = self._load_manifest()
+        self._inner.open()
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)['foods']
+        else:
+            manifest = {}
+        # Filas sin entrada (p. ej. CSV anterior a este modo): se dan por
+        # verificadas en la fecha del fichero.
+        checked = os.path.getmtime(self.path) if self._previous else self._started
+        for food_id, row in self._previous.items():
+            manifest.setdefault(food_id, {'hash': row_hash(row), 'checked': checked})
+        return manifest
+
+    def plan(self, catalog_ids):
+        """Ordena la descarga: IDs nuevos primero, después los que toca revalidar."""
+        self._catalog = list(catalog_ids)
+        known = self._previous
+        new_ids = [food_id for food_id in self._catalog if food_id not in known]
+        rng = random.Random()
+        due_ids = [food_id for food_id in self._catalog if food_id in known and (
+            self._started - self._manifest[food_id]['checked'] >= self.max_age
+            or rng.random() < self.sample_rate)]
+        removed = len(set(known) - set(self._catalog))
+        print(f">>> Sincronización incremental: {len(new_ids)} nuevos, {len(due_ids)} a revalidar, "
+              f"{len(known) - len(due_ids) - removed} conservados, {removed} eliminados del catálogo.")
+        return new_ids + due_ids
+
+    def write_rows(self, rows):
+        now = time.time()
+        for row in rows:
+            food_id = row[self._id_column]
+            digest = row_hash(row)
+            previous = self._previous.get(food_id)
+            if previous is None:
+                self._changes['added'].append(food_id)
+            elif self._manifest[food_id]['hash'] != digest:
+                self._changes['modified'][food_id] = [
+                    column for column, old, new in zip(self.header, previous, row) if old != new]
+            else:
+                self._changes['unchanged'] += 1
+            self._manifest[food_id] = {'hash': digest, 'checked': now}
+            self._written.add(food_id)
+        self._inner.write_rows(rows)
+
+    def flush(self):
+        self._inner.flush()
+
+    def sync(self):
+        self._inner.sync()
+
+    def close(self):
+        """
+        Añade las filas previas que siguen en el catálogo y no se han vuelto a
+        escribir, publica el CSV, guarda el manifiesto y emite el informe.
+        """
+        catalog = set(self._catalog) if self._catalog is not None else set(self._previous)
+        carried = [row for food_id, row in self._previous.items()
+                   if food_id in catalog and food_id not in self._written]
+        try:
+            if carried:
+                self._inner.write_rows(carried)
+            self._inner.sync()
+        finally:
+            self._inner.close()
+        os.replace(self._tmp_path, self.path)
+
+        removed = sorted(set(self._previous) - catalog)
+        for food_id in removed:
+            self._manifest.pop(food_id, None)
+        self._write_manifest()
+        self._write_report(removed, len(carried))
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'header_hash': row_hash(self.header), 'foods': self._manifest}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _write_report(self, removed, carried):
+        modified = self._changes['modified']
+        column_counts = collections.Counter(column for columns in modified.values() for column in columns)
+        report = {
+            'timestamp': datetime.datetime.fromtimestamp(self._started).isoformat(timespec='seconds'),
+            'dataset': self.path,
+            'foods': len(self._written) + carried,
+            'fetched': len(self._written),
+            'carried_over': carried,
+            'unchanged': self._changes['unchanged'],
+            'added': self._changes['added'],
+            'removed': removed,
+            'modified': modified,
+            'modified_columns': dict(column_counts.most_common()),
+        }
+        with open(self.report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n[*] Cambios: {len(report['added'])} añadidos, {len(removed)} eliminados, "
+              f"{len(modified)} modificados, {report['unchanged']} revalidados sin cambios. "
+              f"Informe en '{self.report_path}'.")
@@ -1,9 +1,29 @@
 # -----------------------------------------------------------------------------
-# DISCOVERER DE NOMBRES DE ALIMENTOS (NAME DISCOVERER)
+# PERFILADOR DE ESQUEMA Y COBERTURA DE CAMPOS (DESCUBRIDOR DE NOMBRES)
 # -----------------------------------------------------------------------------
-# Script independiente y minimalista para probar qué etiqueta (tag) XML de la
-# API de BEDCA devuelve el nombre del alimento en inglés.
-# Solo procesa las primeras 10 referencias para una respuesta rápida.
+# Nació como un script para probar qué etiqueta XML de la API de BEDCA devuelve
+# el nombre del alimento en inglés. Ahora perfila una muestra del catálogo
+# antes de lanzar una descarga completa:
+#   - Pide una fracción aleatoria del catálogo (--sample) en paralelo con la
+#     misma sesión, limitador de ritmo adaptativo, caché y comprobación de
+#     robots.txt que GastroMiner (es una subclase que no escribe salida). Con
+#     --cache usa la caché de respuestas de main.py: la consulta del catálogo
+#     se comparte con la descarga y las de Nivel 2, que piden etiquetas extra,
+#     tienen sus propias entradas (repetir el perfil no vuelve a la red).
+#   - La consulta de Nivel 2 es la de la descarga (constants.DETAILS_REQUEST_INI)
+#     más las etiquetas candidatas de CANDIDATE_TAGS, así que el perfil refleja
+#     exactamente lo que verá el parser.
+#   - Informa de la cobertura de cada etiqueta (presente / con texto) y de cada
+#     componente 'c_ori_name' (alimentos, valores numéricos, value_type, unidad).
+#   - Señala las entradas de DETAIL_LIST sin ninguna coincidencia exacta (el
+#     parser compara el texto literal): si BEDCA devuelve un nombre que sólo
+#     difiere en espacios o mayúsculas, o uno muy parecido ('Viamina E' frente
+#     a 'Vitamina E'), lo propone como corrección.
+# Termina con código 1 si alguna entrada de DETAIL_LIST no coincide.
+#
+# Uso: python descubridosnombres.py [--sample 0.1] [--max-foods 200] [--json perfil.json]
+#      python descubridosnombres.py --cache --seed 1      # repetible sin red con --cache-only
+#      python descubridosnombres.py --url http://127.0.0.1:8765/bdpub/procquery.php
 # -----------------------------------------------------------------------------
 
 import os
@@ -14,160 +34,346 @@ src_dir = os.path.join(here, 'src')
 if os.path.isdir(src_dir) and src_dir not in sys.path:
     sys.path.insert(0, src_dir)
 
-from bs4 import BeautifulSoup
-import requests
+from GastroMiner import GastroMiner
+import argparse
+import cache as response_cache
+import collections
+import concurrent.futures
+import constants
+import difflib
+import json
+import random
+import ratelimit
 import time
+from lxml import etree
 
-# --- CONSTANTES REQUERIDAS ---
-URL = "http://www.bedca.net/bdpub/procquery.php"
-USER_AGENT = 'NameDiscoverer-Bot/1.0 (Testing Name Fields)'
-HEADERS = {'Content-Type': 'text/xml', 'User-Agent': USER_AGENT}
-LIMIT = 10  # Número de alimentos a probar
-START_INDEX = 100 # Nuevo: Índice de inicio para omitir los primeros registros vacíos que suelen estar incompletos.
-EMPTY = 'NA'  # Marcador para campos no encontrados en el XML
-
-# Lista de tags a probar. 'f_ori_name' y 'sci_name' se incluyen como referencia.
-NAME_FIELDS_TO_TEST = [
-    'f_ori_name',    # Nombre en español (Referencia)
-    'sci_name',      # Nombre científico (Referencia)
-    'eur_name',      # Ya sabemos que este es propenso a errores
-    'f_eng_name',    # Hipótesis 1 (f_ + eng_name)
-    'english_name',  # Hipótesis 2 (Nombre directo)
-    'f_name_en',     # Hipótesis 3 (f_name + en)
-    'f_description_en' # Hipótesis 4 (Descripción en inglés)
-]
-
-# Query Nivel 1: Descubrimiento de IDs (Idéntica a la usada en constants.py)
-IDS_REQUEST = """<foodquery>
-	<type level="1"/>
-	<selection>
-		<atribute name="f_id"/>
-	</selection>
-	<condition>
-		<cond1>
-			<atribute1 name="f_origen"/>
-		</cond1>
-		<relation type="EQUAL"/>
-		<cond3>BEDCA</cond3>
-	</condition>
-	<order ordtype="ASC">
-		<atribute3 name="f_id"/>
-	</order>
-</foodquery>"""
-
-
-def get_catalog_ids(session):
-    """Realiza la petición inicial para obtener todos los identificadores de alimentos."""
-    print(">>> 1. Obteniendo IDs de alimentos...")
-    try:
-        r = session.post(URL, data=IDS_REQUEST)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "lxml-xml")
-        ids = [node.get_text() for node in soup.find_all('f_id')]
-        return ids
-    except Exception as e:
-        print(f"[ERROR] Fallo obteniendo catálogo maestro: {e}")
-        return []
-
-def build_details_payload(food_id):
-    """Construye el payload XML de detalle, incluyendo solo los campos que queremos probar."""
-    # Construir la sección <selection> dinámicamente
-    selection_xml = "\n".join([f'<atribute name="{tag}"/>' for tag in NAME_FIELDS_TO_TEST])
-    
-    # Construir el payload completo de Nivel 2, minimalista.
-    payload = f"""<foodquery>
-	<type level="2"/>
-	<selection>
-        {selection_xml}
-	</selection>
-	<condition>
-		<cond1>
-			<atribute1 name="f_id"/>
-		</cond1>
-		<relation type="EQUAL"/>
-		<cond3>{food_id}</cond3>
-	</condition>
-	<condition>
-		<cond1>
-			<atribute1 name="publico"/>
-		</cond1>
-		<relation type="EQUAL"/>
-		<cond3>1</cond3>
-	</condition>
-</foodquery>"""
-    return payload
-
-def test_name_fields(session, food_id):
-    """Envía la consulta para un solo ID y extrae los campos de nombre a prueba."""
-    payload = build_details_payload(food_id)
-    time.sleep(0.1) # Breve delay para no saturar
-    
-    try:
-        response = session.post(URL, data=payload)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, "lxml-xml")
-        results = {}
-        
-        # Extraer el valor para cada tag que estamos probando
-        for tag in NAME_FIELDS_TO_TEST:
-            node = soup.find(tag)
-            # Guardamos el texto o nuestro marcador EMPTY si no se encuentra el nodo
-            results[tag] = node.getText().strip() if node else EMPTY
-            
-        return results
-
-    except Exception as e:
-        print(f"\n[ERROR] Fallo en ID {food_id}: {e}")
-        return None
-
-def display_results(all_results):
-    """Imprime los resultados de las pruebas en un formato tabular."""
-    print("\n" + "="*80)
-    print(f"| PRUEBA DE CAMPO DE NOMBRE EN INGLÉS (Resultados de {len(all_results)} alimentos) |")
-    print("="*80)
-
-    # Imprimir cabecera de la tabla
-    header = "ID" + "".join([f"| {tag:<{max(len(tag), 15)}}" for tag in NAME_FIELDS_TO_TEST])
-    print(header)
-    print("-" * 80)
-    
-    # Imprimir filas de datos
-    for food_id, data in all_results.items():
-        row = f"{food_id:<3}"
-        for tag in NAME_FIELDS_TO_TEST:
-            value = data.get(tag, 'NA')
-            # Truncar valores largos para mantener la tabla legible
-            display_value = value[:15].ljust(15) if len(value) > 15 else value.ljust(15)
-            row += f"| {display_value}"
-        print(row)
-    
-    print("="*80)
-    print("\nInstrucción: El campo correcto es aquel que devuelve consistentemente el nombre en inglés y no 'NA' o datos corruptos.")
+# Etiquetas de alimento a perfilar además de BASIC_LIST. 'f_eng_name' fue la
+# hipótesis ganadora para el nombre en inglés; el resto se mantiene como control.
+CANDIDATE_TAGS = (
+    'f_ori_name',        # Nombre en español (referencia)
+    'sci_name',          # Nombre científico (referencia)
+    'eur_name',          # Propenso a errores
+    'f_eng_name',        # Nombre en inglés (confirmado)
+    'english_name',
+    'f_name_en',
+    'f_description_en',
+)
+
+# Campos leídos de cada <foodvalue>.
+COMPONENT_FIELDS = ('c_ori_name', 'best_location', 'value_type', 'v_unit')
+
+XML_PARSER = etree.XMLParser(recover=True, huge_tree=True)
+
+
+def profile_tags():
+    """Etiquetas de alimento perfiladas: BASIC_LIST y las candidatas, sin repetir."""
+    return tuple(dict.fromkeys(constants.BASIC_LIST + CANDIDATE_TAGS))
+
+
+def build_payload(food_ids):
+    """Consulta de Nivel 2 de la descarga (individual o por lotes) con las etiquetas candidatas añadidas."""
+    if len(food_ids) == 1:
+        payload = constants.DETAILS_REQUEST_INI + str(food_ids[0]) + constants.DETAILS_REQUEST_FIN
+    else:
+        payload = constants.DETAILS_BATCH_REQUEST_INI + ','.join(food_ids) + constants.DETAILS_REQUEST_FIN
+    extra = ''.join(f'\n\t\t<atribute name="{tag}"/>' for tag in CANDIDATE_TAGS
+                    if f'<atribute name="{tag}"/>' not in payload)
+    return payload.replace('<selection>', '<selection>' + extra, 1)
+
+
+def parse_profile(content):
+    """
+    Extrae de una respuesta de Nivel 2 {f_id: (etiquetas, componentes)}:
+    etiquetas = {tag: texto literal} y componentes = [{campo: texto literal}].
+    """
+    root = etree.fromstring(content, XML_PARSER)
+    foods = {}
+    if root is None:
+        return foods
+    tags = profile_tags()
+    for food in root.iter('food'):
+        found = {}
+        for child in food:
+            if child.tag in tags and child.tag not in found:
+                found[child.tag] = ''.join(child.itertext())
+        components = [{field: ''.join(node.itertext()) for field in COMPONENT_FIELDS
+                       for node in value.findall(field)[:1]}
+                      for value in food.iter('foodvalue')]
+        food_id = found.get('f_id', '').strip()
+        if food_id:
+            foods[food_id] = (found, components)
+    return foods
+
+
+class SchemaProfile:
+    """Acumulador de cobertura por etiqueta y por componente."""
+
+    def __init__(self):
+        self.foods = 0
+        self.tags = {tag: {'present': 0, 'non_empty': 0, 'example': None} for tag in profile_tags()}
+        self.components = {}
+
+    def add(self, tags, components):
+        self.foods += 1
+        for tag, text in tags.items():
+            stats = self.tags[tag]
+            stats['present'] += 1
+            if text.strip():
+                stats['non_empty'] += 1
+                if stats['example'] is None:
+                    stats['example'] = text.strip()
+        seen = set()
+        for component in components:
+            name = component.get('c_ori_name')
+            if name is None or name in seen:
+                continue  # Como el parser: cuenta la primera aparición en el alimento
+            seen.add(name)
+            stats = self.components.get(name)
+            if stats is None:
+                stats = self.components[name] = {'foods': 0, 'numeric': 0,
+                                                 'value_types': collections.Counter(),
+                                                 'units': collections.Counter()}
+            stats['foods'] += 1
+            try:
+                float(component.get('best_location', ''))
+                stats['numeric'] += 1
+            except ValueError:
+                pass
+            stats['value_types'][component.get('value_type', '')] += 1
+            stats['units'][component.get('v_unit', '')] += 1
+
+    def schema_check(self):
+        """
+        [{'name', 'matches', 'issue', 'suggestion'}] por entrada de DETAIL_LIST.
+        issue: None (coincide), 'whitespace' (sólo difiere en espacios o
+        mayúsculas), 'similar' (nombre parecido) o 'absent' (no aparece).
+        """
+        observed = list(self.components)
+        loose = {_loose(name): name for name in observed}
+        checks = []
+        for name in constants.DETAIL_LIST:
+            matches = self.components.get(name, {}).get('foods', 0)
+            issue = suggestion = None
+            if not matches:
+                if _loose(name) in loose:
+                    issue, suggestion = 'whitespace', loose[_loose(name)]
+                else:
+                    close = difflib.get_close_matches(name, observed, n=1, cutoff=0.85)
+                    issue, suggestion = ('similar', close[0]) if close else ('absent', None)
+            checks.append({'name': name, 'matches': matches, 'issue': issue, 'suggestion': suggestion})
+        return checks
+
+    def report(self):
+        """Resumen serializable (JSON) del perfil."""
+        def ratio(count):
+            return round(count / self.foods, 4) if self.foods else None
+        return {
+            'foods': self.foods,
+            'tags': {tag: {**stats, 'coverage': ratio(stats['non_empty'])} for tag, stats in self.tags.items()},
+            'components': {
+                name: {'foods': stats['foods'], 'coverage': ratio(stats['foods']),
+                       'numeric_ratio': round(stats['numeric'] / stats['foods'], 4),
+                       'in_detail_list': name in constants.DETAIL_LIST,
+                       'value_types': dict(stats['value_types'].most_common()),
+                       'units': dict(stats['units'].most_common())}
+                for name, stats in sorted(self.components.items(), key=lambda item: -item[1]['foods'])},
+            'detail_list': self.schema_check(),
+        }
+
+
+def _loose(name):
+    """Nombre sin diferencias de espacios ni mayúsculas."""
+    return ' '.join(name.split()).casefold()
+
+
+class SchemaProfiler(GastroMiner):
+    """
+    Motor de perfilado: hereda sesión, limitador, caché, robots.txt y
+    catálogo en streaming de GastroMiner, pero no escribe ningún dataset.
+    """
+
+    def __init__(self, sample=constants.PROFILE_SAMPLE_RATE, max_foods=None, seed=None, **kwargs):
+        super().__init__(**kwargs)
+        self.sample = sample
+        self.max_foods = max_foods
+        self.seed = seed
+        self.profile = SchemaProfile()
+        self.failed_ids = []
+
+    def _initialize_storage(self):
+        # Sin salida: el perfil sólo se imprime (y opcionalmente se guarda en JSON).
+        self.completed_ids = set()
+        self.writer = None
+
+    def close(self):
+        pass
+
+    def execute(self):
+        """Perfila una muestra del catálogo y devuelve el informe."""
+        if not self._accessGranted():
+            print("[ACCESO DENEGADO] El fichero robots.txt impide la ejecución.")
+            sys.exit(1)
+        print(">>> 1. Obteniendo IDs de alimentos...")
+        catalog = list(self._iter_catalog_ids())
+        sample = self._sample(catalog)
+        units = [tuple(sample[i:i + self.batch_size]) for i in range(0, len(sample), self.batch_size)]
+        print(f">>> 2. Perfilando {len(sample)} de {len(catalog)} alimentos "
+              f"({len(units)} consultas, {constants.MAX_WORKERS} workers)...")
+        start = time.perf_counter()
+        try:
+            pending = self._profile_units(units, len(sample))
+            if pending:
+                # Segunda pasada individual para los IDs de consultas fallidas o lotes incompletos
+                self._profile_units([(food_id,) for food_id in pending], len(sample),
+                                    done=len(sample) - len(pending))
+        finally:
+            self.elapsed = time.perf_counter() - start
+            print()
+            if self.cache is not None:
+                print(f"[*] Caché de respuestas: {self.cache.hits} aciertos, {self.cache.misses} fallos.")
+                self.cache.close()
+        return self.profile.report()
+
+    def _sample(self, catalog):
+        """Muestra aleatoria (reproducible con 'seed') en el orden del catálogo."""
+        unique = list(dict.fromkeys(catalog))
+        size = max(1, round(len(unique) * self.sample)) if unique else 0
+        if self.max_foods is not None:
+            size = min(size, self.max_foods)
+        chosen = set(random.Random(self.seed).sample(range(len(unique)), size))
+        return [food_id for index, food_id in enumerate(unique) if index in chosen]
+
+    def _profile_units(self, units, total, done=0):
+        """Descarga las unidades en paralelo y acumula el perfil. Devuelve los IDs sin respuesta."""
+        pending = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=constants.MAX_WORKERS) as executor:
+            futures = {executor.submit(self._profile_unit, unit): unit for unit in units}
+            for future in concurrent.futures.as_completed(futures):
+                unit = futures[future]
+                foods = future.result()
+                for food_id in unit:
+                    if food_id in foods:
+                        self.profile.add(*foods[food_id])
+                    elif len(unit) > 1:
+                        pending.append(food_id)  # Se reintenta de forma individual
+                        continue
+                    else:
+                        self.failed_ids.append(food_id)
+                    done += 1
+                self._print_progress(done, total)
+        return pending
+
+    def _profile_unit(self, unit):
+        """[WORKER METHOD] {f_id: (etiquetas, componentes)} de una unidad, {} ante un fallo."""
+        try:
+            response = self.session.post(self.url, data=build_payload(unit))
+            if response.status_code != 200:
+                self._warn_http_error(unit, response.status_code)
+                return {}
+            return parse_profile(response.content)
+        except Exception as e:
+            print(f"\n[EXCEPCIÓN WORKER] {self._describe_unit(unit)}: {e}")
+            return {}
+
+
+def display_report(report, elapsed, failed_ids):
+    """Imprime la cobertura de etiquetas y componentes y la comprobación de DETAIL_LIST."""
+    foods = report['foods']
+    print("=" * 80)
+    print(f"| PERFIL DE ESQUEMA ({foods} alimentos en {elapsed:.1f} s)")
+    print("=" * 80)
+    print("Etiquetas de alimento (con texto / presentes):")
+    for tag, stats in report['tags'].items():
+        present = stats['present'] / foods * 100 if foods else 0.0
+        coverage = (stats['coverage'] or 0.0) * 100
+        example = (stats['example'] or '')[:30]
+        print(f"  {tag:<18} {coverage:>6.1f}% / {present:>6.1f}%   {example}")
+
+    checks = report['detail_list']
+    issues = [check for check in checks if check['issue']]
+    print(f"\nComponentes de DETAIL_LIST: {len(checks) - len(issues)}/{len(checks)} con coincidencia exacta.")
+    for check in checks:
+        if check['issue'] is None:
+            continue
+        if check['issue'] == 'whitespace':
+            detail = f"BEDCA usa {check['suggestion']!r} (difiere en espacios o mayúsculas)"
+        elif check['issue'] == 'similar':
+            detail = f"¿errata? el más parecido en BEDCA es {check['suggestion']!r}"
+        else:
+            detail = "no aparece en la muestra"
+        print(f"  [!] {check['name']!r}: {detail}")
+
+    low = [(check['name'], check['matches']) for check in checks
+           if not check['issue'] and check['matches'] < foods * 0.5]
+    if low:
+        print("\nComponentes de DETAIL_LIST presentes en menos de la mitad de la muestra:")
+        for name, matches in low:
+            print(f"  {name:<50} {matches / foods * 100:>6.1f}%")
+
+    extra = [(name, stats) for name, stats in report['components'].items() if not stats['in_detail_list']]
+    if extra:
+        print(f"\nComponentes de BEDCA fuera de DETAIL_LIST ({len(extra)}):")
+        for name, stats in extra[:30]:
+            print(f"  {name[:50]:<50} {stats['coverage'] * 100:>6.1f}%  "
+                  f"numérico {stats['numeric_ratio'] * 100:>5.1f}%")
+    if failed_ids:
+        print(f"\n[!] {len(failed_ids)} IDs sin respuesta: {', '.join(failed_ids[:20])}"
+              f"{'...' if len(failed_ids) > 20 else ''}")
+    print("=" * 80)
+    return issues
+
+
+def parse_arguments():
+    arg_parser = argparse.ArgumentParser(description="Perfil de cobertura de etiquetas y componentes de BEDCA")
+    arg_parser.add_argument('--url', default=constants.URL, help="Endpoint procquery.php (por defecto: bedca.net)")
+    arg_parser.add_argument('--sample', type=float, default=constants.PROFILE_SAMPLE_RATE,
+                            help="Fracción del catálogo a perfilar (por defecto: %(default)s)")
+    arg_parser.add_argument('--max-foods', type=int, help="Máximo de alimentos de la muestra")
+    arg_parser.add_argument('--seed', type=int, help="Semilla de la muestra (reproducible)")
+    arg_parser.add_argument('--batch-size', type=int, default=constants.BATCH_SIZE,
+                            help="IDs por consulta de Nivel 2 (por defecto: %(default)s)")
+    arg_parser.add_argument('--rate', type=float, default=constants.RATE_LIMIT,
+                            help="Ritmo inicial del limitador en peticiones/s (por defecto: %(default)s)")
+    arg_parser.add_argument('--json', metavar='FICHERO', help="Guarda el perfil completo en JSON")
+    arg_parser.add_argument('--cache', action='store_true',
+                            help="Usa la caché de respuestas en disco (como main.py)")
+    arg_parser.add_argument('--cache-file', default=constants.CACHE_FILE,
+                            help="Fichero SQLite de la caché (por defecto: %(default)s)")
+    arg_parser.add_argument('--cache-ttl', type=float, default=constants.CACHE_TTL,
+                            help="Vigencia de las respuestas cacheadas en segundos (por defecto: %(default)s)")
+    arg_parser.add_argument('--cache-max-mb', type=float, default=constants.CACHE_MAX_BYTES / 2**20,
+                            help="Presupuesto de la caché en MiB, con expulsión LRU (por defecto: %(default)s)")
+    cache_mode = arg_parser.add_mutually_exclusive_group()
+    cache_mode.add_argument('--cache-only', action='store_true',
+                            help="Sólo caché, sin ninguna petición de red (implica --cache)")
+    cache_mode.add_argument('--refresh', action='store_true',
+                            help="Ignora lo cacheado y lo vuelve a descargar (implica --cache)")
+    args = arg_parser.parse_args()
+    if not 0 < args.sample <= 1:
+        arg_parser.error("--sample debe estar en (0, 1].")
+    return args
 
 
 # --- EJECUCIÓN PRINCIPAL ---
 if __name__ == "__main__":
-    session = requests.Session()
-    session.headers.update(HEADERS)
-    
-    food_ids = get_catalog_ids(session)
-    
-    if not food_ids:
+    args = parse_arguments()
+    limiter = ratelimit.AdaptiveRateLimiter(rate=args.rate)
+    response_store, mode = None, 'normal'
+    if args.cache or args.cache_only or args.refresh:
+        mode = 'only' if args.cache_only else 'refresh' if args.refresh else 'normal'
+        response_store = response_cache.ResponseCache(args.cache_file, ttl=args.cache_ttl,
+                                                      max_bytes=int(args.cache_max_mb * 2**20))
+    profiler = SchemaProfiler(sample=args.sample, max_foods=args.max_foods, seed=args.seed,
+                              url=args.url, rate_limiter=limiter, batch_size=args.batch_size,
+                              cache=response_store, cache_mode=mode)
+    report = profiler.execute()
+    issues = display_report(report, profiler.elapsed, profiler.failed_ids)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({**report, 'elapsed_s': round(profiler.elapsed, 3), 'failed_ids': profiler.failed_ids},
+                      f, indent=2, ensure_ascii=False)
+        print(f"[*] Perfil guardado en {args.json}")
+    if issues:
+        print(f"[FAIL] {len(issues)} entradas de DETAIL_LIST sin coincidencia exacta en BEDCA.")
         sys.exit(1)
-        
-    # Limitar la prueba
-    # Usamos START_INDEX para saltarnos los primeros 100 IDs que parecen estar vacíos.
-    test_ids = food_ids[START_INDEX:START_INDEX + LIMIT]
-    print(f">>> 2. Probando campos en IDs a partir del índice {START_INDEX} ({len(test_ids)} alimentos)...")
-    
-    results = {}
-    for i, f_id in enumerate(test_ids):
-        print(f"\r  -> Consultando ID {f_id} ({i+1}/{len(test_ids)})...", end='', flush=True)
-        data = test_name_fields(session, f_id)
-        if data:
-            results[f_id] = data
-
-    display_results(results)
-    
-    print("\nProceso de descubrimiento finalizado.")
\ No newline at end of file
+    print("[OK] Todas las entradas de DETAIL_LIST coinciden con algún componente de BEDCA.")
@@ -0,0 +1,94 @@
+# -----------------------------------------------------------------------------
+# GENERADOR DE RESPUESTAS SINTÉTICAS BEDCA (FIXTURES)
+# -----------------------------------------------------------------------------
+# Produce respuestas XML con la misma forma que devuelve procquery.php para
+# las consultas de Nivel 1 (catálogo) y Nivel 2 (detalle). Se usan para medir
+# el motor sin tocar bedca.net. La generación es determinista por f_id.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import constants
+import random
+from xml.sax.saxutils import escape
+
+# Componentes que BEDCA devuelve pero que no forman parte de DETAIL_LIST.
+EXTRA_COMPONENTS = ('ceniza', 'manganeso', 'cobre', 'ácido graso 10:0 (cáprico)')
+
+# Marcadores de 'value_type' usados cuando 'best_location' viene vacío.
+VALUE_TYPE_MARKERS = ('tr', 'LQ', 'ND')
+
+UNITS = ('g', 'mg', 'ug', 'kJ', 'kcal')
+
+
+def synthetic_food(food_id):
+    """Devuelve (metadatos, componentes) pseudoaleatorios pero estables para un ID."""
+    rng = random.Random(int(food_id))
+    basic = {
+        'f_id': str(food_id),
+        'f_ori_name': f"Alimento sintético {food_id} ({rng.choice(('crudo', 'cocido', 'frito'))})",
+        'f_eng_name': f"Synthetic food {food_id}",
+        'sci_name': rng.choice(('', 'Triticum aestivum', 'Olea europaea', 'Bos taurus')),
+        'edible_portion': f"{rng.uniform(0.3, 1.0):.2f}",
+    }
+
+    components = []
+    for name in constants.DETAIL_LIST + EXTRA_COMPONENTS:
+        roll = rng.random()
+        if roll < 0.08:
+            # Componente ausente en la respuesta
+            continue
+        if roll < 0.18:
+            value, value_type = '', rng.choice(VALUE_TYPE_MARKERS)
+        else:
+            value, value_type = f"{rng.uniform(0, 900):.{rng.choice((0, 1, 2))}f}", 'BE'
+        components.append({
+            'c_id': str(rng.randint(1, 999)),
+            'c_ori_name': name,
+            'componentgroup_id': str(rng.randint(1, 20)),
+            'best_location': value,
+            'v_unit': rng.choice(UNITS),
+            'u_id': str(rng.randint(1, 30)),
+            'u_descripcion': 'gramo',
+            'value_type': value_type,
+            'vt_descripcion': 'Mejor estimación' if value_type == 'BE' else 'Traza',
+            'mu_id': '1',
+            'mu_descripcion': 'por 100 g de porción comestible',
+        })
+    return basic, components
+
+
+def _element(tag, text):
+    """Serializa un nodo hoja, usando la forma vacía si no hay texto."""
+    return f"<{tag}>{escape(text)}</{tag}>" if text else f"<{tag}/>"
+
+
+def detail_xml(food_ids):
+    """Respuesta de Nivel 2 para uno o varios IDs (un nodo <food> por ID)."""
+    parts = ['<?xml version="1.0" encoding="utf-8"?>\n<foodresponse>']
+    for food_id in food_ids:
+        basic, components = synthetic_food(food_id)
+        parts.append('<food>')
+        parts.extend(_element(tag, value) for tag, value in basic.items())
+        parts.append(_element('f_origen', 'BEDCA'))
+        for comp in components:
+            parts.append('<foodvalue>')
+            parts.extend(_element(tag, value) for tag, value in comp.items())
+            parts.append('</foodvalue>')
+        parts.append('</food>')
+    parts.append('</foodresponse>')
+    return '\n'.join(parts).encode('utf-8')
+
+
+def catalog_xml(food_ids):
+    """Respuesta de Nivel 1: un nodo <food><f_id/></food> por referencia."""
+    parts = ['<?xml version="1.0" encoding="utf-8"?>\n<foodresponse>']
+    parts.extend(f"<food><f_id>{food_id}</f_id></food>" for food_id in food_ids)
+    parts.append('</foodresponse>')
+    return '\n'.join(parts).encode('utf-8')
@@ -0,0 +1,244 @@
+# -----------------------------------------------------------------------------
+# SERVICIO HTTP LOCAL DE CONSULTA SOBRE EL DATASET
+# -----------------------------------------------------------------------------
+# Expone un FoodStore (foodstore.py) en JSON para que las aplicaciones no
+# tengan que recorrer el CSV en cada consulta:
+#   GET  /foods/<f_id>                         registro completo de un alimento
+#   GET  /search?q=pan+int[&mode=prefix|fuzzy][&field=f_ori_name|f_eng_name][&limit=50]
+#   GET  /range?where=proteina>20 and sodio<100[&order_by=proteina][&desc=1][&limit=50]
+#   GET  /stats                                tamaño, fecha de carga y recargas
+#   POST /reload                               recarga inmediata del dataset
+# Cada respuesta incluye 'took_ms' (tiempo de la consulta, sin serializar).
+#
+# Recarga en caliente: un hilo vigila el fichero del dataset (mtime y tamaño
+# cada QUERY_RELOAD_INTERVAL segundos). Cuando cambia y lleva
+# QUERY_RELOAD_SETTLE segundos sin cambiar (la nueva descarga ha terminado de
+# escribirse), construye un FoodStore nuevo en segundo plano y sustituye la
+# referencia: las consultas en curso terminan sobre el anterior y no hay
+# pausa. Si la carga falla se sigue sirviendo el dataset previo.
+#
+# Uso: python foodserver.py nutritional-info.csv [--port 8780]
+#      curl 'http://127.0.0.1:8780/search?q=lenteja&mode=fuzzy'
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import argparse
+import constants
+import foodstore
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+class FoodQueryHandler(BaseHTTPRequestHandler):
+    """Manejador HTTP: enruta cada petición a una consulta del FoodStore vigente."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        # Se toma la referencia una vez: una recarga a mitad de petición no la afecta.
+        store = self.server.store
+        try:
+            if url.path.startswith('/foods/'):
+                self._get_food(store, unquote(url.path[len('/foods/'):]))
+            elif url.path == '/search':
+                self._search(store, params)
+            elif url.path == '/range':
+                self._range(store, params)
+            elif url.path == '/stats':
+                self._reply(200, self.server.stats())
+            else:
+                self._reply(404, {'error': f"Ruta desconocida: {url.path}"})
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if urlsplit(self.path).path != '/reload':
+            self._reply(404, {'error': f"Ruta desconocida: {self.path}"})
+            return
+        try:
+            self.server.reload()
+        except (OSError, ValueError) as e:
+            self._reply(500, {'error': f"No se pudo recargar el dataset: {e}"})
+            return
+        self._reply(200, self.server.stats())
+
+    def _get_food(self, store, food_id):
+        start = time.perf_counter()
+        record = store.get(food_id)
+        took = _elapsed_ms(start)
+        if record is None:
+            self._reply(404, {'error': f"f_id desconocido: {food_id}", 'took_ms': took})
+        else:
+            self._reply(200, {'food': record, 'took_ms': took})
+
+    def _search(self, store, params):
+        query = params.get('q', '')
+        mode = params.get('mode', 'prefix')
+        fields = (params['field'],) if 'field' in params else foodstore.NAME_FIELDS
+        start = time.perf_counter()
+        matches = store.search(query, mode, fields, _limit(params))
+        took = _elapsed_ms(start)
+        results = [{**store.brief(row), 'score': score} for row, score in matches]
+        self._reply(200, {'query': query, 'mode': mode, 'results': results, 'took_ms': took})
+
+    def _range(self, store, params):
+        if 'where' not in params:
+            raise ValueError("Falta el parámetro 'where' (p. ej. where=proteina>20 and sodio<100).")
+        conditions = foodstore.parse_conditions(params['where'], store.columns)
+        start = time.perf_counter()
+        total, rows = store.range(conditions, _limit(params), params.get('order_by'),
+                                  params.get('desc', '0') not in ('0', 'false', ''))
+        took = _elapsed_ms(start)
+        self._reply(200, {
+            'conditions': [{'nutrient': name, 'op': op, 'value': value} for name, op, value in conditions],
+            'total': total,
+            'results': [store.record(row) for row in rows],
+            'took_ms': took,
+        })
+
+    def _reply(self, status, payload):
+        content = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        # Silencioso: el log por petición domina la latencia de las consultas.
+        pass
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def _limit(params):
+    try:
+        limit = int(params.get('limit', constants.QUERY_RESULT_LIMIT))
+    except ValueError:
+        raise ValueError(f"'limit' debe ser un entero: {params['limit']}") from None
+    if limit < 1:
+        raise ValueError("'limit' debe ser mayor que cero.")
+    return limit
+
+
+class FoodQueryServer(ThreadingHTTPServer):
+    """
+    Servidor de consultas sobre 'dataset_path'. 'reload_interval' 0 desactiva
+    la vigilancia del fichero (sólo POST /reload).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, dataset_path, reload_interval=constants.QUERY_RELOAD_INTERVAL,
+                 settle=constants.QUERY_RELOAD_SETTLE):
+        super().__init__(address, FoodQueryHandler)
+        self.dataset_path = dataset_path
+        self.reload_interval = reload_interval
+        self.settle = settle
+        self.reloads = 0
+        self._reload_lock = threading.Lock()  # Una sola carga a la vez
+        self._loaded_signature = None
+        self.store = None
+        try:
+            self.reload()
+        except Exception:
+            super().server_close()
+            raise
+        self._stop = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, name='dataset-watcher', daemon=True)
+        if reload_interval > 0:
+            self._watcher.start()
+
+    def _signature(self):
+        """(mtime, tamaño) del dataset, o None si no existe (p. ej. durante un reemplazo)."""
+        try:
+            stat = os.stat(self.dataset_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self):
+        """Construye un FoodStore nuevo y sustituye al vigente. Devuelve el nuevo."""
+        with self._reload_lock:
+            # La firma se toma antes de leer: un cambio durante la carga provoca otra recarga.
+            signature = self._signature()
+            store = foodstore.FoodStore(self.dataset_path)
+            self._loaded_signature = signature
+            if self.store is not None:
+                self.reloads += 1
+            self.store = store
+        return store
+
+    def _watch(self):
+        """Recarga cuando el fichero cambia y se mantiene estable 'settle' segundos."""
+        seen, changed_at = None, None
+        while not self._stop.wait(self.reload_interval):
+            signature = self._signature()
+            if signature is None or signature == self._loaded_signature:
+                seen = None
+                continue
+            if signature != seen:
+                seen, changed_at = signature, time.monotonic()
+                continue
+            if time.monotonic() - changed_at < self.settle:
+                continue
+            try:
+                store = self.reload()
+                print(f"[*] Dataset recargado: {store.size} alimentos en {store.build_seconds:.2f} s.")
+            except (OSError, ValueError) as e:
+                # Se sigue sirviendo el dataset anterior; no se reintenta hasta el próximo cambio.
+                self._loaded_signature = signature
+                print(f"[WARN] No se pudo recargar '{self.dataset_path}': {e}")
+            seen = None
+
+    def stats(self):
+        return {**self.store.stats(), 'reloads': self.reloads}
+
+    def server_close(self):
+        self._stop.set()
+        if self._watcher.is_alive():
+            self._watcher.join()
+        super().server_close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Servicio HTTP de consulta sobre el dataset de GastroMiner")
+    arg_parser.add_argument('dataset', nargs='?', default=constants.CSV_OUTPUT_FILE,
+                            help="CSV o salida .parquet/.arrow (por defecto: %(default)s)")
+    arg_parser.add_argument('--host', default=constants.QUERY_HOST)
+    arg_parser.add_argument('--port', type=int, default=constants.QUERY_PORT)
+    arg_parser.add_argument('--reload-interval', type=float, default=constants.QUERY_RELOAD_INTERVAL,
+                            help="Segundos entre comprobaciones del dataset; 0 = sin recarga automática "
+                                 "(por defecto: %(default)s)")
+    arg_parser.add_argument('--settle', type=float, default=constants.QUERY_RELOAD_SETTLE,
+                            help="Segundos sin cambios antes de recargar (por defecto: %(default)s)")
+    args = arg_parser.parse_args()
+
+    try:
+        server = FoodQueryServer((args.host, args.port), args.dataset, args.reload_interval, args.settle)
+    except (OSError, ValueError) as e:
+        print(f"[FATAL] No se pudo cargar '{args.dataset}': {e}")
+        sys.exit(1)
+    print(f"[*] {server.store.size} alimentos indexados en {server.store.build_seconds:.2f} s. "
+          f"Sirviendo en http://{args.host}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[*] Servicio detenido.")
+    finally:
+        server.server_close()
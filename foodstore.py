@@ -0,0 +1,452 @@
+# -----------------------------------------------------------------------------
+# ALMACÉN DE CONSULTA EN MEMORIA (ÍNDICES SOBRE EL DATASET EXTRAÍDO)
+# -----------------------------------------------------------------------------
+# Carga una vez el dataset (CSV de GastroMiner o salida columnar Parquet/Arrow)
+# en columnas compactas y construye índices para responder sin recorrerlo:
+#   - f_id -> fila: diccionario (O(1)).
+#   - Nombres (f_ori_name, f_eng_name): normalizados sin acentos ni mayúsculas.
+#       * Prefijo: lista ordenada de palabras -> filas; búsqueda por bisección.
+#         Cada palabra de la consulta debe ser prefijo de alguna palabra del
+#         nombre ("pan int" encuentra "Pan integral").
+#       * Aproximada: índice de trigramas -> filas; puntuación de Dice entre
+#         los trigramas de la consulta y los del nombre (tolera erratas).
+#   - Nutrientes de DETAIL_LIST: matriz float64 (NaN = sin valor) y, por
+#     columna, el orden de las filas con valor y sus valores ordenados. Una
+#     consulta de rango ("proteina > 20 and sodio < 100") toma el tramo de la
+#     condición más selectiva con searchsorted y filtra el resto sobre la
+#     matriz, sin comparar todas las filas.
+# El almacén es inmutable: para recargar se construye otro y se sustituye la
+# referencia (ver foodserver.py).
+#
+# Uso: python foodstore.py nutritional-info.csv [--queries 2000]
+#      (mide la latencia de cada tipo de consulta sobre el dataset)
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import argparse
+import bisect
+import collections
+import columnar
+import constants
+import csv
+import math
+import numpy as np
+import random
+import re
+import time
+import unicodedata
+
+NAME_FIELDS = ('f_ori_name', 'f_eng_name')
+TEXT_FIELDS = ('f_ori_name', 'f_eng_name', 'sci_name')
+
+# Operadores de las condiciones de rango y su función de comparación.
+OPERATORS = {
+    '>': np.greater, '>=': np.greater_equal,
+    '<': np.less, '<=': np.less_equal,
+    '=': np.equal, '==': np.equal,
+}
+CONDITION = re.compile(r'^\s*(.+?)\s*(>=|<=|==|=|>|<)\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*$')
+CONDITION_SEPARATOR = re.compile(r'\s+and\s+|\s*&&\s*|\s*;\s*', re.IGNORECASE)
+
+
+def normalize(text):
+    """Minúsculas, sin acentos y con los separadores reducidos a un espacio."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+
+def trigrams(text):
+    """Trigramas de cada palabra de un texto normalizado, con bordes marcados."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def parse_conditions(expression, columns=constants.DETAIL_LIST):
+    """
+    Convierte "proteina > 20 and sodio < 100" en [(columna, operador, valor)].
+    Las columnas se resuelven con resolve_column. ValueError si no se entiende.
+    """
+    conditions = []
+    for part in CONDITION_SEPARATOR.split(expression.strip()):
+        if not part:
+            continue
+        match = CONDITION.match(part)
+        if match is None:
+            raise ValueError(f"Condición no válida: '{part}' (formato: <nutriente> <op> <número>).")
+        name, op, value = match.groups()
+        conditions.append((resolve_column(name, columns), op, float(value)))
+    if not conditions:
+        raise ValueError("La consulta de rango no contiene condiciones.")
+    return conditions
+
+
+def resolve_column(name, columns=constants.DETAIL_LIST):
+    """
+    Nombre exacto de DETAIL_LIST a partir del nombre exacto, normalizado o de
+    un prefijo normalizado único ('proteina' -> 'proteina, total').
+    """
+    if name in columns:
+        return name
+    wanted = normalize(name)
+    normalized = {column: normalize(column) for column in columns}
+    exact = [column for column, text in normalized.items() if text == wanted]
+    if exact:
+        return exact[0]
+    candidates = [column for column, text in normalized.items() if text.startswith(wanted)]
+    if len(candidates) == 1:
+        return candidates[0]
+    if not candidates:
+        raise ValueError(f"Nutriente desconocido: '{name}'.")
+    raise ValueError(f"Nutriente ambiguo: '{name}' ({'; '.join(candidates)}).")
+
+
+def _read_csv(path):
+    """Columnas de un CSV de GastroMiner: ({campo: [texto]}, matriz, {fila: {nutriente: marcador}})."""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        if tuple(next(reader, ())) != tuple(constants.CSV_HEADER):
+            raise ValueError(f"La cabecera de '{path}' no coincide con CSV_HEADER.")
+        rows = list(reader)
+    basic_count = len(constants.BASIC_LIST)
+    texts = {name: [row[index] for row in rows] for index, name in enumerate(constants.BASIC_LIST)}
+    values = np.full((len(rows), len(constants.DETAIL_LIST)), np.nan, dtype=np.float64, order='F')
+    flags = collections.defaultdict(dict)
+    for row_index, row in enumerate(rows):
+        for column, text in enumerate(row[basic_count:]):
+            number, flag = columnar.parse_value(text)
+            if number is not None:
+                values[row_index, column] = number
+            elif flag is not None:
+                flags[row_index][constants.DETAIL_LIST[column]] = flag
+    return texts, values, flags
+
+
+def _read_columnar(path):
+    """Igual que _read_csv para una salida Parquet/Arrow de columnar.py."""
+    table = columnar.load_table(path)
+    texts = {}
+    for name in constants.BASIC_LIST:
+        # Los float32 se pasan a texto con su representación más corta (0.58, no 0.5799...).
+        convert = (lambda value: str(np.float32(value))) if name == 'edible_portion' else str
+        texts[name] = [constants.EMPTY if value is None else convert(value)
+                       for value in table.column(name).to_pylist()]
+    values = np.empty((table.num_rows, len(constants.DETAIL_LIST)), dtype=np.float64, order='F')
+    flags = collections.defaultdict(dict)
+    for column, name in enumerate(constants.DETAIL_LIST):
+        values[:, column] = table.column(name).to_numpy(zero_copy_only=False).astype(str).astype(np.float64)
+        for row_index, flag in enumerate(table.column(name + columnar.FLAG_SUFFIX).to_pylist()):
+            if flag is not None:
+                flags[row_index][name] = flag
+    return texts, values, flags
+
+
+class FoodStore:
+    """
+    Dataset indexado de sólo lectura. Todas las consultas devuelven registros
+    serializables en JSON (ver record).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        start = time.perf_counter()
+        reader = _read_columnar if path.endswith(('.parquet', '.arrow', '.feather')) else _read_csv
+        texts, self.values, self.flags = reader(path)
+        self.ids = texts['f_id']
+        self.size = len(self.ids)
+        self.texts = {name: texts[name] for name in TEXT_FIELDS}
+        portions = [columnar.parse_value(text)[0] for text in texts['edible_portion']]
+        self.edible_portion = np.array([np.nan if value is None else value for value in portions], dtype=np.float64)
+        self.columns = constants.DETAIL_LIST
+        self.column_index = {name: index for index, name in enumerate(self.columns)}
+        self._rows = {food_id: index for index, food_id in enumerate(self.ids)}
+        if len(self._rows) != self.size:
+            print(f"[WARN] '{path}' contiene f_id repetidos: se indexa la última fila de cada uno.")
+        self._build_name_indexes()
+        self._build_range_indexes()
+        self.build_seconds = time.perf_counter() - start
+        self.loaded_at = time.time()
+
+    # --- Construcción de índices ---
+
+    def _build_name_indexes(self):
+        """
+        Por campo de nombre: nombres completos ordenados, palabras ordenadas
+        (prefijo), longitud de cada nombre (desempate) y trigramas (aproximada).
+        """
+        self._names = {}
+        self._tokens = {}
+        self._name_lengths = {}
+        self._trigrams = {}
+        self._trigram_counts = {}
+        for field in NAME_FIELDS:
+            normalized = [normalize(text) if text != constants.EMPTY else '' for text in self.texts[field]]
+            names = sorted((text, row) for row, text in enumerate(normalized) if text)
+            self._names[field] = ([text for text, _ in names], np.array([row for _, row in names], dtype=np.int32))
+            pairs = sorted({(word, row) for row, text in enumerate(normalized) for word in text.split()})
+            self._tokens[field] = ([word for word, _ in pairs], np.array([row for _, row in pairs], dtype=np.int32))
+            self._name_lengths[field] = np.array([len(text) for text in normalized], dtype=np.int32)
+            postings = collections.defaultdict(list)
+            counts = np.zeros(self.size, dtype=np.int32)
+            for row, text in enumerate(normalized):
+                grams = trigrams(text)
+                counts[row] = len(grams)
+                for gram in grams:
+                    postings[gram].append(row)
+            self._trigrams[field] = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+            self._trigram_counts[field] = counts
+
+    def _build_range_indexes(self):
+        """Por nutriente: filas con valor ordenadas por valor y esos valores."""
+        self._order = []
+        self._sorted = []
+        for column in range(len(self.columns)):
+            values = self.values[:, column]
+            present = np.flatnonzero(~np.isnan(values))
+            order = present[np.argsort(values[present], kind='stable')].astype(np.int32)
+            self._order.append(order)
+            self._sorted.append(np.ascontiguousarray(values[order]))
+
+    # --- Consultas ---
+
+    def record(self, row):
+        """Registro JSON de una fila: metadatos, nutrientes (None = sin valor) y marcadores."""
+        values = self.values[row]
+        portion = self.edible_portion[row]
+        record = {'f_id': self.ids[row]}
+        for field in TEXT_FIELDS:
+            text = self.texts[field][row]
+            record[field] = None if text == constants.EMPTY else text
+        record['edible_portion'] = None if np.isnan(portion) else float(portion)
+        record['nutrients'] = {name: (None if math.isnan(value) else value)
+                               for name, value in zip(self.columns, values.tolist())}
+        record['flags'] = dict(self.flags.get(row, {}))
+        return record
+
+    def brief(self, row):
+        """f_id y nombres de una fila (resultados de búsqueda)."""
+        brief = {'f_id': self.ids[row]}
+        for field in NAME_FIELDS:
+            text = self.texts[field][row]
+            brief[field] = None if text == constants.EMPTY else text
+        return brief
+
+    def row_of(self, food_id):
+        """Fila de un f_id, o None si no está en el dataset."""
+        return self._rows.get(str(food_id))
+
+    def get(self, food_id):
+        """Registro de un f_id, o None si no está en el dataset."""
+        row = self.row_of(food_id)
+        return None if row is None else self.record(row)
+
+    def search(self, query, mode='prefix', fields=NAME_FIELDS, limit=constants.QUERY_RESULT_LIMIT):
+        """
+        Busca por nombre. 'mode' es 'prefix' o 'fuzzy'. Devuelve
+        [(fila, puntuación)] ordenado de mejor a peor, como mucho 'limit'.
+        """
+        wanted = normalize(query)
+        if not wanted:
+            return []
+        unknown = set(fields) - set(NAME_FIELDS)
+        if unknown:
+            raise ValueError(f"Campo de nombre desconocido: {', '.join(sorted(unknown))}.")
+        if mode == 'prefix':
+            scores = self._prefix_scores(wanted, fields, limit)
+        elif mode == 'fuzzy':
+            scores = self._fuzzy_scores(wanted, fields, limit)
+        else:
+            raise ValueError(f"Modo de búsqueda desconocido: '{mode}' (prefix o fuzzy).")
+        return _top(scores, limit)
+
+    def _prefix_scores(self, wanted, fields, limit):
+        """
+        Puntuación 1.0: el nombre completo empieza por la consulta (bisección
+        sobre los nombres ordenados). Puntuación 0.5: cada palabra de la
+        consulta es prefijo de una palabra del nombre. Dentro de cada nivel se
+        prefieren los nombres más cortos.
+        """
+        scores = {}
+        for field in fields:
+            names, name_rows = self._names[field]
+            start = bisect.bisect_left(names, wanted)
+            end = bisect.bisect_left(names, wanted + '\uffff', start)
+            lengths = self._name_lengths[field]
+            for row, length in _shortest(name_rows[start:end], lengths, limit):
+                scores[row] = 1.0 - length * 1e-6
+            if end - start >= limit:
+                continue
+            words, word_rows = self._tokens[field]
+            matched = None
+            for prefix in wanted.split():
+                start = bisect.bisect_left(words, prefix)
+                end = bisect.bisect_left(words, prefix + '\uffff', start)
+                hits = np.zeros(self.size, dtype=bool)
+                hits[word_rows[start:end]] = True
+                matched = hits if matched is None else matched & hits
+            for row, length in _shortest(np.flatnonzero(matched), lengths, limit):
+                scores[row] = max(scores.get(row, -1.0), 0.5 - length * 1e-6)
+        return scores
+
+    def _fuzzy_scores(self, wanted, fields, limit):
+        """Coeficiente de Dice entre trigramas de la consulta y del nombre (>= FUZZY_MIN_SCORE)."""
+        grams = trigrams(wanted)
+        scores = {}
+        for field in fields:
+            index = self._trigrams[field]
+            postings = [index[gram] for gram in grams if gram in index]
+            if not postings:
+                continue
+            hits = np.bincount(np.concatenate(postings), minlength=self.size)
+            dice = 2.0 * hits / (len(grams) + self._trigram_counts[field])
+            rows = np.flatnonzero(dice >= constants.FUZZY_MIN_SCORE)
+            if len(rows) > limit:
+                rows = rows[np.argpartition(-dice[rows], limit - 1)[:limit]]
+            for row, score in zip(rows.tolist(), dice[rows].tolist()):
+                if score > scores.get(row, -1.0):
+                    scores[row] = score
+        return scores
+
+    def range(self, conditions, limit=constants.QUERY_RESULT_LIMIT, order_by=None, descending=False):
+        """
+        Filas que cumplen todas las condiciones [(nutriente, operador, valor)]
+        (o una expresión de texto, ver parse_conditions). Devuelve
+        (total, [fila]): el total de coincidencias y como mucho 'limit' filas,
+        en orden del dataset o por el nutriente 'order_by'.
+        """
+        if isinstance(conditions, str):
+            conditions = parse_conditions(conditions, self.columns)
+        spans = []
+        for name, op, value in conditions:
+            if op not in OPERATORS:
+                raise ValueError(f"Operador desconocido: '{op}'.")
+            column = self.column_index[resolve_column(name, self.columns)]
+            spans.append((self._span(column, op, value), column, op, value))
+        # La condición más selectiva aporta los candidatos; el resto se filtra sobre ellos.
+        spans.sort(key=lambda span: span[0][1] - span[0][0])
+        (start, end), column, _, _ = spans[0]
+        candidates = self._order[column][start:end]
+        for _, column, op, value in spans[1:]:
+            if not len(candidates):
+                break
+            candidates = candidates[OPERATORS[op](self.values[candidates, column], value)]
+        if order_by is None:
+            ordered = np.sort(candidates)
+        else:
+            column = self.column_index[resolve_column(order_by, self.columns)]
+            keys = self.values[candidates, column]
+            ordered = candidates[np.argsort(-keys if descending else keys, kind='stable')]
+        return len(candidates), ordered[:limit].tolist()
+
+    def _span(self, column, op, value):
+        """Tramo [inicio, fin) del índice ordenado de 'column' que cumple 'op value'."""
+        ordered = self._sorted[column]
+        if op == '>':
+            return int(np.searchsorted(ordered, value, 'right')), len(ordered)
+        if op == '>=':
+            return int(np.searchsorted(ordered, value, 'left')), len(ordered)
+        if op == '<':
+            return 0, int(np.searchsorted(ordered, value, 'left'))
+        if op == '<=':
+            return 0, int(np.searchsorted(ordered, value, 'right'))
+        return int(np.searchsorted(ordered, value, 'left')), int(np.searchsorted(ordered, value, 'right'))
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'foods': self.size,
+            'nutrients': len(self.columns),
+            'loaded_at': self.loaded_at,
+            'build_s': round(self.build_seconds, 3),
+        }
+
+
+def _shortest(rows, lengths, limit):
+    """[(fila, longitud)] de las 'limit' filas de 'rows' con el nombre más corto (sin ordenar)."""
+    if len(rows) > limit:
+        rows = rows[np.argpartition(lengths[rows], limit - 1)[:limit]]
+    return zip(rows.tolist(), lengths[rows].tolist())
+
+
+def _top(scores, limit):
+    """Las 'limit' mejores (fila, puntuación), de mayor a menor puntuación."""
+    if not scores:
+        return []
+    rows = np.fromiter(scores.keys(), dtype=np.int64, count=len(scores))
+    values = np.fromiter(scores.values(), dtype=np.float64, count=len(scores))
+    if len(rows) > limit:
+        keep = np.argpartition(-values, limit - 1)[:limit]
+        rows, values = rows[keep], values[keep]
+    order = np.lexsort((rows, -values))
+    return [(row, round(score, 4)) for row, score in zip(rows[order].tolist(), values[order].tolist())]
+
+
+def benchmark(store, queries, seed=1):
+    """Latencia (µs) de cada tipo de consulta con entradas tomadas del propio dataset."""
+    rng = random.Random(seed)
+    sample = [rng.randrange(store.size) for _ in range(queries)]
+    names = [store.texts['f_ori_name'][row] for row in sample]
+    cases = {
+        'get': [(store.get, (store.ids[row],), {}) for row in sample],
+        'prefix': [(store.search, (' '.join(w[:4] for w in name.split()[:2]),), {'mode': 'prefix'})
+                   for name in names],
+        'fuzzy': [(store.search, (_typo(name, rng),), {'mode': 'fuzzy'}) for name in names],
+        'range': [(store.range, (_random_conditions(store, rng),), {}) for _ in sample],
+    }
+    results = {}
+    for kind, calls in cases.items():
+        timings = []
+        for func, args, kwargs in calls:
+            start = time.perf_counter()
+            func(*args, **kwargs)
+            timings.append((time.perf_counter() - start) * 1e6)
+        timings.sort()
+        results[kind] = {
+            'p50_us': round(timings[len(timings) // 2], 1),
+            'p99_us': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 1),
+            'max_us': round(timings[-1], 1),
+        }
+    return results
+
+
+def _typo(text, rng):
+    """El texto con un carácter cambiado (consulta aproximada de prueba)."""
+    if len(text) < 4:
+        return text
+    position = rng.randrange(len(text))
+    return text[:position] + rng.choice('aeiou') + text[position + 1:]
+
+
+def _random_conditions(store, rng):
+    """Dos condiciones sobre nutrientes con valores, con umbrales en su mediana."""
+    columns = [column for column in range(len(store.columns)) if len(store._sorted[column])]
+    conditions = []
+    for column, op in zip(rng.sample(columns, min(2, len(columns))), ('>', '<')):
+        ordered = store._sorted[column]
+        conditions.append((store.columns[column], op, float(ordered[len(ordered) // 2])))
+    return conditions
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Carga un dataset en FoodStore y mide la latencia de consulta")
+    arg_parser.add_argument('dataset', help="CSV de GastroMiner o salida .parquet/.arrow")
+    arg_parser.add_argument('--queries', type=int, default=2000, help="Consultas por tipo (por defecto: %(default)s)")
+    args = arg_parser.parse_args()
+
+    store = FoodStore(args.dataset)
+    print(f"[*] {store.size} alimentos indexados en {store.build_seconds:.2f} s.")
+    if not store.size:
+        sys.exit(0)
+    for kind, result in benchmark(store, args.queries).items():
+        print(f"    {kind:<7} p50 {result['p50_us']:>8.1f} µs   p99 {result['p99_us']:>8.1f} µs   "
+              f"máx {result['max_us']:>8.1f} µs")
@@ -0,0 +1,77 @@
+# -----------------------------------------------------------------------------
+# DIARIO DE IDS COMPLETADOS (RESUME JOURNAL)
+# -----------------------------------------------------------------------------
+# Fichero append-only que acompaña al CSV de salida. Cada lote escrito añade
+# una línea "<offset>\t<id>,<id>,..." DESPUÉS de volcar sus filas al CSV y
+# hacer fsync, donde <offset> es el tamaño en bytes del CSV tras el lote; el
+# diario nunca registra bytes que no estén ya en disco. Al reanudar:
+#   - Sólo cuentan las líneas completas (terminadas en '\n').
+#   - El CSV se trunca al último offset registrado, descartando filas que se
+#     escribieron pero nunca llegaron al diario (lote a medias).
+#   - Un offset mayor que el CSV es un error, y un CSV sin diario se
+#     reconstruye desde sus propias filas (ver writers.CsvSink.open).
+# Así filas y diario avanzan juntos: ningún ID se pierde ni se duplica.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+
+class CompletionJournal:
+    """Registro de los f_id ya persistidos y del offset válido del CSV."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def load(self):
+        """
+        Lee el diario existente. Devuelve (ids_completados, ultimo_offset), con
+        offset None si no hay ninguna entrada válida.
+        """
+        done_ids, offset = set(), None
+        if not os.path.exists(self.path):
+            return done_ids, offset
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # Línea truncada por una interrupción: se ignora
+                offset_text, _, ids_text = line.rstrip('\n').partition('\t')
+                offset = int(offset_text)
+                if ids_text:
+                    done_ids.update(ids_text.split(','))
+        return done_ids, offset
+
+    def open(self, resume):
+        """Abre el diario en modo append (resume) o lo reinicia."""
+        if resume:
+            self._drop_partial_tail()
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+
+    def append(self, offset, ids):
+        """Registra un lote ya volcado al CSV."""
+        self._file.write(f"{offset}\t{','.join(ids)}\n")
+        self._file.flush()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _drop_partial_tail(self):
+        """Elimina una última línea sin '\\n' para que el siguiente append quede alineado."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
@@ -14,7 +14,17 @@ if os.path.isdir(src_dir) and src_dir not in sys.path:
     sys.path.insert(0, src_dir)
 
 from GastroMiner import GastroMiner
+from replay import ReplayMiner
+import archive
+import argparse
+import cache as response_cache
+import constants
 import datetime
+import delta
+import metrics
+import parsers
+import ratelimit
+import shard
 import time
 
 def print_banner():
@@ -29,14 +39,199 @@ def print_banner():
     >> MOTOR DE EXTRACCIÓN NUTRICIONAL v2.1 <<
     """)
 
+def select_engine(name):
+    """Devuelve la clase del motor solicitado; el asíncrono requiere aiohttp."""
+    if name == 'async':
+        try:
+            from asyncminer import AsyncGastroMiner
+        except ImportError as e:
+            print(f"[!] El motor 'async' requiere aiohttp (pip install -r requirements.txt): {e}")
+            sys.exit(1)
+        return AsyncGastroMiner
+    return GastroMiner
+
+def select_sink(fmt, output_file, resume=False):
+    """
+    Devuelve (sink, fichero) para el formato pedido. El CSV usa el sink por
+    defecto de GastroMiner (None); SQLite admite reanudación ('resume') y los
+    formatos columnares requieren pyarrow y numpy.
+    """
+    if fmt == 'csv':
+        return None, output_file
+    if fmt == 'sqlite':
+        import database
+        if output_file == constants.CSV_OUTPUT_FILE:
+            output_file = os.path.splitext(output_file)[0] + '.sqlite'
+        return database.SqliteSink(output_file, resume=resume), output_file
+    try:
+        import columnar
+    except ImportError as e:
+        print(f"[!] El formato '{fmt}' requiere pyarrow y numpy (pip install -r requirements.txt): {e}")
+        sys.exit(1)
+    if output_file == constants.CSV_OUTPUT_FILE:
+        output_file = os.path.splitext(output_file)[0] + ('.parquet' if fmt == 'parquet' else '.arrow')
+    return columnar.ColumnarSink(output_file, fmt), output_file
+
+def process_count(value):
+    """Tipo argparse para --parse-processes: un entero o 'auto' (núcleos disponibles)."""
+    if value == 'auto':
+        import parsestage
+        return parsestage.available_cores()
+    return int(value)
+
+def shard_spec(value):
+    """Tipo argparse para --shard: 'k/n'."""
+    try:
+        return shard.parse_spec(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def parse_arguments():
+    """Define las opciones de línea de comandos del lanzador."""
+    parser = argparse.ArgumentParser(description="GastroMiner: extracción nutricional de BEDCA")
+    parser.add_argument('--engine', choices=constants.ENGINES, default=constants.ENGINE,
+                        help="Motor de orquestación de peticiones (por defecto: %(default)s)")
+    parser.add_argument('--url', default=constants.URL,
+                        help="Endpoint procquery.php (p. ej. el servidor local bedca_stub.py)")
+    parser.add_argument('--output', default=constants.CSV_OUTPUT_FILE,
+                        help="Fichero CSV de salida (por defecto: %(default)s)")
+    parser.add_argument('--format', choices=constants.OUTPUT_FORMATS, default='csv',
+                        help="Formato de salida: CSV, columnar tipado Parquet/Arrow + matriz .npy o "
+                             "base SQLite con tabla de componentes (por defecto: %(default)s)")
+    parser.add_argument('--max-in-flight', type=int, default=constants.ASYNC_MAX_IN_FLIGHT,
+                        help="Motor async: peticiones simultáneas en vuelo (por defecto: %(default)s)")
+    parser.add_argument('--max-connections', type=int, default=constants.ASYNC_MAX_CONNECTIONS,
+                        help="Motor async: tamaño del pool de conexiones (por defecto: %(default)s)")
+    parser.add_argument('--rate', type=float, default=constants.RATE_LIMIT,
+                        help="Ritmo inicial global en peticiones/s; se adapta entre --min-rate y "
+                             "--max-rate (por defecto: %(default)s)")
+    parser.add_argument('--burst', type=float, default=constants.RATE_BURST,
+                        help="Ráfaga máxima del cubo de tokens (por defecto: %(default)s)")
+    parser.add_argument('--min-rate', type=float, default=constants.RATE_MIN,
+                        help="Ritmo mínimo en peticiones/s (por defecto: %(default)s)")
+    parser.add_argument('--max-rate', type=float, default=constants.RATE_MAX,
+                        help="Ritmo máximo en peticiones/s (por defecto: %(default)s)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reanuda una ejecución interrumpida usando el diario de IDs completados")
+    parser.add_argument('--sync', action='store_true',
+                        help="Sincronización incremental contra el CSV existente: sólo IDs nuevos y una "
+                             "muestra de revalidación, con informe de cambios")
+    parser.add_argument('--sync-sample', type=float, default=constants.SYNC_SAMPLE_RATE,
+                        help="Fracción de IDs conocidos que se revalidan al azar (por defecto: %(default)s)")
+    parser.add_argument('--sync-max-age', type=float, default=constants.SYNC_MAX_AGE / 86400,
+                        help="Días máximos sin revalidar un ID (por defecto: %(default)s)")
+    parser.add_argument('--cache', action='store_true',
+                        help="Activa la caché de respuestas en disco")
+    parser.add_argument('--cache-file', default=constants.CACHE_FILE,
+                        help="Fichero SQLite de la caché (por defecto: %(default)s)")
+    parser.add_argument('--cache-ttl', type=float, default=constants.CACHE_TTL,
+                        help="Vigencia de las respuestas cacheadas en segundos (por defecto: %(default)s)")
+    parser.add_argument('--cache-max-mb', type=float, default=constants.CACHE_MAX_BYTES / 2**20,
+                        help="Presupuesto de la caché en MiB, con expulsión LRU (por defecto: %(default)s)")
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument('--cache-only', action='store_true',
+                            help="Sólo caché, sin ninguna petición de red (implica --cache)")
+    cache_mode.add_argument('--refresh', action='store_true',
+                            help="Ignora lo cacheado y lo vuelve a descargar (implica --cache)")
+    parser.add_argument('--ordered', action='store_true',
+                        help="Escribe las filas en orden de catálogo (salida reproducible entre ejecuciones)")
+    parser.add_argument('--shard', metavar='K/N', type=shard_spec,
+                        help="Rastrea sólo el fragmento K de N del catálogo (reparto por hash de f_id); "
+                             "la salida por defecto pasa a <base>.shard-K-of-N.<ext>")
+    parser.add_argument('--archive', metavar='PACK',
+                        help="Guarda cada respuesta cruda (Nivel 1 y 2) en un archivo comprimido append-only")
+    parser.add_argument('--replay', metavar='PACK',
+                        help="Regenera el dataset desde un archivo de --archive, sin red y con un proceso "
+                             "de parsing por núcleo (salvo --parse-processes)")
+    parser.add_argument('--batch-size', type=int, default=constants.BATCH_SIZE,
+                        help="IDs por consulta de Nivel 2 (relación IN); si el lote falla se piden "
+                             "de uno en uno (por defecto: %(default)s)")
+    parser.add_argument('--parser', choices=sorted(parsers.PARSERS), default=constants.PARSER_ENGINE,
+                        help="Motor de parsing de las respuestas de Nivel 2 (por defecto: %(default)s)")
+    parser.add_argument('--parse-processes', type=process_count, default=constants.PARSE_PROCESSES,
+                        help="Procesos de parsing fuera del GIL; 0 = parsear en los workers de red, "
+                             "'auto' = uno por núcleo (por defecto: %(default)s)")
+    parser.add_argument('--metrics-json', metavar='FICHERO',
+                        help="Activa las métricas por etapa y escribe un resumen JSON al terminar")
+    parser.add_argument('--metrics-prom', metavar='FICHERO',
+                        help="Activa las métricas y reescribe periódicamente un fichero de texto Prometheus")
+    parser.add_argument('--metrics-interval', type=float, default=constants.METRICS_EXPORT_INTERVAL,
+                        help="Segundos entre reescrituras del fichero Prometheus (por defecto: %(default)s)")
+    return parser.parse_args()
+
+def finish_metrics(args, exporter):
+    """Escribe las exportaciones finales de métricas (también tras Ctrl+C)."""
+    if exporter is not None:
+        exporter.stop()
+    if args.metrics_json:
+        metrics.write_json_summary(args.metrics_json)
+        print(f"[*] Resumen de métricas en '{args.metrics_json}'.")
+
 if __name__ == "__main__":
+    args = parse_arguments()
+    if args.resume and args.format not in ('csv', 'sqlite'):
+        print("[!] --resume sólo está disponible con --format csv o sqlite "
+              "(convierta después con columnar.py).")
+        sys.exit(2)
+    if (args.sync or args.shard) and args.format != 'csv':
+        print("[!] --sync y --shard sólo están disponibles con --format csv "
+              "(convierta después con columnar.py o database.py).")
+        sys.exit(2)
+    if args.resume and args.sync:
+        print("[!] --sync ya es incremental: no se combina con --resume.")
+        sys.exit(2)
+    if args.shard and (args.sync or args.replay):
+        print("[!] --shard no se combina con --sync ni con --replay.")
+        sys.exit(2)
+    if args.replay and (args.resume or args.sync or args.archive):
+        print("[!] --replay regenera el dataset completo: no se combina con --resume, --sync ni --archive.")
+        sys.exit(2)
     print_banner()
 
+    # Métricas por etapa: se activan antes de construir el motor (ver metrics.py)
+    metrics_exporter = None
+    if args.metrics_json or args.metrics_prom:
+        metrics.enable()
+        if args.metrics_prom:
+            metrics_exporter = metrics.TextfileExporter(args.metrics_prom, args.metrics_interval).start()
+
     # 1. Inicialización del Motor (Control de Dependencias)
     print("[*] Inicializando núcleo del sistema (GastroMiner)...")
     try:
         # Se crea la instancia de la clase principal, que inicializa la sesión HTTP y el fichero CSV.
-        data_miner = GastroMiner()
+        engine_class = select_engine(args.engine)
+        response_store, cache_mode = None, 'normal'
+        if args.cache or args.cache_only or args.refresh:
+            cache_mode = 'only' if args.cache_only else 'refresh' if args.refresh else 'normal'
+            response_store = response_cache.ResponseCache(args.cache_file, ttl=args.cache_ttl,
+                                                          max_bytes=int(args.cache_max_mb * 2**20))
+        output_file = args.output
+        if args.shard and output_file == constants.CSV_OUTPUT_FILE:
+            output_file = shard.output_path(output_file, *args.shard)
+        sink, output_file = select_sink(args.format, output_file, args.resume)
+        if args.sync:
+            sink = delta.DeltaSink(output_file, sample_rate=args.sync_sample,
+                                   max_age=args.sync_max_age * 86400)
+        engine_options = {}
+        if args.engine == 'async':
+            engine_options = {'max_in_flight': args.max_in_flight,
+                              'max_connections': args.max_connections}
+        if args.replay:
+            # Sin red: el archivo sustituye al catálogo y a las descargas.
+            data_miner = ReplayMiner(args.replay, parser_engine=args.parser, output_file=output_file,
+                                     sink=sink, parse_processes=args.parse_processes)
+        else:
+            response_archive = archive.PackWriter(args.archive).open() if args.archive else None
+            data_miner = engine_class(parser_engine=args.parser, url=args.url, output_file=output_file,
+                                      sink=sink, resume=args.resume, cache=response_store,
+                                      cache_mode=cache_mode, archive=response_archive,
+                                      shard=shard.Shard(*args.shard, output_file) if args.shard else None,
+                                      ordered=args.ordered,
+                                      batch_size=args.batch_size, parse_processes=args.parse_processes,
+                                      rate_limiter=ratelimit.AdaptiveRateLimiter(
+                                          rate=args.rate, burst=args.burst,
+                                          min_rate=args.min_rate, max_rate=args.max_rate),
+                                      **engine_options)
     except Exception as e:
         print(f"[!] ERROR FATAL al inicializar GastroMiner. Verifique constantes y permisos de I/O: {e}")
         sys.exit(1)
@@ -55,12 +250,16 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         # Manejo de la interrupción de teclado (Ctrl+C)
         print("\n\n[!] Interrupción manual detectada (SIGINT). Deteniendo el proceso limpiamente.")
+        print("[!] Las filas ya extraídas se conservan: relance con --resume para continuar.")
+        finish_metrics(args, metrics_exporter)
         sys.exit(0)
     except Exception as e:
         # Captura de cualquier otra excepción no manejada
         print(f"\n[!] ERROR NO CONTROLADO durante la ejecución: {e}")
         sys.exit(1)
 
+    finish_metrics(args, metrics_exporter)
+
     # 4. Cálculo de Métricas Finales
     end_timestamp = datetime.datetime.now()
     end_perf_counter = time.time()
@@ -0,0 +1,351 @@
+# -----------------------------------------------------------------------------
+# MÉTRICAS POR ETAPA (CONTADORES, GAUGES E HISTOGRAMAS)
+# -----------------------------------------------------------------------------
+# Superficie de instrumentación ligera del pipeline. Los módulos registran
+# siempre a través de 'metrics.registry':
+#   metrics.registry.inc('requests_total', status=200)
+#   metrics.registry.observe('request_seconds', 0.042)
+#   with metrics.registry.timer('persist_wait_seconds'): ...
+# Por defecto 'registry' es un NullRegistry cuyas llamadas no hacen nada
+# (coste de una llamada vacía); enable() lo sustituye por un MetricsRegistry
+# real. Debe llamarse antes de construir el motor, que decide al arrancar si
+# envuelve sus funciones de parsing.
+#
+# Exportación:
+#   - Resumen JSON al final de la ejecución (write_json_summary).
+#   - Fichero de texto en formato Prometheus, reescrito de forma atómica cada
+#     METRICS_EXPORT_INTERVAL segundos (TextfileExporter), apto para el
+#     'textfile collector' de node_exporter.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import bisect
+import constants
+import contextlib
+import functools
+import json
+import threading
+import time
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+PREFIX = 'gastrominer_'
+
+# Descripción de cada métrica (línea HELP de Prometheus).
+DESCRIPTIONS = {
+    'requests_total': "Peticiones HTTP de Nivel 1/2 por código de estado ('error' = fallo de red).",
+    'request_seconds': "Duración de cada petición HTTP (latencia del servidor + transferencia).",
+    'request_bytes_total': "Bytes de payload enviados.",
+    'response_bytes_total': "Bytes de cuerpo de respuesta recibidos (ya descomprimidos).",
+    'response_wire_bytes_total': "Bytes de cuerpo recibidos por la red, por Content-Encoding.",
+    'connections_opened_total': "Conexiones TCP nuevas (o reabiertas) por el pool.",
+    'connections_reused_total': "Peticiones servidas sobre una conexión Keep-Alive ya abierta.",
+    'connections_discarded_total': "Conexiones cerradas al devolverlas con el pool lleno.",
+    'throttle_wait_seconds': "Espera por un token del limitador de ritmo.",
+    'rate_limit_rps': "Ritmo actual del limitador adaptativo (peticiones/s).",
+    'rate_decreases_total': "Reducciones del ritmo por 429/5xx, errores o latencia.",
+    'cache_requests_total': "Consultas a la caché de respuestas por resultado.",
+    'parse_seconds': "Tiempo de parsing de una respuesta de Nivel 2.",
+    'parse_chunk_seconds': "Tiempo de un trozo en la etapa de parsing en procesos.",
+    'persist_wait_seconds': "Espera al encolar una fila hacia el escritor (contrapresión).",
+    'reorder_buffer_rows': "Filas retenidas por el búfer de reordenación (memoria + disco).",
+    'reorder_spilled_rows_total': "Filas volcadas a disco por el búfer de reordenación.",
+    'write_batch_seconds': "Escritura y volcado de un lote en el sink.",
+    'rows_written_total': "Filas escritas por el sink.",
+    'foods_total': "Alimentos cerrados por resultado.",
+    'retries_total': "Reintentos programados.",
+    'breaker_trips_total': "Aperturas del circuit breaker.",
+}
+
+
+def _key(name, labels):
+    if not labels:
+        return (name, ())
+    return (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+class Histogram:
+    """Histograma de cubos fijos (acumulables al exportar) con suma, mínimo y máximo."""
+
+    def __init__(self, buckets=constants.METRICS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # El último cubo es +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, fraction):
+        """Estimación del cuantil por interpolación lineal dentro del cubo."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= target and bucket_count:
+                lower = max(self.min, self.buckets[index - 1] if index > 0 else 0.0)
+                upper = min(self.max, self.buckets[index] if index < len(self.buckets) else self.max)
+                return lower + (upper - lower) * (target - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': _round(self.quantile(0.50)),
+            'p95': _round(self.quantile(0.95)),
+            'p99': _round(self.quantile(0.99)),
+            'max': round(self.max, 6),
+        }
+
+
+def _round(value):
+    return round(value, 6) if value is not None else None
+
+
+class _Timer:
+    """Context manager que observa el tiempo transcurrido en un histograma."""
+
+    __slots__ = ('registry', 'key', 'start')
+
+    def __init__(self, registry, key):
+        self.registry = registry
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry._observe_key(self.key, time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    """Registro real, seguro entre hilos."""
+
+    enabled = True
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        self._observe_key(_key(name, labels), value)
+
+    def _observe_key(self, key, value):
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, name, **labels):
+        return _Timer(self, _key(name, labels))
+
+    def counter_value(self, name, **labels):
+        """Suma de un contador; sin etiquetas, la suma de todas sus series."""
+        with self._lock:
+            if labels:
+                return self._counters.get(_key(name, labels), 0)
+            return sum(value for (key_name, _), value in self._counters.items() if key_name == name)
+
+    def summary(self):
+        """Instantánea serializable: contadores, gauges, histogramas y valores derivados."""
+        with self._lock:
+            counters = {key[0] + _label_text(key[1]): value for key, value in sorted(self._counters.items())}
+            gauges = {key[0] + _label_text(key[1]): value for key, value in sorted(self._gauges.items())}
+            histograms = {key[0] + _label_text(key[1]): h.summary() for key, h in sorted(self._histograms.items())}
+        opened = self.counter_value('connections_opened_total')
+        reused = self.counter_value('connections_reused_total')
+        checkouts = opened + reused
+        body_bytes = self.counter_value('response_bytes_total')
+        wire_bytes = self.counter_value('response_wire_bytes_total')
+        elapsed = time.time() - self.started
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'counters': counters,
+            'gauges': gauges,
+            'histograms': histograms,
+            'derived': {
+                'connection_reuse_ratio': round(reused / checkouts, 4) if checkouts else None,
+                'compression_ratio': round(body_bytes / wire_bytes, 2) if wire_bytes else None,
+                'foods_per_s': round(self.counter_value('foods_total', result='ok') / elapsed, 2) if elapsed else None,
+            },
+        }
+
+    def prometheus_text(self):
+        """Serialización en el formato de texto de exposición de Prometheus."""
+        lines = []
+        with self._lock:
+            series = {}
+            for kind, store in (('counter', self._counters), ('gauge', self._gauges),
+                                ('histogram', self._histograms)):
+                for (name, labels), value in store.items():
+                    series.setdefault((name, kind), []).append((labels, value))
+            for (name, kind), entries in sorted(series.items()):
+                full_name = PREFIX + name
+                lines.append(f"# HELP {full_name} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for labels, value in sorted(entries, key=lambda entry: entry[0]):
+                    if kind != 'histogram':
+                        lines.append(f"{full_name}{_label_text(labels)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value.buckets + (float('inf'),), value.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{full_name}_bucket{_label_text(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{full_name}_sum{_label_text(labels)} {value.sum}")
+                    lines.append(f"{full_name}_count{_label_text(labels)} {value.count}")
+        return '\n'.join(lines) + '\n'
+
+
+class NullRegistry:
+    """Registro desactivado: todas las operaciones son no-ops."""
+
+    enabled = False
+    _NULL_TIMER = contextlib.nullcontext()
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def set(self, name, value, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+    def timer(self, name, **labels):
+        return self._NULL_TIMER
+
+
+registry = NullRegistry()
+
+
+def enable():
+    """Activa la instrumentación (antes de construir el motor) y devuelve el registro."""
+    global registry
+    if not registry.enabled:
+        registry = MetricsRegistry()
+    return registry
+
+
+def timed(name, func):
+    """
+    Envuelve 'func' para observar su duración en el histograma 'name'. Con la
+    instrumentación desactivada devuelve la función original: coste cero.
+    """
+    if not registry.enabled:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with registry.timer(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def write_json_summary(path):
+    """Escribe el resumen final de la ejecución en JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(registry.summary(), f, indent=2, ensure_ascii=False)
+
+
+def write_textfile(path):
+    """Reescribe el fichero Prometheus de forma atómica (temporal + rename)."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(registry.prometheus_text())
+    os.replace(tmp_path, path)
+
+
+class TextfileExporter:
+    """Hilo que reescribe el fichero Prometheus periódicamente durante la ejecución."""
+
+    def __init__(self, path, interval=constants.METRICS_EXPORT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Detiene el hilo y escribe el estado final."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        write_textfile(self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                write_textfile(self.path)
+            except OSError as e:
+                print(f"\n[WARN] No se pudo exportar métricas a '{self.path}': {e}")
+
+
+class _CountingPoolMixin:
+    """
+    Cuenta, por cada petición, si el pool de urllib3 entrega una conexión ya
+    abierta (reutilizada) o una que hay que abrir (nueva o reiniciada tras
+    caerse), y las conexiones descartadas por tener el pool lleno.
+    """
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        registry.inc('connections_reused_total' if conn.sock is not None else 'connections_opened_total')
+        return conn
+
+    def _put_conn(self, conn):
+        connected = conn is not None and conn.sock is not None
+        super()._put_conn(conn)
+        if connected and conn.sock is None:
+            registry.inc('connections_discarded_total')
+
+
+class CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+COUNTING_POOL_CLASSES = {'http': CountingHTTPConnectionPool, 'https': CountingHTTPSConnectionPool}
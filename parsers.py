@@ -0,0 +1,316 @@
+# -----------------------------------------------------------------------------
+# PARSERS DE RESPUESTAS DE NIVEL 2
+# -----------------------------------------------------------------------------
+# El motor 'stream' sustituye el árbol completo de BeautifulSoup por un único
+# recorrido SAX (target parser de lxml). No se construye ningún árbol: los
+# eventos de inicio, texto y cierre escriben directamente en la fila final,
+# usando un mapa precompilado 'c_ori_name' -> índice de columna derivado de
+# CSV_HEADER. El motor 'soup' conserva la implementación original.
+# iter_catalog_ids() recorre en streaming la respuesta de Nivel 1 (catálogo).
+#
+# Con components=True ambos motores devuelven además el detalle de cada
+# <foodvalue> (unidad, descripción de la unidad y tipo de valor), que la fila
+# CSV descarta: la fila es un FoodRow con el atributo 'components'.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from bs4 import BeautifulSoup
+import constants
+from lxml import etree
+
+# Mapa precompilado nombre de columna -> posición en la fila CSV.
+COLUMN_INDEX = {name: idx for idx, name in enumerate(constants.CSV_HEADER)}
+
+# Etiquetas leídas dentro de cada <foodvalue>.
+COMPONENT_TAGS = frozenset(('c_ori_name', 'best_location', 'value_type'))
+
+# Campos de cada componente en FoodRow.components (orden de las tuplas).
+COMPONENT_FIELDS = ('c_ori_name', 'best_location', 'v_unit', 'u_descripcion', 'value_type')
+
+
+class FoodRow(list):
+    """
+    Fila en orden CSV_HEADER que conserva además 'components': una tupla por
+    <foodvalue> con los campos de COMPONENT_FIELDS (cadenas, '' si faltan),
+    incluidos los componentes fuera de DETAIL_LIST.
+    """
+
+    def __init__(self, values, components):
+        super().__init__(values)
+        self.components = components
+
+
+class _FoodDetailTarget:
+    """
+    Receptor de eventos SAX que replica la semántica de la versión BeautifulSoup:
+    - Metadatos (BASIC_LIST): primera aparición de cada etiqueta en el documento.
+    - Componentes: primera aparición de 'c_ori_name', 'best_location' y
+      'value_type' dentro de cada <foodvalue>, con el mismo fallback. Como en el
+      diccionario original, un componente prevalece sobre un metadato homónimo.
+    Las etiquetas se comparan sin espacio de nombres ('{ns}tag' -> 'tag').
+    Con 'components' se capturan también los COMPONENT_FIELDS de cada
+    <foodvalue> y close() devuelve un FoodRow.
+    """
+
+    def __init__(self, components=False):
+        self.row = [constants.EMPTY] * len(constants.CSV_HEADER)
+        self._pending_basic = set(constants.BASIC_LIST)
+        self._component_tags = COMPONENT_TAGS.union(COMPONENT_FIELDS) if components else COMPONENT_TAGS
+        self.components = [] if components else None
+        self._component_columns = set()  # columnas ya escritas por un <foodvalue>
+        self._component = None      # dict del <foodvalue> en curso
+        self._capture_tag = None    # etiqueta cuyo texto se está acumulando
+        self._capture_depth = 0
+        self._buffer = []
+
+    def start(self, tag, attrib):
+        if self._capture_tag is not None:
+            # Los nodos anidados aportan texto al nodo capturado (como getText()).
+            self._capture_depth += 1
+            return
+        tag = _local_name(tag)
+        if tag == 'foodvalue':
+            self._component = {}
+        elif tag in self._pending_basic or (
+                self._component is not None and tag in self._component_tags and tag not in self._component):
+            self._capture_tag = tag
+            self._capture_depth = 0
+            self._buffer = []
+
+    def data(self, text):
+        if self._capture_tag is not None:
+            self._buffer.append(text)
+
+    def end(self, tag):
+        if self._capture_tag is not None:
+            if self._capture_depth:
+                self._capture_depth -= 1
+                return
+            self._flush_capture()
+            return
+        if _local_name(tag) == 'foodvalue' and self._component is not None:
+            self._close_component(self._component)
+            self._component = None
+
+    def _flush_capture(self):
+        """Vuelca el texto acumulado de la etiqueta capturada a su destino."""
+        tag, text = self._capture_tag, ''.join(self._buffer)
+        self._capture_tag = None
+        if self._component is not None and tag in self._component_tags:
+            self._component[tag] = text
+            return
+        self._pending_basic.discard(tag)
+        idx = COLUMN_INDEX[tag]
+        if idx not in self._component_columns:
+            self.row[idx] = text
+
+    def _close_component(self, comp):
+        """Aplica el fallback 'best_location' -> 'value_type' y vuelca el valor a su columna."""
+        if self.components is not None:
+            self.components.append(tuple(comp.get(field, '') for field in COMPONENT_FIELDS))
+        idx = COLUMN_INDEX.get(comp.get('c_ori_name', 'Unknown'))
+        if idx is None:
+            # Componente fuera del esquema: se descarta igual que en normalize_for_csv.
+            return
+        value = comp.get('best_location', '')
+        self.row[idx] = value if value else comp.get('value_type', constants.EMPTY)
+        self._component_columns.add(idx)
+
+    def close(self):
+        # Documento truncado: el parser en modo 'recover' no emite los cierres
+        # pendientes, así que se recupera el texto ya leído (como BeautifulSoup).
+        if self._capture_tag is not None:
+            self._flush_capture()
+        if self._component is not None:
+            self._close_component(self._component)
+            self._component = None
+        if self.components is not None:
+            return FoodRow(self.row, tuple(self.components))
+        return self.row
+
+
+class _FoodBatchTarget:
+    """
+    Receptor para respuestas con varios alimentos: delega los eventos de cada
+    nodo <food> en un _FoodDetailTarget nuevo y agrupa las filas por f_id.
+    """
+
+    def __init__(self, components=False):
+        self.components = components
+        self.rows = {}
+        self._food = None
+        self._depth = 0
+
+    def start(self, tag, attrib):
+        if self._food is not None:
+            self._depth += 1
+            self._food.start(tag, attrib)
+        elif _local_name(tag) == 'food':
+            self._food = _FoodDetailTarget(self.components)
+            self._depth = 0
+
+    def data(self, text):
+        if self._food is not None:
+            self._food.data(text)
+
+    def end(self, tag):
+        if self._food is None:
+            return
+        if self._depth:
+            self._depth -= 1
+            self._food.end(tag)
+            return
+        self._close_food()
+
+    def _close_food(self):
+        row = self._food.close()
+        self._food = None
+        food_id = row[COLUMN_INDEX['f_id']]
+        if food_id != constants.EMPTY:
+            self.rows[food_id] = row
+
+    def close(self):
+        if self._food is not None:
+            self._close_food()
+        return self.rows
+
+
+def _local_name(tag):
+    """Elimina el prefijo de espacio de nombres que lxml antepone ('{uri}tag')."""
+    return tag.rpartition('}')[2] if tag[:1] == '{' else tag
+
+
+def parse_food_detail(content, components=False):
+    """
+    Parsea una respuesta de Nivel 2 (bytes crudos de la respuesta HTTP) en un
+    único recorrido y devuelve la fila ordenada según CSV_HEADER (un FoodRow
+    con 'components'). Sólo acepta bytes: la codificación la decide la
+    declaración XML del propio documento.
+    """
+    if not isinstance(content, (bytes, bytearray)):
+        raise TypeError("parse_food_detail espera los bytes crudos de la respuesta (response.content)")
+    parser = etree.XMLParser(target=_FoodDetailTarget(components), recover=True,
+                             resolve_entities=False, no_network=True)
+    parser.feed(bytes(content))
+    return parser.close()
+
+
+def parse_food_details(content, components=False):
+    """
+    Parsea una respuesta de Nivel 2 con varios alimentos (consulta por lotes) y
+    devuelve {f_id: fila}. Cada nodo <food> se trata como una respuesta
+    individual; los nodos sin f_id se descartan.
+    """
+    if not isinstance(content, (bytes, bytearray)):
+        raise TypeError("parse_food_details espera los bytes crudos de la respuesta (response.content)")
+    parser = etree.XMLParser(target=_FoodBatchTarget(components), recover=True,
+                             resolve_entities=False, no_network=True)
+    parser.feed(bytes(content))
+    return parser.close()
+
+
+def iter_catalog_ids(chunks):
+    """
+    Genera los f_id de una respuesta de Nivel 1 a partir de sus trozos de bytes
+    (p. ej. response.iter_content()). Los nodos ya leídos se descartan, así que
+    la memoria no depende del tamaño del catálogo.
+    """
+    parser = etree.XMLPullParser(events=('end',), recover=True,
+                                 resolve_entities=False, no_network=True)
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from _drain_catalog_events(parser)
+    parser.close()
+    yield from _drain_catalog_events(parser)
+
+
+def _drain_catalog_events(parser):
+    for _, element in parser.read_events():
+        if _local_name(element.tag) == 'f_id':
+            yield element.text or ''
+        # Se libera el nodo y sus hermanos anteriores ya procesados.
+        element.clear(keep_tail=True)
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+
+def parse_food_detail_soup(content, components=False):
+    """Parser original basado en BeautifulSoup (árbol completo + búsquedas por etiqueta)."""
+    return _soup_row(BeautifulSoup(content, "lxml-xml"), components)
+
+
+def parse_food_details_soup(content, components=False):
+    """Variante BeautifulSoup de parse_food_details: {f_id: fila} por cada nodo <food>."""
+    rows = {}
+    for food in BeautifulSoup(content, "lxml-xml").find_all('food'):
+        row = _soup_row(food, components)
+        if row[COLUMN_INDEX['f_id']] != constants.EMPTY:
+            rows[row[COLUMN_INDEX['f_id']]] = row
+    return rows
+
+
+def _soup_row(root, components=False):
+    """Fila CSV (o FoodRow) a partir de un documento o nodo <food> de BeautifulSoup."""
+    food_data_map = {}
+    details = []
+
+    # 1. Extracción de Metadatos Básicos (Ej: f_id, f_ori_name, sci_name, eur_name)
+    for tag in constants.BASIC_LIST:
+        node = root.find(tag)
+        food_data_map[tag] = node.getText() if node else constants.EMPTY
+
+    # 2. Extracción de Componentes Nutricionales
+    for comp in root.find_all('foodvalue'):
+        name_node = comp.find("c_ori_name")
+        key_name = name_node.getText() if name_node else "Unknown"
+
+        val_node = comp.find("best_location")
+        value = val_node.getText() if val_node else ""
+
+        # Lógica de fallback: si el valor numérico ('best_location') es nulo,
+        # se usa el tipo de valor ('value_type') como marcador.
+        if not value:
+            type_node = comp.find("value_type")
+            food_data_map[key_name] = type_node.getText() if type_node else constants.EMPTY
+        else:
+            food_data_map[key_name] = value
+
+        if components:
+            details.append(tuple(_soup_text(comp, field) for field in COMPONENT_FIELDS))
+
+    # Normalización del diccionario a formato de lista (fila CSV)
+    row = normalize_for_csv(food_data_map)
+    return FoodRow(row, tuple(details)) if components else row
+
+
+def _soup_text(node, tag):
+    child = node.find(tag)
+    return child.getText() if child else ''
+
+
+def normalize_for_csv(data_map):
+    """Convierte el diccionario de datos a una lista, asegurando el orden correcto (CSV_HEADER)."""
+    # Si una columna esperada no está en el mapa, se rellena con el marcador EMPTY.
+    return [data_map.get(col, constants.EMPTY) for col in constants.CSV_HEADER]
+
+
+# Motores disponibles (clave usada por constants.PARSER_ENGINE y --parser)
+PARSERS = {
+    'stream': parse_food_detail,
+    'soup': parse_food_detail_soup,
+}
+
+# Variantes por lotes ({f_id: fila}) de cada motor
+BATCH_PARSERS = {
+    'stream': parse_food_details,
+    'soup': parse_food_details_soup,
+}
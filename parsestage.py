@@ -0,0 +1,146 @@
+# -----------------------------------------------------------------------------
+# ETAPA DE PARSING EN PROCESOS (FUERA DEL GIL)
+# -----------------------------------------------------------------------------
+# Los hilos (o corrutinas) de red sólo descargan bytes. El parsing de Nivel 2
+# se hace en un ProcessPoolExecutor, de modo que el trabajo de CPU de todos los
+# workers no compite por un único núcleo bajo el GIL. Flujo:
+#
+#   workers de red --(cola acotada)--> hilo agrupador --(trozos)--> procesos
+#
+#   - submit() encola (unidad, bytes) y devuelve un Future con {f_id: fila}.
+#     Si la cola está llena, el worker de red espera: contrapresión.
+#   - Un hilo agrupa hasta PARSE_CHUNK_SIZE respuestas (o las que lleguen en
+#     PARSE_LINGER segundos) y envía el trozo al pool. Como mucho hay
+#     2 trozos por proceso en vuelo, así que la memoria queda acotada.
+#   - Cada proceso devuelve filas como tuplas: se serializan más compactas
+#     (salvo con 'components', que necesita el FoodRow con su detalle).
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import constants
+import functools
+import metrics
+import parsers
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+
+def parse_chunk(parser_engine, items, components=False):
+    """
+    [PROCESO HIJO] Parsea una lista de (unidad, bytes) y devuelve, en el mismo
+    orden, un {f_id: tupla} por unidad. Una unidad de un solo ID usa el parser
+    individual; un lote, el parser por lotes. Con 'components' las filas son
+    parsers.FoodRow.
+    """
+    parse_one = parsers.PARSERS[parser_engine]
+    parse_many = parsers.BATCH_PARSERS[parser_engine]
+    pack = (lambda row: row) if components else tuple
+    results = []
+    for unit, content in items:
+        if len(unit) == 1:
+            row = parse_one(content, components)
+            results.append({unit[0]: pack(row)} if row else {})
+        else:
+            results.append({food_id: pack(row) for food_id, row in parse_many(content, components).items()})
+    return results
+
+
+def available_cores():
+    """Núcleos utilizables por este proceso (respeta la afinidad de CPU si existe)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class ParseStage:
+    """Pool de procesos de parsing con cola de entrada acotada y envío por trozos."""
+
+    _STOP = object()
+
+    def __init__(self, parser_engine=constants.PARSER_ENGINE, processes=None,
+                 chunk_size=constants.PARSE_CHUNK_SIZE, queue_size=constants.PARSE_QUEUE_SIZE,
+                 linger=constants.PARSE_LINGER, components=False):
+        self.parser_engine = parser_engine
+        self.components = components
+        self.processes = processes or available_cores()
+        self.chunk_size = chunk_size
+        self.linger = linger
+        self.chunks = 0  # Trozos enviados al pool
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._slots = threading.BoundedSemaphore(self.processes * 2)
+        self._pool = ProcessPoolExecutor(max_workers=self.processes)
+        self._thread = threading.Thread(target=self._run, name='parse-stage', daemon=True)
+        self._thread.start()
+
+    @property
+    def capacity(self):
+        """Respuestas que la etapa puede retener entre cola y trozos en vuelo."""
+        return self._queue.maxsize + self.processes * 2 * self.chunk_size
+
+    def submit(self, unit, content):
+        """Encola una respuesta (bloquea si la cola está llena) y devuelve su Future."""
+        future = Future()
+        self._queue.put((unit, content, future))
+        return future
+
+    def close(self):
+        """Procesa lo pendiente y detiene el agrupador y los procesos."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        self._pool.shutdown(wait=True)
+
+    def _run(self):
+        """Bucle del hilo agrupador: trozos por tamaño o por tiempo de espera."""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            chunk = [item]
+            deadline = time.monotonic() + self.linger
+            while len(chunk) < self.chunk_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                chunk.append(item)
+            self._send(chunk)
+
+    def _send(self, chunk):
+        futures = [future for _, _, future in chunk]
+        self._slots.acquire()
+        try:
+            job = self._pool.submit(parse_chunk, self.parser_engine,
+                                    [(unit, content) for unit, content, _ in chunk], self.components)
+        except Exception as e:
+            self._slots.release()
+            for future in futures:
+                future.set_exception(e)
+            return
+        self.chunks += 1
+        job.add_done_callback(functools.partial(self._resolve, futures, time.perf_counter()))
+
+    def _resolve(self, futures, sent, job):
+        self._slots.release()
+        metrics.registry.observe('parse_chunk_seconds', time.perf_counter() - sent)
+        try:
+            results = job.result()
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, rows in zip(futures, results):
+            future.set_result(rows)
@@ -0,0 +1,194 @@
+# -----------------------------------------------------------------------------
+# LIMITADOR DE RITMO ADAPTATIVO (TOKEN BUCKET + AIMD)
+# -----------------------------------------------------------------------------
+# Un único cubo de tokens compartido por todos los workers fija el ritmo global
+# de peticiones (peticiones/s y ráfaga), en lugar del antiguo sleep fijo por
+# worker cuyo ritmo real dependía de MAX_WORKERS. El ritmo se adapta (AIMD):
+#   - Aumento aditivo (+RATE_INCREASE req/s) tras ~1 s de respuestas sanas.
+#   - Reducción multiplicativa ante HTTP 429/5xx o errores de red, y más suave
+#     cuando la latencia reciente se dispara respecto a su línea base.
+# Un 'Retry-After' del servidor vacía el cubo durante el tiempo indicado.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import asyncio
+import constants
+import metrics
+import threading
+import time
+from requests.adapters import HTTPAdapter
+
+
+class AdaptiveRateLimiter:
+    """Cubo de tokens seguro entre hilos y corrutinas, con ajuste AIMD del ritmo."""
+
+    def __init__(self, rate=constants.RATE_LIMIT, burst=constants.RATE_BURST,
+                 min_rate=constants.RATE_MIN, max_rate=constants.RATE_MAX):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.throttled = 0  # Respuestas que provocaron una reducción del ritmo
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._healthy = 0
+        self._last_decrease = 0.0
+        self._latency_fast = None   # EWMA reactiva de la latencia
+        self._latency_base = None   # EWMA lenta: línea base de la latencia
+        metrics.registry.set('rate_limit_rps', self.rate)
+
+    def _reserve(self):
+        """Reserva un token y devuelve cuántos segundos hay que esperar por él."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self):
+        """Bloquea el hilo llamante hasta disponer de un token."""
+        wait = self._reserve()
+        metrics.registry.observe('throttle_wait_seconds', wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Equivalente no bloqueante para el motor asyncio."""
+        wait = self._reserve()
+        metrics.registry.observe('throttle_wait_seconds', wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def feedback(self, status, latency, retry_after=None):
+        """
+        Ajusta el ritmo con el resultado de una petición. 'status' es el código
+        HTTP (None si hubo un error de red) y 'latency' los segundos empleados.
+        """
+        with self._lock:
+            if status is None or status == 429 or status >= 500:
+                self._decrease(constants.RATE_DECREASE_FACTOR)
+                if retry_after:
+                    # El servidor pide pausa explícita: cubo en números rojos.
+                    self._tokens = min(self._tokens, -retry_after * self.rate)
+                return
+
+            self._update_latency(latency)
+            if self._latency_fast > self._latency_base * constants.RATE_LATENCY_FACTOR:
+                self._decrease(constants.RATE_LATENCY_DECREASE_FACTOR)
+                return
+
+            # Aumento aditivo aproximadamente una vez por segundo de éxito.
+            self._healthy += 1
+            if self._healthy >= self.rate:
+                self._healthy = 0
+                self.rate = min(self.max_rate, self.rate + constants.RATE_INCREASE)
+                metrics.registry.set('rate_limit_rps', self.rate)
+
+    def _update_latency(self, latency):
+        if self._latency_fast is None:
+            self._latency_fast = self._latency_base = latency
+            return
+        self._latency_fast += 0.3 * (latency - self._latency_fast)
+        self._latency_base += 0.02 * (latency - self._latency_base)
+
+    def _decrease(self, factor):
+        """Reducción multiplicativa, como mucho una vez por ventana de enfriamiento."""
+        now = time.monotonic()
+        self._healthy = 0
+        if now - self._last_decrease < constants.RATE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.throttled += 1
+        self.rate = max(self.min_rate, self.rate * factor)
+        metrics.registry.inc('rate_decreases_total')
+        metrics.registry.set('rate_limit_rps', self.rate)
+
+
+def record_request(status, latency, sent_bytes, received_bytes, wire_bytes=None, encoding=None):
+    """
+    Métricas de una petición que salió a la red ('status' None = error de red).
+    'received_bytes' es el cuerpo ya descomprimido y 'wire_bytes' lo que viajó
+    por la red con el Content-Encoding 'encoding' (por defecto, sin comprimir).
+    """
+    registry = metrics.registry
+    if not registry.enabled:
+        return
+    registry.inc('requests_total', status=status if status is not None else 'error')
+    registry.observe('request_seconds', latency)
+    registry.inc('request_bytes_total', sent_bytes)
+    registry.inc('response_bytes_total', received_bytes)
+    registry.inc('response_wire_bytes_total', received_bytes if wire_bytes is None else wire_bytes,
+                 encoding=encoding or 'identity')
+
+
+def parse_retry_after(value):
+    """Segundos de una cabecera Retry-After numérica (las fechas HTTP se ignoran)."""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    Adaptador de requests que adquiere un token antes de salir a la red e
+    informa del resultado al limitador. Sin limitador no aplica ritmo. Con las
+    métricas activas registra cada petición y las conexiones nuevas,
+    reutilizadas y descartadas del pool.
+    'timeout' (conexión, lectura) se aplica a las peticiones que no fijan uno
+    propio. El tamaño del pool se pasa con los argumentos de HTTPAdapter
+    ('pool_maxsize'): debe cubrir la concurrencia o las conexiones sobrantes
+    se cierran al devolverlas y hay que volver a abrirlas.
+    """
+
+    def __init__(self, limiter=None, timeout=(constants.HTTP_CONNECT_TIMEOUT, constants.HTTP_READ_TIMEOUT),
+                 **kwargs):
+        self.limiter = limiter
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        if metrics.registry.enabled:
+            self.poolmanager.pool_classes_by_scheme = metrics.COUNTING_POOL_CLASSES
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        if self.limiter is not None:
+            self.limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            latency = time.monotonic() - start
+            if self.limiter is not None:
+                self.limiter.feedback(None, latency)
+            record_request(None, latency, len(request.body or b''), 0)
+            raise
+        latency = time.monotonic() - start
+        if self.limiter is not None:
+            self.limiter.feedback(response.status_code, latency,
+                                  parse_retry_after(response.headers.get('Retry-After')))
+        if metrics.registry.enabled:
+            encoding = response.headers.get('Content-Encoding')
+            if kwargs.get('stream'):
+                # Con stream=True no se lee el cuerpo aquí: se usa la cabecera,
+                # que con compresión es el tamaño comprimido.
+                received = int(response.headers.get('Content-Length') or 0)
+                wire = received
+            else:
+                # raw.tell() cuenta los bytes leídos del socket, antes de descomprimir.
+                received = len(response.content)
+                wire = response.raw.tell() if encoding else received
+            record_request(response.status_code, latency, len(request.body or b''), received, wire, encoding)
+        return response
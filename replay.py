@@ -0,0 +1,140 @@
+# -----------------------------------------------------------------------------
+# REGENERACIÓN DEL DATASET DESDE EL ARCHIVO DE RESPUESTAS (REPLAY)
+# -----------------------------------------------------------------------------
+# Ejecuta el pipeline de parsing y persistencia sobre un pack grabado con
+# --archive (ver archive.py), sin tocar la red: el coste lo marca la CPU y no
+# el ritmo de descarga educado con BEDCA.
+#
+#   - El catálogo es el último de Nivel 1 archivado (si no hay ninguno, todos
+#     los IDs con respuesta). Para cada ID se usa su respuesta más reciente.
+#   - Los registros se leen en orden de offset (lectura secuencial) y se
+#     parsean en paralelo en la etapa de procesos (parsestage.ParseStage).
+#   - Las filas llegan al escritor en ese mismo orden: dos replays del mismo
+#     pack producen el mismo fichero.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from GastroMiner import GastroMiner
+import archive
+import collections
+import metrics
+import parsestage
+import zlib
+
+
+class ReplayMiner(GastroMiner):
+    """
+    Motor sin red: sustituye el catálogo y las descargas por la lectura del
+    pack. Reutiliza de GastroMiner el sink, el hilo escritor y el progreso.
+    """
+
+    def __init__(self, archive_path, **kwargs):
+        """
+        'archive_path' es el pack a regenerar. 'parse_processes' 0 usa un
+        proceso por núcleo. El resto de argumentos se delegan en GastroMiner.
+        """
+        super().__init__(**kwargs)
+        self.archive_path = archive_path
+        self.replayed = 0      # Filas entregadas al escritor
+        self.missing_ids = []  # IDs del catálogo sin respuesta archivada
+        self.empty_ids = []    # IDs cuya respuesta no contiene su fila
+
+    def execute(self):
+        """Regenera el dataset completo desde el pack."""
+        reader = archive.PackReader(self.archive_path)
+        try:
+            plan, units = self._plan_replay(reader)
+            self.parse_stage = parsestage.ParseStage(
+                self.parser_engine, processes=self.parse_processes or parsestage.available_cores(),
+                components=self.components)
+            print(f">>> Replay de '{self.archive_path}': {sum(len(ids) for _, ids in plan)} alimentos "
+                  f"en {len(plan)} respuestas, {self.parse_stage.processes} procesos de parsing.")
+            self._replay(reader, plan, units)
+            self._report_replay()
+        finally:
+            if self.parse_stage is not None:
+                self.parse_stage.close()
+            self.close()
+            reader.close()
+
+    def _plan_replay(self, reader):
+        """
+        Devuelve ([(offset, [f_id])] en orden de offset, {offset: unidad}):
+        qué IDs se toman de cada registro.
+        """
+        units = reader.details()
+        latest = reader.latest_offsets()
+        catalog = reader.catalog_ids()
+        if catalog is None:
+            print("[WARN] El archivo no contiene el catálogo (Nivel 1): se regeneran todos sus IDs.")
+            catalog = list(latest)
+        wanted = collections.defaultdict(list)
+        for food_id in dict.fromkeys(catalog):
+            offset = latest.get(food_id)
+            if offset is None:
+                self.missing_ids.append(food_id)
+            else:
+                wanted[offset].append(food_id)
+        return sorted(wanted.items()), units
+
+    def _replay(self, reader, plan, units):
+        """Lee, parsea en procesos y persiste en orden, con una ventana acotada de respuestas."""
+        total_foods = sum(len(food_ids) for _, food_ids in plan)
+        window = collections.deque()  # (Future, [f_id]) en orden de offset
+        completed_count = 0
+        for offset, food_ids in plan:
+            try:
+                content = reader.read(offset)
+            except (ValueError, zlib.error) as e:
+                print(f"\n[WARN] {e} Se omiten {len(food_ids)} IDs.")
+                self.empty_ids.extend(food_ids)
+                completed_count += len(food_ids)
+                continue
+            window.append((self.parse_stage.submit(units[offset], content), food_ids))
+            # La ventana acota las filas parseadas que esperan su turno de escritura.
+            while window and (len(window) >= self.parse_stage.capacity or window[0][0].done()):
+                completed_count = self._settle_replayed(*window.popleft(), completed_count, total_foods)
+        while window:
+            completed_count = self._settle_replayed(*window.popleft(), completed_count, total_foods)
+
+    def _settle_replayed(self, future, food_ids, completed_count, total_foods):
+        """Persiste las filas de un registro ya parseado y devuelve el recuento actualizado."""
+        try:
+            rows = future.result()
+        except Exception as e:
+            print(f"\n[WARN] Fallo de parsing en un registro de {len(food_ids)} IDs: {e}")
+            rows = {}
+        for food_id in food_ids:
+            data_row = rows.get(food_id)
+            if data_row:
+                metrics.registry.inc('foods_total', result='ok')
+                self._persist_data(data_row)
+                self.replayed += 1
+            else:
+                self.empty_ids.append(food_id)
+            completed_count += 1
+            if completed_count % 25 == 0 or completed_count == total_foods:
+                self._print_progress(completed_count, total_foods)
+        return completed_count
+
+    def _print_progress(self, current, total):
+        """Barra de progreso sin ritmo de peticiones (no hay red)."""
+        bar_length = 50
+        filled_length = int(bar_length * current // total)
+        bar = '█' * filled_length + '-' * (bar_length - filled_length)
+        print(f"\rProgreso: |{bar}| {current / total * 100:.1f}% ({current}/{total})", end='', flush=True)
+
+    def _report_replay(self):
+        print(f"\n[*] Replay: {self.replayed} filas regeneradas.")
+        if self.missing_ids:
+            print(f"[!] {len(self.missing_ids)} IDs del catálogo no tienen respuesta archivada.")
+        if self.empty_ids:
+            print(f"[!] {len(self.empty_ids)} IDs sin fila en su respuesta archivada: "
+                  f"{', '.join(self.empty_ids[:20])}{'...' if len(self.empty_ids) > 20 else ''}")
@@ -0,0 +1,120 @@
+# -----------------------------------------------------------------------------
+# PLANIFICADOR DE REINTENTOS Y CIRCUIT BREAKER
+# -----------------------------------------------------------------------------
+# Los IDs cuya descarga falla no se pierden: entran en una cola diferida
+# (montículo ordenado por instante de reintento) con backoff exponencial y
+# jitter, hasta RETRY_MAX_ATTEMPTS intentos por ID. Ningún worker espera: el
+# despachador de GastroMiner sólo vuelve a lanzar un ID cuando vence su plazo.
+# El circuit breaker detiene todo el despacho durante BREAKER_COOLDOWN
+# segundos cuando la tasa de error reciente supera BREAKER_THRESHOLD.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import collections
+import constants
+import heapq
+import itertools
+import metrics
+import random
+import time
+
+
+class RetryScheduler:
+    """Cola diferida de reintentos con tope de intentos por ID."""
+
+    def __init__(self, max_attempts=constants.RETRY_MAX_ATTEMPTS,
+                 base_delay=constants.RETRY_BASE_DELAY, max_delay=constants.RETRY_MAX_DELAY):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failed_ids = []     # IDs que agotaron sus intentos
+        self.retries = 0         # Reintentos programados en total
+        self._attempts = collections.Counter()
+        self._heap = []          # (instante, desempate, f_id)
+        self._tie = itertools.count()
+
+    def record_failure(self, food_id):
+        """
+        Registra un intento fallido. Devuelve True si el ID queda programado
+        para reintento y False si ha agotado sus intentos.
+        """
+        self._attempts[food_id] += 1
+        attempt = self._attempts[food_id]
+        if attempt >= self.max_attempts:
+            self.failed_ids.append(food_id)
+            del self._attempts[food_id]
+            metrics.registry.inc('foods_total', result='failed')
+            return False
+        # Backoff exponencial con 'equal jitter': la mitad fija, la otra aleatoria.
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._tie), food_id))
+        self.retries += 1
+        metrics.registry.inc('retries_total')
+        return True
+
+    def record_success(self, food_id):
+        self._attempts.pop(food_id, None)
+
+    def pop_due(self):
+        """Extrae los IDs cuyo plazo de reintento ya ha vencido."""
+        now = time.monotonic()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def seconds_to_next(self):
+        """Segundos hasta el próximo reintento, o None si no hay ninguno pendiente."""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class CircuitBreaker:
+    """
+    Ventana deslizante de resultados recientes. Si la proporción de errores
+    supera el umbral (con un mínimo de muestras), el circuito se abre y
+    allow() devuelve False hasta que pasa el periodo de enfriamiento.
+    """
+
+    def __init__(self, window=constants.BREAKER_WINDOW, threshold=constants.BREAKER_THRESHOLD,
+                 min_samples=constants.BREAKER_MIN_SAMPLES, cooldown=constants.BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.trips = 0
+        self._outcomes = collections.deque(maxlen=window)
+        self._errors = 0
+        self._open_until = 0.0
+
+    def record(self, success):
+        if len(self._outcomes) == self._outcomes.maxlen:
+            self._errors -= not self._outcomes[0]
+        self._outcomes.append(success)
+        self._errors += not success
+        if (len(self._outcomes) >= self.min_samples
+                and self._errors / len(self._outcomes) > self.threshold
+                and time.monotonic() >= self._open_until):
+            self._open_until = time.monotonic() + self.cooldown
+            self._outcomes.clear()
+            self._errors = 0
+            self.trips += 1
+            metrics.registry.inc('breaker_trips_total')
+            print(f"\n[CIRCUIT BREAKER] Tasa de error elevada: despacho pausado {self.cooldown:.0f} s.")
+
+    def allow(self):
+        return time.monotonic() >= self._open_until
+
+    def seconds_to_close(self):
+        return max(0.0, self._open_until - time.monotonic())
@@ -0,0 +1,303 @@
+# -----------------------------------------------------------------------------
+# RASTREO POR FRAGMENTOS (SHARDS) Y FUSIÓN DETERMINISTA
+# -----------------------------------------------------------------------------
+# Reparte un rastreo entre varias máquinas o IPs de salida: con --shard k/n
+# cada ejecución sólo pide los f_id cuyo CRC32 módulo n vale k-1. El reparto
+# no depende del orden del catálogo ni de qué otros IDs existan, así que todas
+# las máquinas lo calculan igual sin coordinarse. Cada fragmento escribe su
+# propia salida y, junto a ella:
+#   <salida>.shard-ids   IDs asignados (uno por línea), para detectar huecos.
+#   <salida>.shard.json  manifiesto: fragmento, máquina, filas, fallos, tiempos.
+#
+# La fusión (CLI de este módulo) combina las salidas CSV en un único dataset
+# ordenado por f_id con memoria acotada: cada fragmento se ordena por tramos de
+# MERGE_RUN_ROWS filas volcados a disco y los tramos se combinan con una
+# fusión de k vías (heapq.merge). Comprueba IDs duplicados, IDs asignados que
+# faltan, fragmentos ausentes o incompletos y filas en el fragmento equivocado,
+# e informa del rendimiento de cada fragmento (<salida>.merge.json).
+#
+# Uso: python shard.py --output nutritional-info.csv nutritional-info.shard-*.csv
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import argparse
+import constants
+import csv
+import datetime
+import heapq
+import json
+import shutil
+import socket
+import tempfile
+import time
+import zlib
+
+
+def parse_spec(text):
+    """Convierte 'k/n' en (k, n), con 1 <= k <= n."""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Fragmento no válido '{text}': use k/n, p. ej. 2/4") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"Fragmento no válido '{text}': debe cumplirse 1 <= k <= n")
+    return index, count
+
+
+def shard_of(food_id, count):
+    """Fragmento (1..count) al que pertenece un f_id."""
+    return zlib.crc32(food_id.encode('utf-8')) % count + 1
+
+
+def sort_key(food_id):
+    """Orden de f_id: numérico para IDs de dígitos, sin convertir a entero."""
+    return (len(food_id), food_id)
+
+
+def output_path(path, index, count):
+    """Nombre por defecto de la salida de un fragmento: <base>.shard-k-of-n<ext>."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{index}-of-{count}{ext}"
+
+
+class Shard:
+    """Filtro del catálogo y registro (IDs asignados y manifiesto) de un fragmento."""
+
+    def __init__(self, index, count, output_file):
+        self.index = index
+        self.count = count
+        self.output_file = output_file
+        self.manifest_path = output_file + constants.SHARD_MANIFEST_SUFFIX
+        self.ids_path = output_file + constants.SHARD_IDS_SUFFIX
+        self.catalog_size = 0
+        self.assigned = 0
+        self._started = None
+
+    def select(self, catalog_ids):
+        """Deja pasar sólo los IDs de este fragmento y los anota en <salida>.shard-ids."""
+        self._started = time.time()
+        print(f">>> Fragmento {self.index}/{self.count}: se piden los f_id con "
+              f"crc32(f_id) % {self.count} == {self.index - 1}.")
+        with open(self.ids_path, 'w', encoding='utf-8') as ids_file:
+            for food_id in catalog_ids:
+                self.catalog_size += 1
+                if shard_of(food_id, self.count) == self.index:
+                    self.assigned += 1
+                    ids_file.write(food_id + '\n')
+                    yield food_id
+
+    def finish(self, rows_written, failed_ids, complete):
+        """Escribe el manifiesto del fragmento (también tras una interrupción)."""
+        finished = time.time()
+        started = self._started or finished
+        wall = finished - started
+        manifest = {
+            'shard': self.index,
+            'shards': self.count,
+            'partition': f"crc32(f_id) % {self.count} + 1",
+            'host': socket.gethostname(),
+            'output': self.output_file,
+            'catalog_size': self.catalog_size,
+            'assigned': self.assigned,
+            'rows_written': rows_written,
+            'failed_ids': sorted(failed_ids, key=sort_key),
+            'complete': complete,
+            'started': datetime.datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+            'finished': datetime.datetime.fromtimestamp(finished).isoformat(timespec='seconds'),
+            'wall_s': round(wall, 3),
+            'foods_per_s': round(rows_written / wall, 2) if wall else None,
+        }
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        print(f"[*] Manifiesto del fragmento {self.index}/{self.count} en '{self.manifest_path}'.")
+
+
+# --- FUSIÓN -------------------------------------------------------------------
+
+def _spill_runs(rows, key, workdir, run_rows):
+    """Ordena 'rows' por tramos de 'run_rows' filas y los vuelca a CSV temporales."""
+    paths, run = [], []
+    for row in rows:
+        run.append(row)
+        if len(run) >= run_rows:
+            paths.append(_write_run(run, key, workdir))
+            run = []
+    if run:
+        paths.append(_write_run(run, key, workdir))
+    return paths
+
+
+def _write_run(run, key, workdir):
+    run.sort(key=key)
+    fd, path = tempfile.mkstemp(suffix='.run.csv', dir=workdir)
+    with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(run)
+    return path
+
+
+def _read_run(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from csv.reader(f)
+
+
+def _load_manifest(path):
+    manifest_path = path + constants.SHARD_MANIFEST_SUFFIX
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def merge_shards(paths, output, run_rows=constants.MERGE_RUN_ROWS, header=constants.CSV_HEADER):
+    """
+    Fusiona las salidas CSV de los fragmentos en 'output', ordenado por f_id, y
+    devuelve el informe. Ante IDs duplicados se conserva la primera fila (en el
+    orden de 'paths').
+    """
+    id_column = list(header).index('f_id')
+    row_key = lambda row: sort_key(row[id_column])
+    id_key = lambda row: sort_key(row[0])
+    manifests = [_load_manifest(path) for path in paths]
+    report = {'output': output, 'shards': [], 'warnings': []}
+    counts = {manifest['shards'] for manifest in manifests if manifest is not None}
+    if len(counts) > 1:
+        raise ValueError(f"Los manifiestos no coinciden en el número de fragmentos: {sorted(counts)}")
+    shard_count = counts.pop() if counts else None
+
+    workdir = tempfile.mkdtemp(prefix='gastrominer-merge-', dir=os.path.dirname(os.path.abspath(output)))
+    try:
+        row_runs, id_runs = [], []
+        for path, manifest in zip(paths, manifests):
+            shard = manifest['shard'] if manifest is not None else None
+            entry = {'path': path, 'rows': 0, 'misrouted_rows': 0}
+
+            def checked(reader):
+                for row in reader:
+                    entry['rows'] += 1
+                    if shard is not None and shard_of(row[id_column], shard_count) != shard:
+                        entry['misrouted_rows'] += 1
+                    yield row
+
+            with open(path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                if tuple(next(reader, ())) != tuple(header):
+                    raise ValueError(f"La cabecera de '{path}' no coincide con CSV_HEADER.")
+                row_runs.extend(_spill_runs(checked(reader), row_key, workdir, run_rows))
+            if manifest is None:
+                report['warnings'].append(f"'{path}' no tiene manifiesto de fragmento.")
+            else:
+                entry.update({key: manifest.get(key) for key in (
+                    'shard', 'host', 'assigned', 'rows_written', 'complete', 'wall_s', 'foods_per_s')})
+                entry['failed_ids'] = len(manifest.get('failed_ids', []))
+                if not manifest.get('complete'):
+                    report['warnings'].append(f"El fragmento {shard} no terminó su rastreo.")
+                ids_path = path + constants.SHARD_IDS_SUFFIX
+                if os.path.exists(ids_path):
+                    with open(ids_path, encoding='utf-8') as f:
+                        id_runs.extend(_spill_runs(([line.rstrip('\n')] for line in f if line.strip()),
+                                                   id_key, workdir, run_rows))
+                else:
+                    report['warnings'].append(f"Falta '{ids_path}' (IDs asignados al fragmento {shard}).")
+            report['shards'].append(entry)
+
+        present = {entry['shard'] for entry in report['shards'] if entry.get('shard') is not None}
+        missing_shards = sorted(set(range(1, shard_count + 1)) - present) if shard_count else []
+        expected_available = bool(id_runs) and all(manifest is not None for manifest in manifests)
+
+        # Fusión de k vías de todos los tramos, con comprobación en paralelo
+        # contra la lista (también fusionada) de IDs asignados.
+        expected = (row[0] for row in heapq.merge(*(_read_run(run) for run in id_runs), key=id_key))
+        next_expected = next(expected, None)
+        duplicates, conflicts, missing, unexpected = {}, [], [], []
+        written = 0
+        previous = None
+        tmp_output = output + '.tmp'
+        with open(tmp_output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for row in heapq.merge(*(_read_run(run) for run in row_runs), key=row_key):
+                food_id = row[id_column]
+                if previous is not None and food_id == previous[id_column]:
+                    duplicates[food_id] = duplicates.get(food_id, 1) + 1
+                    if row != previous and food_id not in conflicts:
+                        conflicts.append(food_id)
+                    continue
+                while next_expected is not None and sort_key(next_expected) < sort_key(food_id):
+                    missing.append(next_expected)
+                    next_expected = next(expected, None)
+                if next_expected == food_id:
+                    next_expected = next(expected, None)
+                    while next_expected == food_id:  # ID repetido en el catálogo
+                        next_expected = next(expected, None)
+                elif expected_available:
+                    unexpected.append(food_id)
+                writer.writerow(row)
+                written += 1
+                previous = row
+        while next_expected is not None:
+            missing.append(next_expected)
+            next_expected = next(expected, None)
+        os.replace(tmp_output, output)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report.update({
+        'rows': written,
+        'missing_shards': missing_shards,
+        'duplicates': duplicates,
+        'conflicting_duplicates': conflicts,
+        'missing_ids': missing,
+        'unexpected_ids': unexpected,
+        'ok': not (missing_shards or duplicates or missing),
+    })
+    return report
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Fusiona las salidas CSV de un rastreo por fragmentos")
+    arg_parser.add_argument('shards', nargs='+', help="CSV de cada fragmento (con su .shard.json al lado)")
+    arg_parser.add_argument('--output', default=constants.CSV_OUTPUT_FILE,
+                            help="CSV fusionado (por defecto: %(default)s)")
+    arg_parser.add_argument('--run-rows', type=int, default=constants.MERGE_RUN_ROWS,
+                            help="Filas por tramo ordenado en memoria (por defecto: %(default)s)")
+    args = arg_parser.parse_args()
+
+    try:
+        report = merge_shards(args.shards, args.output, run_rows=args.run_rows)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    report_path = args.output + constants.MERGE_REPORT_SUFFIX
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for entry in report['shards']:
+        label = f"fragmento {entry['shard']}" if entry.get('shard') is not None else entry['path']
+        rate = f"{entry['foods_per_s']} alimentos/s" if entry.get('foods_per_s') is not None else "sin datos"
+        print(f"    {label:<14} {entry.get('host') or '?':<20} {entry['rows']:>8} filas  "
+              f"{entry.get('wall_s') or 0:>9.1f} s  {rate}"
+              + (f"  [{entry['misrouted_rows']} filas fuera de su fragmento]" if entry['misrouted_rows'] else ""))
+    for warning in report['warnings']:
+        print(f"[WARN] {warning}")
+    print(f"[*] {report['rows']} filas en '{args.output}' (informe en '{report_path}').")
+    if report['missing_shards']:
+        print(f"[!] Faltan los fragmentos: {', '.join(map(str, report['missing_shards']))}")
+    if report['duplicates']:
+        print(f"[!] {len(report['duplicates'])} IDs duplicados "
+              f"({len(report['conflicting_duplicates'])} con filas distintas); se conserva la primera.")
+    if report['missing_ids']:
+        print(f"[!] {len(report['missing_ids'])} IDs asignados sin fila: "
+              f"{', '.join(report['missing_ids'][:20])}{'...' if len(report['missing_ids']) > 20 else ''}")
+    if report['unexpected_ids']:
+        print(f"[WARN] {len(report['unexpected_ids'])} filas con IDs no asignados a ningún fragmento.")
+    if report['ok']:
+        print("[OK] Dataset completo: sin huecos ni duplicados.")
+    else:
+        sys.exit(1)
@@ -0,0 +1,401 @@
+# -----------------------------------------------------------------------------
+# BÚSQUEDA DE ALIMENTOS POR SIMILITUD DE PERFIL NUTRICIONAL
+# -----------------------------------------------------------------------------
+# Responde "¿qué alimentos se parecen más a X?" y "sustitutos de X con menos
+# grasa saturada" con operaciones matriciales sobre los nutrientes de
+# DETAIL_LIST (sin bucles Python por alimento):
+#   1. Matriz cruda (alimentos x nutrientes) desde un FoodStore (foodstore.py).
+#      Los valores marcados como traza ('tr') cuentan como 0; el resto de
+#      ausencias quedan como NaN. Se descartan los nutrientes con una
+#      cobertura menor que SIMILARITY_MIN_COVERAGE.
+#   2. Imputación de NaN por columna ('median', 'mean' o 'zero') y escalado por
+#      nutriente ('zscore', 'robust' = mediana/IQR, 'minmax' o 'none'), para que
+#      la energía en kcal no domine sobre las vitaminas en µg.
+#   3. Consulta: pesos opcionales por nutriente aplicados al vuelo (X² · w se
+#      precalcula por columnas), coseno o distancia euclídea contra todo el
+#      catálogo en una multiplicación matriz-vector, restricciones sobre los
+#      valores crudos ("sodio < 100", "ácidos grasos saturados totales < ref",
+#      donde 'ref' es el valor del alimento de consulta) y top-k con
+#      argpartition.
+#   4. Modo por lotes: vecinos de todo el catálogo por bloques de filas
+#      (multiplicación bloque x catálogo acotada a SIMILARITY_BLOCK_BYTES).
+#
+# Uso: python similarity.py nutritional-info.csv --food 1001 [--k 10] [--metric euclidean]
+#          [--weights "proteina=2; sodio=0.5"] [--where "ácidos grasos saturados totales < ref"]
+#      python similarity.py nutritional-info.csv --all-pairs vecinos.csv [--k 10]
+#      python similarity.py nutritional-info.csv --bench [--replicate 20]
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import argparse
+import constants
+import csv
+import foodstore
+import numpy as np
+import re
+import time
+
+METRICS = ('cosine', 'euclidean')
+SCALINGS = ('zscore', 'robust', 'minmax', 'none')
+NA_STRATEGIES = ('median', 'mean', 'zero')
+TRACE_FLAG = 'tr'  # Marcador de BEDCA para cantidades traza: se toman como 0
+
+REFERENCE_CONDITION = re.compile(r'^\s*(.+?)\s*(>=|<=|==|=|>|<)\s*ref\s*$', re.IGNORECASE)
+
+
+def parse_weights(text, columns=constants.DETAIL_LIST):
+    """
+    Convierte "proteina=2; sodio=0.5" en {nutriente: peso}. Se separa por ';'
+    porque los nombres de DETAIL_LIST contienen comas.
+    """
+    weights = {}
+    for part in text.split(';'):
+        if not part.strip():
+            continue
+        name, separator, value = part.rpartition('=')
+        if not separator:
+            raise ValueError(f"Peso no válido: '{part.strip()}' (formato: <nutriente>=<peso>).")
+        try:
+            weight = float(value)
+        except ValueError:
+            raise ValueError(f"Peso no numérico para '{name.strip()}': {value.strip()}") from None
+        if weight < 0:
+            raise ValueError(f"El peso de '{name.strip()}' no puede ser negativo.")
+        weights[foodstore.resolve_column(name.strip(), columns)] = weight
+    return weights
+
+
+def parse_constraints(expression, columns=constants.DETAIL_LIST):
+    """
+    Como foodstore.parse_conditions, pero el valor puede ser 'ref' (el del
+    alimento de consulta): [(nutriente, operador, número o 'ref')].
+    """
+    constraints = []
+    for part in foodstore.CONDITION_SEPARATOR.split(expression.strip()):
+        if not part:
+            continue
+        match = REFERENCE_CONDITION.match(part)
+        if match is not None:
+            constraints.append((foodstore.resolve_column(match.group(1), columns), match.group(2), 'ref'))
+        else:
+            constraints.extend(foodstore.parse_conditions(part, columns))
+    return constraints
+
+
+def top_k(scores, k, largest=True):
+    """Índices de las k mejores puntuaciones de un vector, ordenados (argpartition + sort de k)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    keys = -scores if largest else scores
+    if k < len(scores):
+        candidates = np.argpartition(keys, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(keys[candidates], kind='stable')]
+
+
+def all_pairs(matrix, k, metric='cosine', block_bytes=constants.SIMILARITY_BLOCK_BYTES):
+    """
+    Los k vecinos de cada fila de 'matrix' (excluida ella misma). Devuelve
+    (índices int32 n x k, puntuaciones float32 n x k): similitud coseno
+    (mayor es mejor) o distancia euclídea (menor es mejor).
+    """
+    n = len(matrix)
+    k = min(k, n - 1)
+    neighbours = np.empty((n, max(k, 0)), dtype=np.int32)
+    scores = np.empty((n, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return neighbours, scores
+    squared = np.einsum('ij,ij->i', matrix, matrix)
+    if metric == 'cosine':
+        matrix = matrix / np.maximum(np.sqrt(squared), 1e-12)[:, None]
+    # Filas por bloque: la matriz bloque x catálogo (float32) cabe en block_bytes.
+    block_rows = max(1, min(n, block_bytes // (4 * n)))
+    for start in range(0, n, block_rows):
+        end = min(n, start + block_rows)
+        block = matrix[start:end] @ matrix.T
+        if metric == 'euclidean':
+            # d² = |a|² + |b|² - 2ab; se compara d² y se devuelve su raíz.
+            block *= -2.0
+            block += squared[start:end, None]
+            block += squared[None, :]
+            np.maximum(block, 0.0, out=block)
+            keys = block
+        else:
+            keys = np.negative(block, out=block)  # argpartition busca los menores
+        rows = np.arange(end - start)
+        keys[rows, rows + start] = np.inf  # Cada alimento no es vecino de sí mismo
+        candidates = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        candidate_keys = np.take_along_axis(keys, candidates, axis=1)
+        order = np.argsort(candidate_keys, axis=1, kind='stable')
+        neighbours[start:end] = np.take_along_axis(candidates, order, axis=1)
+        best = np.take_along_axis(candidate_keys, order, axis=1)
+        scores[start:end] = np.sqrt(best) if metric == 'euclidean' else -best
+    return neighbours, scores
+
+
+class NutrientSpace:
+    """
+    Perfiles nutricionales normalizados de un FoodStore. 'weights' son los
+    pesos por defecto de las consultas ({nutriente: peso}, 1 si no figura).
+    """
+
+    def __init__(self, store, scaling='zscore', na='median', weights=None,
+                 min_coverage=constants.SIMILARITY_MIN_COVERAGE):
+        if scaling not in SCALINGS:
+            raise ValueError(f"Escalado desconocido: '{scaling}' ({', '.join(SCALINGS)}).")
+        if na not in NA_STRATEGIES:
+            raise ValueError(f"Tratamiento de NA desconocido: '{na}' ({', '.join(NA_STRATEGIES)}).")
+        self.store = store
+        self.scaling = scaling
+        self.na = na
+        raw = np.array(store.values, dtype=np.float64)
+        for row, flags in store.flags.items():
+            for name, flag in flags.items():
+                if flag == TRACE_FLAG:
+                    raw[row, store.column_index[name]] = 0.0
+        coverage = (~np.isnan(raw)).mean(axis=0) if len(raw) else np.zeros(raw.shape[1])
+        keep = np.flatnonzero(coverage >= min_coverage)
+        self.columns = tuple(store.columns[column] for column in keep)
+        self.dropped = tuple(name for name in store.columns if name not in self.columns)
+        self.coverage = {store.columns[column]: round(float(coverage[column]), 3) for column in range(raw.shape[1])}
+        self.values = raw  # Todos los nutrientes, trazas a 0: base de las restricciones
+        self.raw = raw[:, keep]
+        self._column_index = {name: index for index, name in enumerate(self.columns)}
+        self.matrix = self._normalize(self.raw).astype(np.float32)
+        self._squared = np.square(self.matrix)
+        self.weights = self.weight_vector(weights)
+
+    def _normalize(self, raw):
+        """Imputa los NaN de cada columna y la escala; columnas constantes quedan a 0."""
+        missing = np.isnan(raw)
+        if not raw.size:
+            return np.zeros_like(raw)
+        with np.errstate(all='ignore'):
+            if self.na == 'zero':
+                fill = np.zeros(raw.shape[1])
+            elif self.na == 'mean':
+                fill = np.nanmean(raw, axis=0)
+            else:
+                fill = np.nanmedian(raw, axis=0)
+        filled = np.where(missing, fill[None, :], raw)
+        if self.scaling == 'zscore':
+            center, spread = filled.mean(axis=0), filled.std(axis=0)
+        elif self.scaling == 'robust':
+            q1, median, q3 = np.percentile(filled, (25, 50, 75), axis=0)
+            center, spread = median, q3 - q1
+        elif self.scaling == 'minmax':
+            center, spread = filled.min(axis=0), np.ptp(filled, axis=0)
+        else:
+            return filled
+        spread = np.where(spread > 0, spread, 1.0)
+        return (filled - center) / spread
+
+    def weight_vector(self, weights=None):
+        """Vector de pesos (float32) en el orden de 'columns'."""
+        vector = np.ones(len(self.columns), dtype=np.float32)
+        for name, weight in (weights or {}).items():
+            name = foodstore.resolve_column(name, self.store.columns)
+            if name not in self._column_index:
+                raise ValueError(f"'{name}' no se usa en la similitud (cobertura {self.coverage[name]:.0%}).")
+            vector[self._column_index[name]] = weight
+        return vector
+
+    def row(self, food_id):
+        """Fila de un f_id (ValueError si no está en el dataset)."""
+        row = self.store.row_of(food_id)
+        if row is None:
+            raise ValueError(f"f_id desconocido: {food_id}")
+        return row
+
+    def scores(self, row, metric='cosine', weights=None):
+        """
+        Puntuación de 'row' contra todo el catálogo: similitud coseno o
+        distancia euclídea ponderadas, en una sola pasada matriz-vector.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Métrica desconocida: '{metric}' ({', '.join(METRICS)}).")
+        w = self.weights if weights is None else self.weight_vector(weights)
+        query = self.matrix[row]
+        dot = self.matrix @ (query * w)
+        norms = self._squared @ w          # Σ w·x² de cada alimento
+        query_norm = float(np.dot(query * query, w))
+        if metric == 'euclidean':
+            return np.sqrt(np.maximum(norms + query_norm - 2.0 * dot, 0.0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            similarity = dot / np.sqrt(norms * query_norm)
+        return np.nan_to_num(similarity, nan=-np.inf)
+
+    def constraint_mask(self, constraints, row):
+        """Filas que cumplen las restricciones sobre valores crudos (traza = 0; NaN no cumple)."""
+        mask = np.ones(len(self.raw), dtype=bool)
+        for name, op, value in constraints:
+            column = self.store.column_index[foodstore.resolve_column(name, self.store.columns)]
+            values = self.values[:, column]
+            if value == 'ref':
+                value = self.values[row, column]
+                if np.isnan(value):
+                    raise ValueError(f"El alimento {self.store.ids[row]} no tiene valor de '{name}' para 'ref'.")
+            mask &= foodstore.OPERATORS[op](values, value)
+        return mask
+
+    def neighbours(self, food_id, k=constants.SIMILARITY_K, metric='cosine', weights=None, constraints=None):
+        """
+        Los k alimentos más parecidos a 'food_id' (excluido él mismo) que
+        cumplen 'constraints' (lista o expresión, ver parse_constraints).
+        Devuelve [(fila, puntuación)] del mejor al peor.
+        """
+        row = self.row(food_id)
+        scores = self.scores(row, metric, weights)
+        largest = metric == 'cosine'
+        excluded = np.zeros(len(scores), dtype=bool)
+        excluded[row] = True
+        if constraints:
+            if isinstance(constraints, str):
+                constraints = parse_constraints(constraints, self.store.columns)
+            excluded |= ~self.constraint_mask(constraints, row)
+        scores = np.where(excluded, -np.inf if largest else np.inf, scores)
+        best = top_k(scores, min(k, int((~excluded).sum())), largest)
+        return [(int(index), round(float(scores[index]), 6)) for index in best]
+
+    def all_pairs(self, k=constants.SIMILARITY_K, metric='cosine', weights=None):
+        """Vecinos de todo el catálogo (ver all_pairs): pesos aplicados como escala sqrt(w)."""
+        if metric not in METRICS:
+            raise ValueError(f"Métrica desconocida: '{metric}' ({', '.join(METRICS)}).")
+        w = self.weights if weights is None else self.weight_vector(weights)
+        return all_pairs(self.matrix * np.sqrt(w), k, metric)
+
+
+def write_all_pairs(path, space, neighbours, scores):
+    """CSV 'f_id,rank,neighbour_id,score' con los vecinos de cada alimento."""
+    ids = space.store.ids
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('f_id', 'rank', 'neighbour_id', 'score'))
+        for row, (indices, values) in enumerate(zip(neighbours.tolist(), scores.tolist())):
+            writer.writerows((ids[row], rank, ids[index], f"{value:.6g}")
+                             for rank, (index, value) in enumerate(zip(indices, values), 1))
+
+
+def _python_neighbours(matrix, row, k):
+    """Línea base del benchmark: coseno con bucles Python puros."""
+    query = matrix[row]
+    query_norm = sum(value * value for value in query) ** 0.5
+    scored = []
+    for index, other in enumerate(matrix):
+        if index == row:
+            continue
+        dot = sum(a * b for a, b in zip(query, other))
+        norm = sum(value * value for value in other) ** 0.5
+        scored.append((dot / (norm * query_norm) if norm and query_norm else float('-inf'), index))
+    scored.sort(reverse=True)
+    return scored[:k]
+
+
+def benchmark(space, k, replicate=1, seed=1):
+    """
+    Latencia de consulta individual, coste de todos los pares y línea base en
+    Python puro. 'replicate' amplía el catálogo repitiendo la matriz con un
+    ruido del 5% para medir a mayor escala.
+    """
+    rng = np.random.default_rng(seed)
+    matrix = space.matrix
+    if replicate > 1:
+        matrix = np.concatenate([matrix] + [matrix * rng.normal(1.0, 0.05, matrix.shape).astype(np.float32)
+                                            for _ in range(replicate - 1)])
+    n = len(matrix)
+    squared = np.square(matrix)
+    ones = np.ones(matrix.shape[1], dtype=np.float32)
+    timings = []
+    for row in rng.integers(0, n, size=min(200, n)).tolist():
+        start = time.perf_counter()
+        dot = matrix @ matrix[row]
+        scores = dot / np.sqrt((squared @ ones) * float(dot[row]))
+        scores[row] = -np.inf
+        top_k(scores, k)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    start = time.perf_counter()
+    all_pairs(matrix, k)
+    all_pairs_s = time.perf_counter() - start
+    sample = rng.integers(0, n, size=min(5, n)).tolist()
+    python_rows = matrix.tolist()
+    start = time.perf_counter()
+    for row in sample:
+        _python_neighbours(python_rows, row, k)
+    python_ms = (time.perf_counter() - start) * 1000 / max(1, len(sample))
+    return {
+        'foods': n,
+        'nutrients': matrix.shape[1],
+        'query_p50_ms': round(timings[len(timings) // 2], 3),
+        'query_p99_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3),
+        'all_pairs_s': round(all_pairs_s, 3),
+        'python_query_ms': round(python_ms, 1),
+    }
+
+
+def parse_arguments():
+    arg_parser = argparse.ArgumentParser(description="Alimentos con el perfil nutricional más parecido")
+    arg_parser.add_argument('dataset', help="CSV de GastroMiner o salida .parquet/.arrow")
+    mode = arg_parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--food', help="f_id de consulta")
+    mode.add_argument('--all-pairs', metavar='CSV', help="Escribe los k vecinos de cada alimento en un CSV")
+    mode.add_argument('--bench', action='store_true', help="Mide consulta individual y todos los pares")
+    arg_parser.add_argument('--k', type=int, default=constants.SIMILARITY_K)
+    arg_parser.add_argument('--metric', choices=METRICS, default='cosine')
+    arg_parser.add_argument('--scaling', choices=SCALINGS, default='zscore')
+    arg_parser.add_argument('--na', choices=NA_STRATEGIES, default='median',
+                            help="Imputación de valores ausentes por nutriente (por defecto: %(default)s)")
+    arg_parser.add_argument('--weights', default='', help="Pesos por nutriente: \"proteina=2; sodio=0.5\"")
+    arg_parser.add_argument('--where', default='',
+                            help="Restricciones: \"ácidos grasos saturados totales < ref and sodio < 100\"")
+    arg_parser.add_argument('--replicate', type=int, default=1,
+                            help="--bench: repite el catálogo N veces (con ruido) para medir a escala")
+    return arg_parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    try:
+        store = foodstore.FoodStore(args.dataset)
+        space = NutrientSpace(store, args.scaling, args.na, parse_weights(args.weights))
+    except (OSError, ValueError) as e:
+        print(f"[FATAL] {e}")
+        sys.exit(1)
+    print(f"[*] {store.size} alimentos x {len(space.columns)} nutrientes "
+          f"({len(space.dropped)} descartados por cobertura < {constants.SIMILARITY_MIN_COVERAGE:.0%}).")
+
+    if args.food:
+        try:
+            matches = space.neighbours(args.food, args.k, args.metric, constraints=args.where)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        reference = store.brief(space.row(args.food))
+        print(f">>> Más parecidos a {reference['f_id']} '{reference['f_ori_name']}' ({args.metric}):")
+        for rank, (row, score) in enumerate(matches, 1):
+            brief = store.brief(row)
+            print(f"    {rank:>2}. {brief['f_id']:>6}  {score:>9.4f}  {brief['f_ori_name']}")
+        if not matches:
+            print("[!] Ningún alimento cumple las restricciones.")
+    elif args.all_pairs:
+        start = time.perf_counter()
+        neighbours, scores = space.all_pairs(args.k, args.metric)
+        elapsed = time.perf_counter() - start
+        write_all_pairs(args.all_pairs, space, neighbours, scores)
+        print(f"[*] {args.k} vecinos de {store.size} alimentos en {elapsed:.2f} s -> '{args.all_pairs}'.")
+    else:
+        result = benchmark(space, args.k, args.replicate)
+        print(f"    Consulta individual: p50 {result['query_p50_ms']} ms, p99 {result['query_p99_ms']} ms "
+              f"({result['foods']} alimentos)")
+        print(f"    Todos los pares (k={args.k}): {result['all_pairs_s']} s")
+        print(f"    Línea base en Python puro: {result['python_query_ms']} ms por consulta "
+              f"(x{result['python_query_ms'] / max(result['query_p50_ms'], 1e-6):.0f})")
@@ -0,0 +1,311 @@
+# -----------------------------------------------------------------------------
+# ETAPA DE ESCRITURA (WRITER STAGE)
+# -----------------------------------------------------------------------------
+# Un único hilo escritor consume filas de una cola acotada y las vuelca por
+# lotes a un 'sink' con un descriptor abierto durante toda la ejecución. Los
+# workers sólo encolan: desaparecen el lock global y el par open/close por
+# fila. El volcado se produce por tamaño de lote o por tiempo, y el cierre
+# (fin normal o SIGINT) drena la cola y hace fsync.
+#
+# Un sink es cualquier objeto con los métodos:
+#   open()            -> prepara el destino
+#   write_rows(rows)  -> escribe una lista de filas (listas en orden CSV_HEADER)
+#   flush()           -> vacía buffers de usuario al sistema operativo
+#   sync()            -> flush() + persistencia en disco (fsync)
+#   close()           -> libera recursos
+# y, opcionalmente, del atributo 'wants_components' = True para recibir filas
+# parsers.FoodRow con el detalle de cada componente (ver database.py).
+#
+# En modo ordenado, ReorderBuffer se sitúa delante del RowWriter y entrega las
+# filas en orden de posición en el catálogo en lugar de orden de finalización.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+# Compatibilidad con layout antiguo: permitir importar desde ./src/ si existe
+here = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(here, 'src')
+if os.path.isdir(src_dir) and src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import constants
+import csv
+import metrics
+import pickle
+import queue
+import tempfile
+import threading
+import time
+
+
+class CsvSink:
+    """
+    Sink CSV: un único fichero abierto mientras dura la ejecución. Con un
+    'journal' (journal.CompletionJournal) registra los f_id de cada lote tras
+    volcarlo; con resume=True continúa un CSV previo en lugar de truncarlo.
+    """
+
+    def __init__(self, path, header=constants.CSV_HEADER, journal=None, resume=False):
+        self.path = path
+        self.header = header
+        self.journal = journal
+        self.resume = resume
+        self.completed_ids = set()  # IDs ya persistidos en ejecuciones previas
+        self._id_column = list(header).index('f_id')
+        self._file = None
+        self._writer = None
+
+    def open(self):
+        """
+        Trunca el fichero y escribe la cabecera, o lo reabre para reanudar. Al
+        reanudar nunca se trunca en silencio: sin diario, los IDs y el offset
+        se reconstruyen a partir del propio CSV; un diario que apunta más allá
+        del final del CSV es un error.
+        """
+        offset = None
+        rebuilt = False
+        if self.resume and self.journal is not None and os.path.exists(self.path):
+            self.completed_ids, offset = self.journal.load()
+            if offset is None and os.path.getsize(self.path) > 0:
+                print(f"[WARN] '{self.path}' no tiene diario de reanudación: se reconstruye desde el CSV.")
+                self.completed_ids, offset = self._scan_completed()
+                rebuilt = True
+            if offset is not None and offset > os.path.getsize(self.path):
+                raise IOError(f"El diario de '{self.path}' registra {offset} bytes pero el CSV sólo tiene "
+                              f"{os.path.getsize(self.path)}: no se puede reanudar (sin --resume se reescribe).")
+        if offset is not None:
+            # Se descartan las filas posteriores a la última entrada del diario.
+            with open(self.path, 'rb+') as f:
+                f.truncate(offset)
+            self._file = open(self.path, 'a', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+        else:
+            self.completed_ids = set()
+            # Uso de encoding='utf-8' para manejar correctamente caracteres especiales.
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.header)
+        if self.journal is not None:
+            self.journal.open(resume=offset is not None and not rebuilt)
+            if offset is None or rebuilt:
+                self._file.flush()
+                self.journal.append(self._file.tell(), sorted(self.completed_ids))
+        self.sync()
+
+    def _scan_completed(self):
+        """
+        (IDs, offset) de un CSV sin diario: f_id de cada registro completo
+        (terminado en salto de línea y con todas las columnas) y offset del
+        final del último. Lo que sigue, una fila a medias, se descarta.
+        """
+        position, offset, done_ids = 0, 0, set()
+        complete = False
+
+        def lines(f):
+            nonlocal position, complete
+            for line in f:
+                position += len(line)
+                complete = line.endswith(b'\n')
+                yield line.decode('utf-8')
+
+        with open(self.path, 'rb') as f:
+            reader = csv.reader(lines(f))
+            try:
+                if next(reader, None) != list(self.header):
+                    raise IOError(f"La cabecera de '{self.path}' no coincide: no se puede reanudar.")
+                offset = position
+                for row in reader:
+                    if not complete or len(row) != len(self.header):
+                        break
+                    done_ids.add(row[self._id_column])
+                    offset = position
+            except (csv.Error, UnicodeDecodeError):
+                pass  # Registro final corrupto: se reanuda tras el último completo
+        return done_ids, offset
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+        if self.journal is not None:
+            # Primero las filas (ya en disco), después el diario: nunca se
+            # registra un ID cuya fila pueda perderse en un corte de corriente.
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.journal.append(self._file.tell(), [row[self._id_column] for row in rows])
+
+    def flush(self):
+        self._file.flush()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if self.journal is not None:
+            self.journal.sync()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.journal is not None:
+            self.journal.close()
+
+
+class RowWriter:
+    """
+    Etapa de escritura desacoplada. put() encola (bloquea si la cola está
+    llena, lo que aplica contrapresión a los productores) y un hilo dedicado
+    vuelca lotes al sink.
+    """
+
+    _STOP = object()
+
+    def __init__(self, sink, queue_size=constants.WRITER_QUEUE_SIZE,
+                 batch_size=constants.WRITER_BATCH_SIZE,
+                 flush_interval=constants.WRITER_FLUSH_INTERVAL):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.error = None  # Primera excepción del hilo escritor
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name='row-writer', daemon=True)
+        self._closed = False
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def put(self, row):
+        """Encola una fila. Propaga cualquier error previo del hilo escritor."""
+        if self.error is not None:
+            raise self.error
+        self._queue.put(row)
+
+    def close(self):
+        """Drena la cola, escribe el último lote, hace fsync y cierra el sink."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        """Bucle del hilo escritor: agrupa por tamaño o por tiempo."""
+        batch = []
+        last_flush = time.monotonic()
+        try:
+            while True:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                if item is self._STOP:
+                    break
+                if item is not None:
+                    batch.append(item)
+                if len(batch) >= self.batch_size or (
+                        time.monotonic() - last_flush >= self.flush_interval):
+                    self._write_batch(batch)
+                    batch = []
+                    last_flush = time.monotonic()
+            self._write_batch(batch)
+            self.sink.sync()
+        except Exception as e:
+            self.error = e
+            # Se sigue vaciando la cola para no bloquear a los productores.
+            while self._queue.get() is not self._STOP:
+                pass
+        finally:
+            self.sink.close()
+
+    def _write_batch(self, batch):
+        with metrics.registry.timer('write_batch_seconds'):
+            if batch:
+                self.sink.write_rows(batch)
+                self.rows_written += len(batch)
+            self.sink.flush()
+        metrics.registry.inc('rows_written_total', len(batch))
+
+
+class ReorderBuffer:
+    """
+    Búfer de reordenación delante del RowWriter. Cada fila llega con su posición
+    en el catálogo (0, 1, 2...) y sólo se entrega al escritor cuando todas las
+    anteriores se han entregado u omitido (skip, p. ej. reintentos agotados).
+    Si una petición lenta retiene la cabeza, en memoria quedan como mucho
+    'capacity' filas: las siguientes se vuelcan a un fichero temporal y se
+    releen al llegar su turno. Un único productor (el despachador del motor).
+    """
+
+    _SKIP = object()
+
+    def __init__(self, writer, capacity=constants.REORDER_BUFFER_SIZE):
+        self.writer = writer
+        self.capacity = capacity
+        self.next_position = 0  # Posición que desbloquea la cabeza
+        self.spilled_rows = 0
+        self._buffer = {}   # posición -> fila (o _SKIP) en memoria
+        self._spilled = {}  # posición -> (offset, longitud) en el fichero de volcado
+        self._spill_file = None
+
+    def __len__(self):
+        return len(self._buffer) + len(self._spilled)
+
+    def put(self, position, row):
+        """Registra la fila de 'position' y entrega las que ya están en orden."""
+        if position != self.next_position and len(self._buffer) >= self.capacity:
+            self._spill(position, row)
+        else:
+            self._buffer[position] = row
+        self._drain()
+
+    def skip(self, position):
+        """Marca 'position' como cerrada sin fila."""
+        self._buffer[position] = self._SKIP
+        self._drain()
+
+    def close(self):
+        """
+        Entrega lo que quede en orden de posición, aunque haya huecos (fin por
+        Ctrl+C o error): las filas ya extraídas no se pierden.
+        """
+        for position in sorted(self._buffer.keys() | self._spilled.keys()):
+            self.next_position = position
+            self._drain()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def _spill(self, position, row):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix='gastrominer-reorder-')
+        data = pickle.dumps(row, protocol=pickle.HIGHEST_PROTOCOL)
+        self._spill_file.seek(0, os.SEEK_END)
+        self._spilled[position] = (self._spill_file.tell(), len(data))
+        self._spill_file.write(data)
+        self.spilled_rows += 1
+        metrics.registry.inc('reorder_spilled_rows_total')
+
+    def _take(self, position):
+        row = self._buffer.pop(position, None)
+        if row is not None:
+            return row
+        offset, length = self._spilled.pop(position)
+        self._spill_file.seek(offset)
+        row = pickle.loads(self._spill_file.read(length))
+        if not self._spilled:
+            # Sin filas pendientes en disco: el fichero se reutiliza desde cero.
+            self._spill_file.seek(0)
+            self._spill_file.truncate()
+        return row
+
+    def _drain(self):
+        while self.next_position in self._buffer or self.next_position in self._spilled:
+            row = self._take(self.next_position)
+            self.next_position += 1
+            if row is not self._SKIP:
+                self.writer.put(row)
+        metrics.registry.set('reorder_buffer_rows', len(self))